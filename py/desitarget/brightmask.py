@@ -243,7 +243,11 @@ def collect_bright_sources(bands, maglim, numproc=4,
     if numproc > 1:
         pool = sharedmem.MapReduce(np=numproc)
         with pool:
-            sourcestruc = pool.map(_get_bright_sources, infiles, reduce=_update_status)
+            # ADM process the largest files first, to shorten the tail.
+            sourcestruc = pool.map(_get_bright_sources, infiles,
+                                   reduce=_update_status, cost=os.path.getsize)
+        log.info('{:.1f} slave-secs ({:.1f}%) idle at the tail of the map'
+                 .format(pool.tailidle, 100.*pool.tailfraction))
     else:
         sourcestruc = []
         for file in infiles:
@@ -27,7 +27,9 @@ from pkg_resources import resource_filename
 from desitarget import io
 from desitarget.cuts import _psflike, _is_row, _get_colnames, _prepare_gaia
 from desitarget.cuts import _prepare_optical_wise, _check_BGS_targtype_sv
-from desitarget.cuts import shift_photo_north
+from desitarget.cuts import shift_photo_north, _preload_qso_forests
+from desitarget.cuts import _getColors, _mag, _with_photfeatures
+from desitarget.cuts import _register_features
 from desitarget.internal import sharedmem
 from desitarget.targets import finalize, resolve
 from desitarget.cmx.cmx_targetmask import cmx_mask
@@ -63,39 +65,6 @@ def _get_cmxdir(cmxdir=None):
     return cmxdir
 
 
-def _getColors(nbEntries, nfeatures, gflux, rflux, zflux, w1flux, w2flux):
-
-    limitInf = 1.e-04
-    gflux = gflux.clip(limitInf)
-    rflux = rflux.clip(limitInf)
-    zflux = zflux.clip(limitInf)
-    w1flux = w1flux.clip(limitInf)
-    w2flux = w2flux.clip(limitInf)
-
-    g = np.where(gflux > limitInf, 22.5-2.5*np.log10(gflux), 0.)
-    r = np.where(rflux > limitInf, 22.5-2.5*np.log10(rflux), 0.)
-    z = np.where(zflux > limitInf, 22.5-2.5*np.log10(zflux), 0.)
-    W1 = np.where(w1flux > limitInf, 22.5-2.5*np.log10(w1flux), 0.)
-    W2 = np.where(w2flux > limitInf, 22.5-2.5*np.log10(w2flux), 0.)
-
-    photOK = (g > 0.) & (r > 0.) & (z > 0.) & (W1 > 0.) & (W2 > 0.)
-
-    colors = np.zeros((nbEntries, nfeatures))
-    colors[:, 0] = g-r
-    colors[:, 1] = r-z
-    colors[:, 2] = g-z
-    colors[:, 3] = g-W1
-    colors[:, 4] = r-W1
-    colors[:, 5] = z-W1
-    colors[:, 6] = g-W2
-    colors[:, 7] = r-W2
-    colors[:, 8] = z-W2
-    colors[:, 9] = W1-W2
-    colors[:, 10] = r
-
-    return colors, r, photOK
-
-
 def passesSTD_logic(gfracflux=None, rfracflux=None, zfracflux=None,
                     objtype=None, gaia=None, pmra=None, pmdec=None,
                     aen=None, dupsource=None, paramssolved=None,
@@ -556,12 +525,12 @@ def isLRG_colors(gflux=None, rflux=None, zflux=None, w1flux=None,
     lrg = primary.copy()
     lrginit, lrgsuper = np.tile(primary, [2, 1])
 
-    gmag = 22.5 - 2.5 * np.log10(gflux.clip(1e-7))
+    gmag = _mag(gflux, 1e-7)
     # ADM safe as these fluxes are set to > 0 in notinLRG_mask.
-    rmag = 22.5 - 2.5 * np.log10(rflux.clip(1e-7))
-    zmag = 22.5 - 2.5 * np.log10(zflux.clip(1e-7))
-    w1mag = 22.5 - 2.5 * np.log10(w1flux.clip(1e-7))
-    zfibermag = 22.5 - 2.5 * np.log10(zfiberflux.clip(1e-7))
+    rmag = _mag(rflux, 1e-7)
+    zmag = _mag(zflux, 1e-7)
+    w1mag = _mag(w1flux, 1e-7)
+    zfibermag = _mag(zfiberflux, 1e-7)
 
     if south:
 
@@ -686,11 +655,11 @@ def isfiller(gflux=None, rflux=None, zflux=None, w1flux=None,
     filler &= (w1flux_snr > 4) & (w1flux > 0)  # ADM quality in W1.
 
     # ADM safe as these fluxes are set to > 0
-    gmag = 22.5 - 2.5 * np.log10(gflux.clip(1e-7))
-    rmag = 22.5 - 2.5 * np.log10(rflux.clip(1e-7))
-    zmag = 22.5 - 2.5 * np.log10(zflux.clip(1e-7))
-    w1mag = 22.5 - 2.5 * np.log10(w1flux.clip(1e-7))
-    rfibermag = 22.5 - 2.5 * np.log10(rfiberflux.clip(1e-7))
+    gmag = _mag(gflux, 1e-7)
+    rmag = _mag(rflux, 1e-7)
+    zmag = _mag(zflux, 1e-7)
+    w1mag = _mag(w1flux, 1e-7)
+    rfibermag = _mag(rfiberflux, 1e-7)
 
     # North and South currently have the same cuts
     filler &= (rmag > 19.5) & (rmag < 21) & (rfibermag < 22)  # magnitude limits
@@ -997,7 +966,7 @@ def isQSO_randomforest(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=N
 
     if np.any(preSelection):
 
-        from desitarget.myRF import myRF
+        from desitarget.myRF import load_forests
 
         # Data reduction to preselected objects
         colorsReduced = colors[preSelection]
@@ -1011,15 +980,10 @@ def isQSO_randomforest(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=N
         rf_fileName = pathToRF + '/rf_model_dr7.npz'
         rf_HighZ_fileName = pathToRF + '/rf_model_dr7_HighZ.npz'
 
-        # rf initialization - colors data duplicated within "myRF"
-        rf = myRF(colorsReduced, pathToRF, numberOfTrees=500, version=2)
-        rf_HighZ = myRF(colorsReduced, pathToRF, numberOfTrees=500, version=2)
-        # rf loading
-        rf.loadForest(rf_fileName)
-        rf_HighZ.loadForest(rf_HighZ_fileName)
-        # Compute rf probabilities
-        tmp_rf_proba = rf.predict_proba()
-        tmp_rf_HighZ_proba = rf_HighZ.predict_proba()
+        # rf loading (once per process)
+        # ADM the main and HighZ forests are evaluated in one pass.
+        rf = load_forests([rf_fileName, rf_HighZ_fileName],
+                          numberOfTrees=500, version=2)
         # Compute optimized proba cut (all different for SV)
         # ADM the probabilities are different for the north and the south.
         if south:
@@ -1035,8 +999,9 @@ def isQSO_randomforest(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=N
                                   0.5 - (r_Reduced - 20.5) * 0.025, 0.5)
 
         # Add rf proba test result to "qso" mask
-        qso[colorsReducedIndex] = \
-            (tmp_rf_proba >= pcut) | (tmp_rf_HighZ_proba >= pcut_HighZ)
+        # ADM objects pass if they pass either the main or HighZ cut.
+        qso[colorsReducedIndex] = rf.predict_threshold(
+            colorsReduced, [pcut, pcut_HighZ])
 
     # In case of call for a single object passed to the function with scalar arguments
     # Return "numpy.bool_" instead of "numpy.ndarray"
@@ -1112,7 +1077,7 @@ def isQSO_highz_faint(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=No
 
     if np.any(preSelection):
 
-        from desitarget.myRF import myRF
+        from desitarget.myRF import load_forest
 
         # Data reduction to preselected objects.
         colorsReduced = colors[preSelection]
@@ -1126,14 +1091,8 @@ def isQSO_highz_faint(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=No
         # Use RF trained over DR7.
         rf_fileName = pathToRF + '/rf_model_dr7.npz'
 
-        # rf initialization - colors data duplicated within "myRF".
-        rf = myRF(colorsReduced, pathToRF, numberOfTrees=500, version=2)
-
-        # rf loading.
-        rf.loadForest(rf_fileName)
-
-        # Compute rf probabilities.
-        tmp_rf_proba = rf.predict_proba()
+        # rf loading (once per process).
+        rf = load_forest(rf_fileName, numberOfTrees=500, version=2)
 
         # Compute optimized proba cut (all different for SV).
         # The probabilities may be different for the north and the south.
@@ -1143,7 +1102,7 @@ def isQSO_highz_faint(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=No
             pcut = np.where(r_Reduced < 23.2,  0.40 + (r_Reduced-22.8)*.9, .76 + (r_Reduced-23.2)*.4)
 
         # Add rf proba test result to "qso" mask
-        qso[colorsReducedIndex] = (tmp_rf_proba >= pcut)
+        qso[colorsReducedIndex] = rf.predict_threshold(colorsReduced, pcut)
 
     # In case of call for a single object passed to the function with scalar arguments
     # Return "numpy.bool_" instead of "numpy.ndarray"
@@ -1236,8 +1195,9 @@ def isQSOz5_colors(gflux=None, rflux=None, zflux=None,
 
     # ADM now safe to update w1flux and zflux to avoid warnings.
     # ADM the np.atleast_1d's are to catch the single-object case.
-    w1flux = np.atleast_1d(w1flux)
-    zflux = np.atleast_1d(zflux)
+    # ADM make copies as we are reassigning values.
+    w1flux = np.atleast_1d(w1flux).copy()
+    zflux = np.atleast_1d(zflux).copy()
     w1flux[~qso] = 0.
     zflux[~qso] = 0.
 
@@ -1368,12 +1328,12 @@ def isELG_colors(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=None,
 
     # ADM work in magnitudes not fluxes. THIS IS ONLY OK AS the snr cuts
     # ADM in notinELG_mask ENSURE positive fluxes in all of g, r and z.
-    g = 22.5 - 2.5*np.log10(gflux.clip(1e-16))
-    r = 22.5 - 2.5*np.log10(rflux.clip(1e-16))
-    z = 22.5 - 2.5*np.log10(zflux.clip(1e-16))
+    g = _mag(gflux, 1e-16)
+    r = _mag(rflux, 1e-16)
+    z = _mag(zflux, 1e-16)
 
     # ADM gfiberflux can be zero but is never negative. So this is safe.
-    gfib = 22.5 - 2.5*np.log10(gfiberflux.clip(1e-16))
+    gfib = _mag(gfiberflux, 1e-16)
 
     # ADM these are safe as the snr cuts in notinELG_mask ENSURE positive
     # ADM fluxes in all of g, r and z...so things near colors of zero but
@@ -1592,7 +1552,7 @@ def isSTD_dither(obs_gflux=None, obs_rflux=None, obs_zflux=None,
 
     # ADM prioritize based on magnitude.
     # ADM OK to clip, as these are all Gaia matches.
-    rmag = 22.5-2.5*np.log10(obs_rflux.clip(1e-16))
+    rmag = _mag(obs_rflux, 1e-16)
     prio = np.array((10*(25-rmag)).astype(int))
 
     return isdither, prio
@@ -1645,7 +1605,7 @@ def isSTD_dither_spec(gaiagmag=None, gaiarmag=None, obs_rflux=None,
 
     # ADM prioritize based on magnitude.
     # ADM OK to clip, as these are all Gaia matches.
-    rmag = 22.5-2.5*np.log10(obs_rflux.clip(1e-16))
+    rmag = _mag(obs_rflux, 1e-16)
     prio = np.array((10*(25-rmag)).astype(int))
 
     return isdither, prio
@@ -1963,6 +1923,7 @@ def apply_cuts_gaia(numproc=4, cmxdir=None, nside=None, pixlist=None):
     return cmx_target, gaiaobjs
 
 
+@_with_photfeatures
 def apply_cuts(objects, cmxdir=None, noqso=False):
     """Commissioning (cmx) target selection, return target mask arrays.
 
@@ -2035,6 +1996,13 @@ def apply_cuts(objects, cmxdir=None, noqso=False):
         gaiarmag, gaiaaen, gaiadupsource, Grr, gaiaparamssolved, gaiabprpfactor, \
         gaiasigma5dmax, galb = _prepare_gaia(objects, colnames=colnames)
 
+    # ADM the inputs from which magnitudes, colors etc. are memoized.
+    _register_features(
+        photsys_north=photsys_north, photsys_south=photsys_south,
+        obs_rflux=obs_rflux, gflux=gflux, rflux=rflux, zflux=zflux,
+        w1flux=w1flux, w2flux=w2flux, gfiberflux=gfiberflux,
+        rfiberflux=rfiberflux, zfiberflux=zfiberflux)
+
     # ADM a couple of extra columns; the observed g/z fluxes.
     obs_gflux, obs_zflux = objects['FLUX_G'], objects['FLUX_Z']
 
@@ -2277,19 +2245,16 @@ def select_targets(infiles, numproc=4, cmxdir=None, noqso=False,
         log.info('Running on Node {}'.format(os.getenv('SLURMD_NODENAME')))
 
     def _finalize_targets(objects, cmx_target, priority_shift=None, gaiadr=None):
+        # ADM finalize only copies the kept rows.
         keep = (cmx_target != 0)
-        objects = objects[keep]
-        cmx_target = cmx_target[keep]
         if priority_shift is not None:
             priority_shift = priority_shift[keep]
-        if gaiadr is not None:
-            gaiadr = gaiadr[keep]
 
         # -Add *_target mask columns
         # ADM note that only cmx_target is defined for commissioning
         # ADM so just pass that around
         targets = finalize(objects, cmx_target, cmx_target, cmx_target,
-                           survey='cmx', gaiadr=gaiadr)
+                           survey='cmx', gaiadr=gaiadr, keep=keep)
         # ADM shift the priorities of targets with functional priorities.
         if priority_shift is not None:
             targets["PRIORITY_INIT"] += priority_shift
@@ -2328,6 +2293,10 @@ def select_targets(infiles, numproc=4, cmxdir=None, noqso=False,
 
     # -Parallel process input files
     if numproc > 1:
+        # ADM load the QSO random forests into shared memory before
+        # ADM forking, so they are loaded once rather than per-worker.
+        if not noqso:
+            _preload_qso_forests()
         pool = sharedmem.MapReduce(np=numproc)
         with pool:
             targets = pool.map(_select_targets_file, infiles, reduce=_update_status)
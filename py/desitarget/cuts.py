@@ -15,18 +15,27 @@ flux passes a given selection criterion (*e.g.* LRG, ELG or QSO).
 import warnings
 from time import time
 import os.path
+from glob import glob
+import hashlib
 
 import numbers
 import sys
+import inspect
+import threading
+from functools import wraps, partial
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import healpy as hp
+import fitsio
 from pkg_resources import resource_filename
 import numpy.lib.recfunctions as rfn
 
 from astropy.table import Table, Row
 
 from desitarget import io
+from desitarget import __version__ as desitarget_version
 from desitarget.internal import sharedmem
 from desitarget.gaiamatch import match_gaia_to_primary
 from desitarget.gaiamatch import pop_gaia_coords, pop_gaia_columns
@@ -69,6 +78,283 @@ def _gal_coords(ra, dec):
     return gc.l.value, gc.b.value
 
 
+class PhotFeatures(object):
+    """Memoize photometric features (magnitudes, colors, shifted fluxes).
+
+    Within a ``with PhotFeatures():`` block, functions such as
+    :func:`shift_photo_north`, :func:`_mag` and :func:`_getColors` only
+    compute their result once for a given set of input arrays, so that,
+    e.g., each target class doesn't re-derive the same magnitudes.
+
+    Notes
+    -----
+    - Only arrays passed to :meth:`register` (and the memoized outputs
+      derived from them) are memoized. They're keyed by name, not by
+      identity, and are read-only for the duration of the block, so a
+      feature can't be silently stale.
+    - Features derived within a :meth:`scope` from row subsets (see
+      :func:`_take`) are dropped when the scope exits, so that only
+      features of the full input arrays are retained across classes.
+    - The active instance is per-thread.
+    """
+    _local = threading.local()
+
+    def __init__(self):
+        self._cache = {}
+        self._names = {}
+        self._level = 0
+        self._writeable = []
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = PhotFeatures.active()
+        PhotFeatures._local.features = self
+        return self
+
+    def __exit__(self, *args):
+        PhotFeatures._local.features = self._previous
+        for array in self._writeable:
+            array.flags.writeable = True
+        self._cache, self._names, self._writeable = {}, {}, []
+
+    @staticmethod
+    def active():
+        """The :class:`PhotFeatures` instance in use, or ``None``."""
+        return getattr(PhotFeatures._local, "features", None)
+
+    def _name(self, array, name, level):
+        """Record `array` as `name` at scope `level`, and make it read-only."""
+        array.flags.writeable = False
+        # ADM retain the array, so that its id can't be reused.
+        self._names[id(array)] = (name, level, array)
+
+    def register(self, **arrays):
+        """Register named input arrays whose features can be memoized.
+
+        Parameters
+        ----------
+        **arrays
+            Input arrays (e.g. ``gflux=gflux``). Non-array values are
+            ignored.
+        """
+        for name, array in arrays.items():
+            if isinstance(array, np.ndarray) and array.ndim > 0:
+                if array.flags.writeable:
+                    self._writeable.append(array)
+                self._name(array, name, self._level)
+
+    @contextmanager
+    def scope(self):
+        """Drop the row-subset features computed in the block on exit.
+        """
+        self._level += 1
+        try:
+            yield self
+        finally:
+            self._level -= 1
+            self._cache = {key: value for key, value in self._cache.items()
+                           if value[0] <= self._level}
+            self._names = {key: value for key, value in self._names.items()
+                           if value[1] <= self._level}
+
+    def get(self, func, args, kwargs, subset=False):
+        """Return ``func(*args, **kwargs)``, only calling `func` once.
+
+        Calls with an unregistered array or an unhashable value as an
+        input aren't memoized. If `subset` is ``True`` the output is a
+        row subset, which is only retained for the current :meth:`scope`.
+        """
+        levels = [0]
+
+        def _key(arg):
+            if isinstance(arg, np.ndarray):
+                name, level, _ = self._names[id(arg)]
+                levels.append(level)
+                return name
+            return arg
+
+        try:
+            key = (func, tuple(_key(arg) for arg in args),
+                   tuple((k, _key(kwargs[k])) for k in sorted(kwargs)))
+            hash(key)
+        except (KeyError, TypeError):
+            return func(*args, **kwargs)
+
+        if key in self._cache:
+            return self._cache[key][1]
+
+        feature = func(*args, **kwargs)
+        level = self._level if subset else max(levels)
+        # ADM name the outputs, so that features of features are memoized.
+        if isinstance(feature, tuple):
+            for i, array in enumerate(feature):
+                if isinstance(array, np.ndarray):
+                    self._name(array, (key, i), level)
+        elif isinstance(feature, np.ndarray):
+            self._name(feature, key, level)
+        self._cache[key] = (level, feature)
+
+        return feature
+
+
+def _photfeature(func=None, subset=False):
+    """Decorator to memoize `func` in the active :class:`PhotFeatures`.
+
+    If `subset` is ``True``, `func` returns a subset of rows, which is
+    only memoized for the current :meth:`PhotFeatures.scope`.
+    """
+    if func is None:
+        return partial(_photfeature, subset=subset)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        features = PhotFeatures.active()
+        if features is None:
+            return func(*args, **kwargs)
+        return features.get(func, args, kwargs, subset=subset)
+
+    return wrapper
+
+
+def _register_features(**arrays):
+    """Register arrays with the active :class:`PhotFeatures`, if any."""
+    features = PhotFeatures.active()
+    if features is not None:
+        features.register(**arrays)
+
+
+def _with_photfeatures(func):
+    """Decorator to run `func` with its own active :class:`PhotFeatures`."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with PhotFeatures():
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+cut_backends = ['numpy', 'blocks']
+
+
+class CutBackend(object):
+    """How the color cuts (e.g. :func:`isLRG_colors`) are evaluated.
+
+    Within a ``with CutBackend('blocks'):`` block, the color cuts are
+    evaluated on consecutive blocks of (at most) `blocksize` rows, so
+    that the temporary arrays created by each expression in a cut stay
+    small enough to remain in cache, rather than spanning every row.
+    With ``'numpy'`` (or outside of such a block), every expression is
+    evaluated on the full arrays.
+
+    Parameters
+    ----------
+    backend : :class:`str`, optional, defaults to ``'blocks'``
+        One of ``'numpy'`` or ``'blocks'``.
+    blocksize : :class:`int`, optional
+        The number of rows in each block. Defaults to the class
+        attribute `blocksize`.
+
+    Notes
+    -----
+    - Every color cut only depends on the row itself, so the output is
+      identical for either backend.
+    - The active instance is per-thread.
+    """
+    _local = threading.local()
+    blocksize = 2**14
+
+    def __init__(self, backend='blocks', blocksize=None):
+        if backend not in cut_backends:
+            msg = "backend must be one of {}, not {}".format(cut_backends, backend)
+            log.critical(msg)
+            raise ValueError(msg)
+        self.backend = backend
+        if blocksize is not None:
+            self.blocksize = blocksize
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = CutBackend.active()
+        CutBackend._local.backend = self
+        return self
+
+    def __exit__(self, *args):
+        CutBackend._local.backend = self._previous
+
+    @staticmethod
+    def active():
+        """The :class:`CutBackend` instance in use, or ``None``."""
+        return getattr(CutBackend._local, "backend", None)
+
+    def evaluate(self, func, signature, args, kwargs):
+        """Return ``func(*args, **kwargs)``, evaluated by this backend.
+
+        `signature` is the :class:`inspect.Signature` of `func`. The
+        input arrays are split into blocks of rows if they all have the
+        same length, otherwise `func` is called on the full arrays.
+        """
+        arguments = signature.bind(*args, **kwargs).arguments
+        arrays = [name for name, value in arguments.items()
+                  if isinstance(value, np.ndarray) and value.ndim > 0]
+        nrows = set(len(arguments[name]) for name in arrays)
+        if self.backend == 'numpy' or len(nrows) != 1:
+            return func(*args, **kwargs)
+        nrows = nrows.pop()
+        if nrows <= self.blocksize:
+            return func(*args, **kwargs)
+
+        outputs = None
+        for begin in range(0, nrows, self.blocksize):
+            end = min(begin + self.blocksize, nrows)
+            blockargs = dict(arguments)
+            for name in arrays:
+                blockargs[name] = arguments[name][begin:end]
+            result = func(**blockargs)
+            single = not isinstance(result, tuple)
+            if single:
+                result = (result,)
+            if outputs is None:
+                outputs = [np.empty(nrows, dtype=r.dtype) for r in result]
+            for output, r in zip(outputs, result):
+                output[begin:end] = r
+
+        if single:
+            return outputs[0]
+        return tuple(outputs)
+
+
+def _cutbackend(func):
+    """Decorator to evaluate the cut `func` by the active :class:`CutBackend`."""
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        backend = CutBackend.active()
+        if backend is None:
+            return func(*args, **kwargs)
+        return backend.evaluate(func, signature, args, kwargs)
+
+    return wrapper
+
+
+@_photfeature
+def _mag(flux, clip):
+    """Magnitude for a flux in nanomaggies, clipped at `clip`."""
+    return 22.5 - 2.5 * np.log10(flux.clip(clip))
+
+
+@_photfeature
+def _where(rows):
+    """Indexes of the ``True`` entries in `rows`."""
+    return np.where(rows)[0]
+
+
+@_photfeature(subset=True)
+def _take(array, ii):
+    """Entries `ii` of `array`."""
+    return array[ii]
+
+
 def shift_photo_north_pure(gflux=None, rflux=None, zflux=None):
     """Same as :func:`~desitarget.cuts.shift_photo_north_pure` accounting for zero fluxes.
 
@@ -93,6 +379,7 @@ def shift_photo_north_pure(gflux=None, rflux=None, zflux=None):
     return gshift, rshift, zshift
 
 
+@_photfeature
 def shift_photo_north(gflux=None, rflux=None, zflux=None):
     """Convert fluxes in the northern (BASS/MzLS) to the southern (DECaLS) system.
 
@@ -264,6 +551,7 @@ def notinLRG_mask(primary=None, rflux=None, zflux=None, w1flux=None,
     return lrg
 
 
+@_cutbackend
 def isLRG_colors(gflux=None, rflux=None, zflux=None, w1flux=None,
                  zfiberflux=None, ggood=None,
                  w2flux=None, primary=None, south=True):
@@ -282,12 +570,12 @@ def isLRG_colors(gflux=None, rflux=None, zflux=None, w1flux=None,
         log.warning('Setting zfiberflux to zflux!!!')
         zfiberflux = zflux.copy()
 
-    gmag = 22.5 - 2.5 * np.log10(gflux.clip(1e-7))
+    gmag = _mag(gflux, 1e-7)
     # ADM safe as these fluxes are set to > 0 in notinLRG_mask.
-    rmag = 22.5 - 2.5 * np.log10(rflux.clip(1e-7))
-    zmag = 22.5 - 2.5 * np.log10(zflux.clip(1e-7))
-    w1mag = 22.5 - 2.5 * np.log10(w1flux.clip(1e-7))
-    zfibermag = 22.5 - 2.5 * np.log10(zfiberflux.clip(1e-7))
+    rmag = _mag(rflux, 1e-7)
+    zmag = _mag(zflux, 1e-7)
+    w1mag = _mag(w1flux, 1e-7)
+    zfibermag = _mag(zfiberflux, 1e-7)
 
     if south:
         lrg &= zmag - w1mag > 0.8 * (rmag-zmag) - 0.6    # non-stellar cut.
@@ -356,6 +644,7 @@ def notinELG_mask(maskbits=None, gsnr=None, rsnr=None, zsnr=None,
     return elg
 
 
+@_cutbackend
 def isELG_colors(gflux=None, rflux=None, zflux=None, w1flux=None,
                  w2flux=None, south=True, primary=None):
     """Color cuts for ELG target selection classes
@@ -367,9 +656,9 @@ def isELG_colors(gflux=None, rflux=None, zflux=None, w1flux=None,
 
     # ADM work in magnitudes instead of fluxes. NOTE THIS IS ONLY OK AS
     # ADM the snr masking in ALL OF g, r AND z ENSURES positive fluxes.
-    g = 22.5 - 2.5*np.log10(gflux.clip(1e-16))
-    r = 22.5 - 2.5*np.log10(rflux.clip(1e-16))
-    z = 22.5 - 2.5*np.log10(zflux.clip(1e-16))
+    g = _mag(gflux, 1e-16)
+    r = _mag(rflux, 1e-16)
+    z = _mag(zflux, 1e-16)
 
     # ADM cuts shared by the northern and southern selections.
     elg &= g > 20                       # bright cut.
@@ -614,7 +903,7 @@ def isSTD(gflux=None, rflux=None, zflux=None, primary=None,
         std &= gaiagmag < gfaint
     else:
         # Use LS r-band as a Gaia G-band proxy.
-        gaiamag_proxy = 22.5 - 2.5 * np.log10(rflux.clip(1e-16))
+        gaiamag_proxy = _mag(rflux, 1e-16)
         std &= gaiamag_ >= gbright
         std &= gaiamag_ < gfaint
 
@@ -689,6 +978,7 @@ def notinMWS_main_mask(gaia=None, gfracmasked=None, gnobs=None, gflux=None,
     return mws
 
 
+@_cutbackend
 def isMWS_main_colors(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=None,
                       pmra=None, pmdec=None, parallax=None, parallaxerr=None,
                       obs_rflux=None, objtype=None, paramssolved=None,
@@ -1046,6 +1336,7 @@ def notinBGS_mask(gnobs=None, rnobs=None, znobs=None, primary=None,
     return bgs
 
 
+@_cutbackend
 def isBGS_colors(rfiberflux=None, gflux=None, rflux=None, zflux=None, w1flux=None,
                  w2flux=None, south=True, targtype=None, primary=None):
     """Standard set of color-based cuts used by all BGS target selection classes
@@ -1074,10 +1365,10 @@ def isBGS_colors(rfiberflux=None, gflux=None, rflux=None, zflux=None, w1flux=Non
         bgs &= zflux > rflux * 10**(-1.0/2.5)
         bgs &= zflux < rflux * 10**(4.0/2.5)
 
-    g = 22.5 - 2.5*np.log10(gflux.clip(1e-16))
-    r = 22.5 - 2.5*np.log10(rflux.clip(1e-16))
-    z = 22.5 - 2.5*np.log10(zflux.clip(1e-16))
-    rfib = 22.5 - 2.5*np.log10(rfiberflux.clip(1e-16))
+    g = _mag(gflux, 1e-16)
+    r = _mag(rflux, 1e-16)
+    z = _mag(zflux, 1e-16)
+    rfib = _mag(rfiberflux, 1e-16)
 
     # Fibre Magnitude Cut (FMC) -- This is a low surface brightness cut
     # with the aim of increase the redshift success rate.
@@ -1191,6 +1482,7 @@ def isQSO_cuts(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=None,
     return qso
 
 
+@_cutbackend
 def isQSO_colors(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=None,
                  optical=False, south=True):
     """Tests if sources have quasar-like colors in a color box.
@@ -1291,7 +1583,7 @@ def isQSO_randomforest(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=N
 
     if np.any(preSelection):
 
-        from desitarget.myRF import myRF
+        from desitarget.myRF import load_forest, load_forests
 
         # Data reduction to preselected objects
         colorsReduced = colors[preSelection]
@@ -1309,33 +1601,22 @@ def isQSO_randomforest(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=N
 
         tmpReleaseOK = releaseReduced < 5000
         if np.any(tmpReleaseOK):
-            # rf initialization - colors data duplicated within "myRF"
-            rf_DR3 = myRF(colorsReduced[tmpReleaseOK], pathToRF,
-                          numberOfTrees=200, version=1)
-            # rf loading
-            rf_DR3.loadForest(rf_DR3_fileName)
-            # Compute rf probabilities
-            tmp_rf_proba = rf_DR3.predict_proba()
+            # rf loading (once per process)
+            rf_DR3 = load_forest(rf_DR3_fileName, numberOfTrees=200, version=1)
             tmp_r_Reduced = r_Reduced[tmpReleaseOK]
             # Compute optimized proba cut
             pcut = np.where(tmp_r_Reduced > 20.0,
                             0.95 - (tmp_r_Reduced - 20.0) * 0.08, 0.95)
             # Add rf proba test result to "qso" mask
-            qso[colorsReducedIndex[tmpReleaseOK]] = tmp_rf_proba >= pcut
+            qso[colorsReducedIndex[tmpReleaseOK]] = \
+                rf_DR3.predict_threshold(colorsReduced[tmpReleaseOK], pcut)
 
         tmpReleaseOK = releaseReduced >= 5000
         if np.any(tmpReleaseOK):
-            # rf initialization - colors data duplicated within "myRF"
-            rf = myRF(colorsReduced[tmpReleaseOK], pathToRF,
-                      numberOfTrees=500, version=2)
-            rf_HighZ = myRF(colorsReduced[tmpReleaseOK], pathToRF,
-                            numberOfTrees=500, version=2)
-            # rf loading
-            rf.loadForest(rf_fileName)
-            rf_HighZ.loadForest(rf_HighZ_fileName)
-            # Compute rf probabilities
-            tmp_rf_proba = rf.predict_proba()
-            tmp_rf_HighZ_proba = rf_HighZ.predict_proba()
+            # rf loading (once per process)
+            # ADM the main and HighZ forests are evaluated in one pass.
+            rf = load_forests([rf_fileName, rf_HighZ_fileName],
+                              numberOfTrees=500, version=2)
             # Compute optimized proba cut
             tmp_r_Reduced = r_Reduced[tmpReleaseOK]
             pcut = np.where(tmp_r_Reduced > 20.8,
@@ -1346,8 +1627,9 @@ def isQSO_randomforest(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=N
                                   0.55 - (tmp_r_Reduced - 20.5) * 0.025, 0.55)
 
             # Add rf proba test result to "qso" mask
-            qso[colorsReducedIndex[tmpReleaseOK]] = \
-                (tmp_rf_proba >= pcut) | (tmp_rf_HighZ_proba >= pcut_HighZ)
+            # ADM objects pass if they pass either the main or HighZ cut.
+            qso[colorsReducedIndex[tmpReleaseOK]] = rf.predict_threshold(
+                colorsReduced[tmpReleaseOK], [pcut, pcut_HighZ])
 
     # In case of call for a single object passed to the function with scalar arguments
     # Return "numpy.bool_" instead of "~numpy.ndarray"
@@ -1357,6 +1639,30 @@ def isQSO_randomforest(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=N
     return qso
 
 
+def _preload_qso_forests(shared=True):
+    """Load the DR7 QSO random forests into the process-wide registry.
+
+    Parameters
+    ----------
+    shared : :class:`boolean`, optional, defaults to ``True``
+        If ``True``, store the forests in shared memory. Intended to be
+        called in a parent process before forking workers, so that each
+        worker process doesn't hold its own decompressed copy.
+
+    Returns
+    -------
+    Nothing, but the forests used by, e.g.,
+    :func:`~desitarget.cuts.isQSO_randomforest` are loaded.
+    """
+    from desitarget.myRF import load_forests
+
+    pathToRF = resource_filename('desitarget', 'data')
+    # ADM the main and HighZ forests are used as a joint forest.
+    fns = [os.path.join(pathToRF, fn)
+           for fn in ['rf_model_dr7.npz', 'rf_model_dr7_HighZ.npz']]
+    load_forests(fns, numberOfTrees=500, version=2, shared=shared)
+
+
 def _psflike(psftype):
     """ If the object is PSF """
     # ADM explicitly checking for NoneType. I can't see why we'd ever want to
@@ -1394,17 +1700,11 @@ def _isonnorthphotsys(photsys):
 def _getColors(nbEntries, nfeatures, gflux, rflux, zflux, w1flux, w2flux):
 
     limitInf = 1.e-04
-    gflux = gflux.clip(limitInf)
-    rflux = rflux.clip(limitInf)
-    zflux = zflux.clip(limitInf)
-    w1flux = w1flux.clip(limitInf)
-    w2flux = w2flux.clip(limitInf)
-
-    g = np.where(gflux > limitInf, 22.5-2.5*np.log10(gflux), 0.)
-    r = np.where(rflux > limitInf, 22.5-2.5*np.log10(rflux), 0.)
-    z = np.where(zflux > limitInf, 22.5-2.5*np.log10(zflux), 0.)
-    W1 = np.where(w1flux > limitInf, 22.5-2.5*np.log10(w1flux), 0.)
-    W2 = np.where(w2flux > limitInf, 22.5-2.5*np.log10(w2flux), 0.)
+    g = np.where(gflux > limitInf, _mag(gflux, limitInf), 0.)
+    r = np.where(rflux > limitInf, _mag(rflux, limitInf), 0.)
+    z = np.where(zflux > limitInf, _mag(zflux, limitInf), 0.)
+    W1 = np.where(w1flux > limitInf, _mag(w1flux, limitInf), 0.)
+    W2 = np.where(w2flux > limitInf, _mag(w2flux, limitInf), 0.)
 
     photOK = (g > 0.) & (r > 0.) & (z > 0.) & (W1 > 0.) & (W2 > 0.)
 
@@ -1451,6 +1751,125 @@ def _get_colnames(objects):
     return colnames
 
 
+# ADM the sweeps columns needed to run any target class, or to
+# ADM finalize and resolve targets (see _target_columns).
+_base_columns = ['RELEASE', 'BRICKID', 'OBJID', 'RA', 'DEC',
+                 'FLUX_G', 'FLUX_R', 'FLUX_Z', 'MW_TRANSMISSION_G',
+                 'MW_TRANSMISSION_R', 'MW_TRANSMISSION_Z']
+# ADM the Gaia columns needed for MWS and STD target selection.
+_gaia_columns = ['REF_ID', 'REF_CAT', 'PMRA', 'PMRA_IVAR', 'PMDEC',
+                 'PARALLAX', 'PARALLAX_IVAR', 'GAIA_PHOT_G_MEAN_MAG',
+                 'GAIA_PHOT_BP_MEAN_MAG', 'GAIA_PHOT_RP_MEAN_MAG',
+                 'GAIA_ASTROMETRIC_EXCESS_NOISE', 'GAIA_DUPLICATED_SOURCE',
+                 'GAIA_ASTROMETRIC_PARAMS_SOLVED',
+                 'GAIA_PHOT_BP_RP_EXCESS_FACTOR',
+                 'GAIA_ASTROMETRIC_SIGMA5D_MAX']
+# ADM the additional columns needed for each target class, for either
+# ADM the main survey or SV.
+_tc_columns = {
+    "LRG": ['FLUX_W1', 'MW_TRANSMISSION_W1', 'FIBERFLUX_R', 'FIBERFLUX_Z',
+            'FLUX_IVAR_G', 'FLUX_IVAR_R', 'FLUX_IVAR_Z', 'FLUX_IVAR_W1'],
+    "ELG": ['FIBERFLUX_G', 'FLUX_IVAR_G', 'FLUX_IVAR_R', 'FLUX_IVAR_Z',
+            'NOBS_G', 'NOBS_R', 'NOBS_Z', 'MASKBITS'],
+    "QSO": ['FLUX_W1', 'FLUX_W2', 'MW_TRANSMISSION_W1', 'MW_TRANSMISSION_W2',
+            'TYPE', 'DCHISQ', 'MASKBITS'],
+    "BGS": ['FLUX_W1', 'FLUX_W2', 'MW_TRANSMISSION_W1', 'MW_TRANSMISSION_W2',
+            'FIBERFLUX_R', 'TYPE', 'NOBS_G', 'NOBS_R', 'NOBS_Z',
+            'FRACMASKED_G', 'FRACMASKED_R', 'FRACMASKED_Z',
+            'FRACFLUX_G', 'FRACFLUX_R', 'FRACFLUX_Z',
+            'FRACIN_G', 'FRACIN_R', 'FRACIN_Z', 'FLUX_IVAR_G', 'FLUX_IVAR_R',
+            'FLUX_IVAR_Z', 'FLUX_IVAR_W1', 'MASKBITS', 'REF_CAT',
+            'GAIA_PHOT_G_MEAN_MAG'],
+    "MWS": ['TYPE', 'NOBS_G', 'NOBS_R', 'FRACMASKED_G', 'FRACMASKED_R'] +
+    _gaia_columns,
+    "STD": ['TYPE', 'NOBS_G', 'NOBS_R', 'NOBS_Z',
+            'FRACMASKED_G', 'FRACMASKED_R', 'FRACMASKED_Z',
+            'FRACFLUX_G', 'FRACFLUX_R', 'FRACFLUX_Z',
+            'FLUX_IVAR_G', 'FLUX_IVAR_R', 'FLUX_IVAR_Z'] + _gaia_columns
+}
+
+
+def _add_gaia_columns(objects):
+    """Match objects to Gaia and populate their Gaia columns in-place.
+
+    Parameters
+    ----------
+    objects : :class:`~numpy.ndarray`
+        numpy structured array with UPPERCASE columns, including RA, DEC
+        and the Gaia columns (see :func:`_target_columns`).
+
+    Returns
+    -------
+    :class:`list`
+        The names of the Gaia columns of `objects`, which are
+        overwritten in-place.
+    """
+    log.info('Matching Gaia to {} primary objects...t = {:.1f}s'
+             .format(len(objects), time()-start))
+    gaiainfo = match_gaia_to_primary(objects)
+    log.info('Done with Gaia match for {} primary objects...t = {:.1f}s'
+             .format(len(objects), time()-start))
+    # ADM remove the GAIA_RA, GAIA_DEC columns as they aren't
+    # ADM in the imaging surveys data model.
+    gaiainfo = pop_gaia_coords(gaiainfo)
+    # ADM if we need to match to Gaia, stick to the first Gaia data model
+    # ADM that we adopted for DR7.
+    gaiainfo = pop_gaia_columns(
+        gaiainfo,
+        ['REF_CAT', 'GAIA_PHOT_BP_RP_EXCESS_FACTOR',
+         'GAIA_ASTROMETRIC_SIGMA5D_MAX', 'GAIA_ASTROMETRIC_PARAMS_SOLVED']
+    )
+    # ADM add the Gaia column information to the primary array.
+    for col in gaiainfo.dtype.names:
+        objects[col] = gaiainfo[col]
+
+    return list(gaiainfo.dtype.names)
+
+
+def _target_columns(tcnames=["ELG", "QSO", "LRG", "MWS", "BGS", "STD"],
+                    survey='main', qso_selection='randomforest',
+                    gaiamatch=False):
+    """The minimal set of sweeps columns needed to select targets.
+
+    Parameters
+    ----------
+    tcnames : :class:`list`, defaults to running all target classes
+        A list of strings, e.g. ['QSO','LRG'], as for :func:`apply_cuts`.
+    survey : :class:`str`, defaults to ``'main'``
+        The survey, as for :func:`apply_cuts`.
+    qso_selection : :class:`str`, optional, defaults to ``'randomforest'``
+        The algorithm to use for QSO selection, as for :func:`apply_cuts`.
+    gaiamatch : :class:`boolean`, optional, defaults to ``False``
+        If ``True``, also include every Gaia column, as Gaia-matching
+        populates them (see :func:`apply_cuts`).
+
+    Returns
+    -------
+    :class:`list`
+        The columns needed by :func:`apply_cuts` to select targets of
+        the classes in `tcnames`, as well as the columns needed by
+        :func:`~desitarget.targets.finalize` and
+        :func:`~desitarget.targets.resolve`.
+    """
+    columns = set(_base_columns)
+    for tcname in tcnames:
+        columns |= set(_tc_columns[tcname])
+
+    # ADM the QSO color cuts (and the SV QSO cuts) also use the
+    # ADM signal-to-noise in each band.
+    if "QSO" in tcnames:
+        if qso_selection == 'colorcuts' or survey != 'main':
+            columns |= set(['FLUX_IVAR_W1', 'FLUX_IVAR_W2'])
+        if survey != 'main':
+            columns |= set(['FLUX_IVAR_G', 'FLUX_IVAR_R', 'FLUX_IVAR_Z'])
+
+    if gaiamatch:
+        from desitarget.gaiamatch import gaiadatamodel
+        columns |= set(pop_gaia_coords(gaiadatamodel).dtype.names)
+
+    return sorted(columns)
+
+
 def _prepare_optical_wise(objects, mask=True):
     """Process the Legacy Surveys inputs for target selection.
 
@@ -1481,6 +1900,21 @@ def _prepare_optical_wise(objects, mask=True):
 #        objects["FLUX_R"][wnorth] = rshift
 #        objects["FLUX_Z"][wnorth] = zshift
 
+    # ADM columns that weren't read (see _target_columns) are returned
+    # ADM as None, as they aren't needed by the requested target classes.
+    colnames = _get_colnames(objects)
+
+    def _col(colname):
+        if colname in colnames:
+            return objects[colname]
+        return None
+
+    def _snr(band):
+        if "FLUX_IVAR_{}".format(band) in colnames:
+            return objects['FLUX_{}'.format(band)] * \
+                np.sqrt(objects['FLUX_IVAR_{}'.format(band)])
+        return None
+
     # ADM the observed r-band flux (used for F standards and MWS, below)
     # ADM make copies of values that we may reassign due to NaNs
     obs_rflux = objects['FLUX_R']
@@ -1491,61 +1925,63 @@ def _prepare_optical_wise(objects, mask=True):
     gflux = flux['GFLUX']
     rflux = flux['RFLUX']
     zflux = flux['ZFLUX']
-    w1flux = flux['W1FLUX']
-    w2flux = flux['W2FLUX']
-    gfiberflux = flux['GFIBERFLUX']
-    rfiberflux = flux['RFIBERFLUX']
-    zfiberflux = flux['ZFIBERFLUX']
-    objtype = objects['TYPE']
+    w1flux, w2flux = [flux[fn] if cn in colnames else None for fn, cn in
+                      [('W1FLUX', 'FLUX_W1'), ('W2FLUX', 'FLUX_W2')]]
+    gfiberflux, rfiberflux, zfiberflux = [
+        flux[fn] if cn in colnames else None for fn, cn in
+        [('GFIBERFLUX', 'FIBERFLUX_G'), ('RFIBERFLUX', 'FIBERFLUX_R'),
+         ('ZFIBERFLUX', 'FIBERFLUX_Z')]]
+    objtype = _col('TYPE')
     release = objects['RELEASE']
 
-    gfluxivar = objects['FLUX_IVAR_G']
-    rfluxivar = objects['FLUX_IVAR_R']
-    zfluxivar = objects['FLUX_IVAR_Z']
+    gfluxivar = _col('FLUX_IVAR_G')
+    rfluxivar = _col('FLUX_IVAR_R')
+    zfluxivar = _col('FLUX_IVAR_Z')
 
-    gnobs = objects['NOBS_G']
-    rnobs = objects['NOBS_R']
-    znobs = objects['NOBS_Z']
+    gnobs = _col('NOBS_G')
+    rnobs = _col('NOBS_R')
+    znobs = _col('NOBS_Z')
 
-    gfracflux = objects['FRACFLUX_G']
-    rfracflux = objects['FRACFLUX_R']
-    zfracflux = objects['FRACFLUX_Z']
+    gfracflux = _col('FRACFLUX_G')
+    rfracflux = _col('FRACFLUX_R')
+    zfracflux = _col('FRACFLUX_Z')
 
-    gfracmasked = objects['FRACMASKED_G']
-    rfracmasked = objects['FRACMASKED_R']
-    zfracmasked = objects['FRACMASKED_Z']
+    gfracmasked = _col('FRACMASKED_G')
+    rfracmasked = _col('FRACMASKED_R')
+    zfracmasked = _col('FRACMASKED_Z')
 
-    gfracin = objects['FRACIN_G']
-    rfracin = objects['FRACIN_R']
-    zfracin = objects['FRACIN_Z']
+    gfracin = _col('FRACIN_G')
+    rfracin = _col('FRACIN_R')
+    zfracin = _col('FRACIN_Z')
 
-    gallmask = objects['ALLMASK_G']
-    rallmask = objects['ALLMASK_R']
-    zallmask = objects['ALLMASK_Z']
+    gallmask = _col('ALLMASK_G')
+    rallmask = _col('ALLMASK_R')
+    zallmask = _col('ALLMASK_Z')
 
-    gsnr = objects['FLUX_G'] * np.sqrt(objects['FLUX_IVAR_G'])
-    rsnr = objects['FLUX_R'] * np.sqrt(objects['FLUX_IVAR_R'])
-    zsnr = objects['FLUX_Z'] * np.sqrt(objects['FLUX_IVAR_Z'])
-    w1snr = objects['FLUX_W1'] * np.sqrt(objects['FLUX_IVAR_W1'])
-    w2snr = objects['FLUX_W2'] * np.sqrt(objects['FLUX_IVAR_W2'])
+    gsnr = _snr('G')
+    rsnr = _snr('R')
+    zsnr = _snr('Z')
+    w1snr = _snr('W1')
+    w2snr = _snr('W2')
 
-    refcat = objects['REF_CAT']
+    refcat = _col('REF_CAT')
 
-    maskbits = objects['MASKBITS']
+    maskbits = _col('MASKBITS')
     # ADM if we asked to turn off masking behavior, turn it off.
-    if not mask:
+    if not mask and maskbits is not None:
         maskbits = objects['MASKBITS'].copy()
         maskbits[...] = 0
 
     # Delta chi2 between PSF and SIMP morphologies; note the sign....
-    dchisq = objects['DCHISQ']
-    deltaChi2 = dchisq[..., 0] - dchisq[..., 1]
+    dchisq, deltaChi2 = _col('DCHISQ'), None
+    if dchisq is not None:
+        deltaChi2 = dchisq[..., 0] - dchisq[..., 1]
 
-    # ADM remove handful of NaN values from DCHISQ values and make them unselectable.
-    w = np.where(deltaChi2 != deltaChi2)
-    # ADM this is to catch the single-object case for unit tests.
-    if len(w[0]) > 0:
-        deltaChi2[w] = -1e6
+        # ADM remove handful of NaN values from DCHISQ values and make them unselectable.
+        w = np.where(deltaChi2 != deltaChi2)
+        # ADM this is to catch the single-object case for unit tests.
+        if len(w[0]) > 0:
+            deltaChi2[w] = -1e6
 
     return (photsys_north, photsys_south, obs_rflux, gflux, rflux, zflux,
             w1flux, w2flux, gfiberflux, rfiberflux, zfiberflux,
@@ -1563,6 +1999,33 @@ def _prepare_gaia(objects, colnames=None):
     if colnames is None:
         colnames = _get_colnames(objects)
 
+    # ADM the Gaia G-band magnitude is needed for BGS target selection,
+    # ADM even if the rest of the Gaia columns weren't read.
+    gaiagmag, Grr = None, None
+    if 'GAIA_PHOT_G_MEAN_MAG' in colnames:
+        gaiagmag = objects['GAIA_PHOT_G_MEAN_MAG']
+        # For BGS target selection.
+        # ADM first guard against FLUX_R < 0 (I've checked this generates
+        # ADM the same set of targets as Grr = NaN).
+        Grr = gaiagmag - 22.5 + 2.5*np.log10(1e-16)
+        ii = objects['FLUX_R'] > 0
+        # ADM catch the case where Grr is a scalar.
+        if isinstance(Grr, np.float):
+            if ii:
+                Grr = gaiagmag - 22.5 + 2.5*np.log10(objects['FLUX_R'])
+        else:
+            Grr[ii] = gaiagmag[ii] - 22.5 + 2.5*np.log10(objects['FLUX_R'][ii])
+
+    # ADM Milky Way Selection requires Galactic b
+    _, galb = _gal_coords(objects["RA"], objects["DEC"])
+
+    # ADM if the Gaia astrometry wasn't read (see _target_columns) then
+    # ADM the target classes that need it aren't being run.
+    if 'PARALLAX' not in colnames:
+        return (None, None, None, None, None, None, gaiagmag,
+                None, None, None, None, Grr, None,
+                None, None, galb)
+
     # ADM Add the Gaia columns...
     # ADM if we don't have REF_CAT in the sweeps use the
     # ADM minimum value of REF_ID to identify Gaia sources. This will
@@ -1583,7 +2046,6 @@ def _prepare_gaia(objects, colnames=None):
     notzero = parallaxivar > 0
     if np.sum(notzero) > 0:
         parallaxerr[notzero] = 1 / np.sqrt(parallaxivar[notzero])
-    gaiagmag = objects['GAIA_PHOT_G_MEAN_MAG']
     gaiabmag = objects['GAIA_PHOT_BP_MEAN_MAG']
     gaiarmag = objects['GAIA_PHOT_RP_MEAN_MAG']
     gaiaaen = objects['GAIA_ASTROMETRIC_EXCESS_NOISE']
@@ -1593,18 +2055,6 @@ def _prepare_gaia(objects, colnames=None):
         if len(set(np.atleast_1d(gaiadupsource)) - set([0, 1])) == 0:
             gaiadupsource = objects['GAIA_DUPLICATED_SOURCE'].astype(bool)
 
-    # For BGS target selection.
-    # ADM first guard against FLUX_R < 0 (I've checked this generates
-    # ADM the same set of targets as Grr = NaN).
-    Grr = gaiagmag - 22.5 + 2.5*np.log10(1e-16)
-    ii = objects['FLUX_R'] > 0
-    # ADM catch the case where Grr is a scalar.
-    if isinstance(Grr, np.float):
-        if ii:
-            Grr = gaiagmag - 22.5 + 2.5*np.log10(objects['FLUX_R'])
-    else:
-        Grr[ii] = gaiagmag[ii] - 22.5 + 2.5*np.log10(objects['FLUX_R'][ii])
-
     # ADM If proper motion is not NaN, 31 parameters were solved for
     # ADM in Gaia astrometry. Or, gaiaparamssolved should be 3 for NaNs).
     # ADM In the sweeps, NaN has not been preserved...but PMRA_IVAR == 0
@@ -1630,9 +2080,6 @@ def _prepare_gaia(objects, colnames=None):
     if 'GAIA_ASTROMETRIC_SIGMA5D_MAX' in colnames:
         gaiasigma5dmax = objects['GAIA_ASTROMETRIC_SIGMA5D_MAX']
 
-    # ADM Milky Way Selection requires Galactic b
-    _, galb = _gal_coords(objects["RA"], objects["DEC"])
-
     return (gaia, pmra, pmdec, parallax, parallaxovererror, parallaxerr, gaiagmag,
             gaiabmag, gaiarmag, gaiaaen, gaiadupsource, Grr, gaiaparamssolved,
             gaiabprpfactor, gaiasigma5dmax, galb)
@@ -1659,14 +2106,19 @@ def unextinct_fluxes(objects):
     else:
         result = np.zeros(len(objects), dtype=dtype)
 
-    result['GFLUX'] = objects['FLUX_G'] / objects['MW_TRANSMISSION_G']
-    result['RFLUX'] = objects['FLUX_R'] / objects['MW_TRANSMISSION_R']
-    result['ZFLUX'] = objects['FLUX_Z'] / objects['MW_TRANSMISSION_Z']
-    result['W1FLUX'] = objects['FLUX_W1'] / objects['MW_TRANSMISSION_W1']
-    result['W2FLUX'] = objects['FLUX_W2'] / objects['MW_TRANSMISSION_W2']
-    result['GFIBERFLUX'] = objects['FIBERFLUX_G'] / objects['MW_TRANSMISSION_G']
-    result['RFIBERFLUX'] = objects['FIBERFLUX_R'] / objects['MW_TRANSMISSION_R']
-    result['ZFIBERFLUX'] = objects['FIBERFLUX_Z'] / objects['MW_TRANSMISSION_Z']
+    # ADM fluxes that weren't read (see _target_columns) are left as zero.
+    colnames = _get_colnames(objects)
+    for outcol, fluxcol, mwcol in [
+            ('GFLUX', 'FLUX_G', 'MW_TRANSMISSION_G'),
+            ('RFLUX', 'FLUX_R', 'MW_TRANSMISSION_R'),
+            ('ZFLUX', 'FLUX_Z', 'MW_TRANSMISSION_Z'),
+            ('W1FLUX', 'FLUX_W1', 'MW_TRANSMISSION_W1'),
+            ('W2FLUX', 'FLUX_W2', 'MW_TRANSMISSION_W2'),
+            ('GFIBERFLUX', 'FIBERFLUX_G', 'MW_TRANSMISSION_G'),
+            ('RFIBERFLUX', 'FIBERFLUX_R', 'MW_TRANSMISSION_R'),
+            ('ZFIBERFLUX', 'FIBERFLUX_Z', 'MW_TRANSMISSION_Z')]:
+        if fluxcol in colnames and mwcol in colnames:
+            result[outcol] = objects[fluxcol] / objects[mwcol]
 
     if isinstance(objects, Table):
         return Table(result)
@@ -1674,6 +2126,60 @@ def unextinct_fluxes(objects):
         return result
 
 
+def _select_photsys(func, rows, **kwargs):
+    """Run a target-class selection function on a subset of rows.
+
+    Parameters
+    ----------
+    func : :class:`function`
+        A target-class selection function, e.g. :func:`isLRG`.
+    rows : :class:`~numpy.ndarray` or :class:`bool`
+        ``True`` for the rows on which to run `func`. If every row is
+        ``True`` (or `rows` is a scalar) `func` is run on every row.
+    **kwargs
+        Passed to `func`. Arrays that have the same length as `rows`
+        are restricted to `rows` before being passed.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray` or :class:`list`
+        The output of `func` (a boolean array or a list or tuple of
+        boolean arrays) for every row, with rows not in `rows` set to
+        ``False``.
+    """
+    if np.ndim(rows) == 0 or np.all(rows):
+        return func(**kwargs)
+
+    # ADM the subsets are memoized if there's an active PhotFeatures,
+    # ADM so that derived quantities are shared by the calls within a
+    # ADM target class, and are dropped once the class is done.
+    nrows = len(rows)
+    ii = _where(rows)
+
+    # ADM merge the bits back into arrays that cover every row.
+    def _merge(bits):
+        merged = np.zeros(nrows, dtype='?')
+        merged[ii] = bits
+        return merged
+
+    def _run():
+        for key in kwargs:
+            if isinstance(kwargs[key], np.ndarray) and kwargs[key].ndim > 0:
+                if len(kwargs[key]) == nrows:
+                    kwargs[key] = _take(kwargs[key], ii)
+        return func(**kwargs)
+
+    features = PhotFeatures.active()
+    if features is None:
+        isfunc = _run()
+    else:
+        with features.scope():
+            isfunc = _run()
+    if isinstance(isfunc, (list, tuple)):
+        return type(isfunc)(_merge(bits) for bits in isfunc)
+    return _merge(isfunc)
+
+
 def set_target_bits(photsys_north, photsys_south, obs_rflux,
                     gflux, rflux, zflux, w1flux, w2flux,
                     gfiberflux, rfiberflux, zfiberflux,
@@ -1686,7 +2192,8 @@ def set_target_bits(photsys_north, photsys_south, obs_rflux,
                     gaiagmag, gaiabmag, gaiarmag, gaiaaen, gaiadupsource,
                     gaiaparamssolved, gaiabprpfactor, gaiasigma5dmax, galb,
                     tcnames, qso_optical_cuts, qso_selection,
-                    maskbits, Grr, refcat, primary, resolvetargs=True):
+                    maskbits, Grr, refcat, primary, resolvetargs=True,
+                    splitphotsys=False):
     """Perform target selection on parameters, return target mask arrays.
 
     Parameters
@@ -1762,6 +2269,13 @@ def set_target_bits(photsys_north, photsys_south, obs_rflux,
     resolvetargs : :class:`boolean`, optional, defaults to ``True``
         If ``True``, if only northern (southern) sources are passed then
         only apply the northern (southern) cuts to those sources.
+    splitphotsys : :class:`boolean`, optional, defaults to ``False``
+        If ``True`` (and `resolvetargs` is ``True``), partition mixed
+        northern and southern sources and only apply the northern
+        (southern) cuts to the northern (southern) sources. Halves the
+        work for files that mix photometric systems, but the
+        ``_NORTH`` (``_SOUTH``) bits are then only set for northern
+        (southern) sources.
 
     Returns
     -------
@@ -1784,13 +2298,20 @@ def set_target_bits(photsys_north, photsys_south, obs_rflux,
         # ADM only northern it will be [False], else it wil be both.
         south_cuts = list(set(np.atleast_1d(photsys_south)))
 
+    # ADM if splitphotsys is set, only send northern (southern) objects
+    # ADM through the northern (southern) cuts. The zeroth element
+    # ADM stores the northern objects (south=False).
+    photsys_rows = [True, True]
+    if resolvetargs and splitphotsys:
+        photsys_rows = [photsys_north, photsys_south]
+
     # ADM initially set everything to arrays of False for the LRG selection
     # ADM the zeroth element stores the northern targets bits (south=False).
     lrg_classes = [~primary, ~primary]
     if "LRG" in tcnames:
         for south in south_cuts:
-            lrg_classes[int(south)] = isLRG(
-                primary=primary,
+            lrg_classes[int(south)] = _select_photsys(
+                isLRG, photsys_rows[int(south)], primary=primary,
                 gflux=gflux, rflux=rflux, zflux=zflux, w1flux=w1flux,
                 zfiberflux=zfiberflux,
                 rflux_snr=rsnr, zflux_snr=zsnr, w1flux_snr=w1snr, south=south
@@ -1805,8 +2326,8 @@ def set_target_bits(photsys_north, photsys_south, obs_rflux,
     elg_classes = [~primary, ~primary]
     if "ELG" in tcnames:
         for south in south_cuts:
-            elg_classes[int(south)] = isELG(
-                primary=primary, gflux=gflux, rflux=rflux, zflux=zflux,
+            elg_classes[int(south)] = _select_photsys(
+                isELG, photsys_rows[int(south)], primary=primary, gflux=gflux, rflux=rflux, zflux=zflux,
                 gsnr=gsnr, rsnr=rsnr, zsnr=zsnr,
                 gnobs=gnobs, rnobs=rnobs, znobs=znobs, maskbits=maskbits,
                 south=south
@@ -1823,8 +2344,8 @@ def set_target_bits(photsys_north, photsys_south, obs_rflux,
         for south in south_cuts:
             if qso_selection == 'colorcuts':
                 # ADM determine quasar targets in the north and the south separately
-                qso_classes[int(south)] = isQSO_cuts(
-                    primary=primary, zflux=zflux, rflux=rflux, gflux=gflux,
+                qso_classes[int(south)] = _select_photsys(
+                    isQSO_cuts, photsys_rows[int(south)], primary=primary, zflux=zflux, rflux=rflux, gflux=gflux,
                     w1flux=w1flux, w2flux=w2flux,
                     deltaChi2=deltaChi2, maskbits=maskbits,
                     objtype=objtype, w1snr=w1snr, w2snr=w2snr, release=release,
@@ -1832,8 +2353,8 @@ def set_target_bits(photsys_north, photsys_south, obs_rflux,
                 )
             elif qso_selection == 'randomforest':
                 # ADM determine quasar targets in the north and the south separately
-                qso_classes[int(south)] = isQSO_randomforest(
-                    primary=primary, zflux=zflux, rflux=rflux, gflux=gflux,
+                qso_classes[int(south)] = _select_photsys(
+                    isQSO_randomforest, photsys_rows[int(south)], primary=primary, zflux=zflux, rflux=rflux, gflux=gflux,
                     w1flux=w1flux, w2flux=w2flux,
                     deltaChi2=deltaChi2, maskbits=maskbits,
                     objtype=objtype, release=release, south=south
@@ -1855,8 +2376,8 @@ def set_target_bits(photsys_north, photsys_south, obs_rflux,
             bgs_store = []
             for targtype in ["bright", "faint", "wise"]:
                 bgs_store.append(
-                    isBGS(
-                        rfiberflux=rfiberflux, gflux=gflux, rflux=rflux, zflux=zflux,
+                    _select_photsys(
+                        isBGS, photsys_rows[int(south)], rfiberflux=rfiberflux, gflux=gflux, rflux=rflux, zflux=zflux,
                         w1flux=w1flux, w2flux=w2flux, gnobs=gnobs, rnobs=rnobs, znobs=znobs,
                         gfracmasked=gfracmasked, rfracmasked=rfracmasked, zfracmasked=zfracmasked,
                         gfracflux=gfracflux, rfracflux=rfracflux, zfracflux=zfracflux,
@@ -1897,8 +2418,8 @@ def set_target_bits(photsys_north, photsys_south, obs_rflux,
         )
         # ADM run the MWS target types for (potentially) both north and south.
         for south in south_cuts:
-            mws_classes[int(south)] = isMWS_main(
-                    gaia=gaia, gaiaaen=gaiaaen, gaiadupsource=gaiadupsource,
+            mws_classes[int(south)] = _select_photsys(
+                    isMWS_main, photsys_rows[int(south)], gaia=gaia, gaiaaen=gaiaaen, gaiadupsource=gaiadupsource,
                     gflux=gflux, rflux=rflux, obs_rflux=obs_rflux, objtype=objtype,
                     gnobs=gnobs, rnobs=rnobs, gfracmasked=gfracmasked,
                     rfracmasked=rfracmasked, pmra=pmra, pmdec=pmdec,
@@ -2099,10 +2620,12 @@ def apply_cuts_gaia(numproc=4, survey='main', nside=None, pixlist=None):
     return desi_target, bgs_target, mws_target, gaiaobjs
 
 
+@_with_photfeatures
 def apply_cuts(objects, qso_selection='randomforest', gaiamatch=False,
                tcnames=["ELG", "QSO", "LRG", "MWS", "BGS", "STD"],
                qso_optical_cuts=False, survey='main', resolvetargs=True,
-               mask=True):
+               mask=True, splitphotsys=False, chunksize=None, numthreads=1,
+               cutbackend='blocks'):
     """Perform target selection on objects, returning target mask arrays.
 
     Parameters
@@ -2133,6 +2656,26 @@ def apply_cuts(objects, qso_selection='randomforest', gaiamatch=False,
     mask : :class:`boolean`, optional, defaults to ``True``
         Send ``False`` to turn off any masking cuts based on the `MASKBITS` column. The
         default behavior is to always mask using `MASKBITS`.
+    splitphotsys : :class:`boolean`, optional, defaults to ``False``
+        If ``True``, only apply the northern (southern) cuts to the
+        northern (southern) sources in `objects`. See
+        :func:`~desitarget.cuts.set_target_bits`.
+    chunksize : :class:`int`, optional, defaults to ``None``
+        If passed, process `objects` in blocks of (at most) this many
+        rows, reading each block separately if `objects` is a filename.
+        This bounds the memory used to process large files. The output
+        is identical for any `chunksize`.
+    numthreads : :class:`int`, optional, defaults to 1
+        If more than 1, apply the cuts to blocks of rows of `objects`
+        concurrently, in a pool of this many threads. Blocks are of
+        `chunksize` rows if it's passed, otherwise `objects` is split
+        evenly across the threads. The output is identical for any
+        `numthreads`.
+    cutbackend : :class:`str`, optional, defaults to ``'blocks'``
+        How to evaluate the main survey color cuts. ``'blocks'``
+        evaluates each cut on cache-sized blocks of rows, ``'numpy'``
+        evaluates each cut on the full arrays. The output is identical
+        for either. See :class:`~desitarget.cuts.CutBackend`.
 
     Returns
     -------
@@ -2146,33 +2689,75 @@ def apply_cuts(objects, qso_selection='randomforest', gaiamatch=False,
       converts them to UPPERCASE in-place, thus modifying the input table.
       To avoid this, pass in ``objects.copy()`` instead.
     - See :mod:`desitarget.targetmask` for the definition of each bit.
-
+    - Magnitudes, colors and shifted fluxes are memoized across target
+      classes for the duration of the call (see :class:`PhotFeatures`).
     """
     # - Check if objects is a filename instead of the actual data
+    # ADM if so, only read the columns needed for the requested target
+    # ADM classes (and the Gaia columns, if Gaia-matching).
+    filename = None
     if isinstance(objects, str):
-        objects = io.read_tractor(objects)
+        filename = objects
+        columns = _target_columns(tcnames, survey=survey,
+                                  qso_selection=qso_selection,
+                                  gaiamatch=gaiamatch)
+
+    # ADM if requested, process blocks of rows in turn (or in threads).
+    # ADM Every cut only depends on the row itself, so the bits are the
+    # ADM same as for processing all of the rows at once.
+    if chunksize is not None or numthreads > 1:
+        if chunksize is not None and chunksize < 1:
+            msg = "chunksize must be positive, not {}".format(chunksize)
+            log.critical(msg)
+            raise ValueError(msg)
+        if filename is not None:
+            nrows = fitsio.read_header(filename, 1)["NAXIS2"]
+        elif _is_row(objects):
+            nrows = 1
+        else:
+            nrows = len(objects)
+        blocksize = chunksize
+        if blocksize is None:
+            blocksize = max(1, -(-nrows // numthreads))
+        if nrows > blocksize:
+            blocks = [(begin, min(begin + blocksize, nrows))
+                      for begin in range(0, nrows, blocksize)]
+
+            def _apply_cuts_block(block):
+                begin, end = block
+                if filename is not None:
+                    chunk = io.read_tractor(filename, columns=columns,
+                                            rows=slice(begin, end))
+                else:
+                    chunk = objects[begin:end]
+                return apply_cuts(
+                    chunk, qso_selection=qso_selection, gaiamatch=gaiamatch,
+                    tcnames=tcnames, qso_optical_cuts=qso_optical_cuts,
+                    survey=survey, resolvetargs=resolvetargs, mask=mask,
+                    splitphotsys=splitphotsys, cutbackend=cutbackend)
+
+            if numthreads > 1:
+                with ThreadPoolExecutor(max_workers=numthreads) as executor:
+                    results = list(executor.map(_apply_cuts_block, blocks))
+            else:
+                results = map(_apply_cuts_block, blocks)
+
+            targets = None
+            for (begin, end), bits in zip(blocks, results):
+                if targets is None:
+                    targets = [np.empty(nrows, dtype=b.dtype) for b in bits]
+                for target, b in zip(targets, bits):
+                    target[begin:end] = b
+
+            return tuple(targets)
+
+    if filename is not None:
+        objects = io.read_tractor(filename, columns=columns)
 
     # ADM add Gaia information, if requested, and if we're going to actually
     # ADM process the target classes that need Gaia columns
     if gaiamatch and ("MWS" in tcnames or "STD" in tcnames):
-        log.info('Matching Gaia to {} primary objects...t = {:.1f}s'
-                 .format(len(objects), time()-start))
-        gaiainfo = match_gaia_to_primary(objects)
-        log.info('Done with Gaia match for {} primary objects...t = {:.1f}s'
-                 .format(len(objects), time()-start))
-        # ADM remove the GAIA_RA, GAIA_DEC columns as they aren't
-        # ADM in the imaging surveys data model.
-        gaiainfo = pop_gaia_coords(gaiainfo)
-        # ADM if we need to match to Gaia, stick to the first Gaia data model
-        # ADM that we adopted for DR7.
-        gaiainfo = pop_gaia_columns(
-            gaiainfo,
-            ['REF_CAT', 'GAIA_PHOT_BP_RP_EXCESS_FACTOR',
-             'GAIA_ASTROMETRIC_SIGMA5D_MAX', 'GAIA_ASTROMETRIC_PARAMS_SOLVED']
-        )
-        # ADM add the Gaia column information to the primary array.
-        for col in gaiainfo.dtype.names:
-            objects[col] = gaiainfo[col]
+        _add_gaia_columns(objects)
 
     # - ensure uppercase column names if astropy Table.
     if isinstance(objects, (Table, Row)):
@@ -2198,6 +2783,13 @@ def apply_cuts(objects, qso_selection='randomforest', gaiamatch=False,
         gaiarmag, gaiaaen, gaiadupsource, Grr, gaiaparamssolved, gaiabprpfactor,      \
         gaiasigma5dmax, galb = _prepare_gaia(objects, colnames=colnames)
 
+    # ADM the inputs from which magnitudes, colors etc. are memoized.
+    _register_features(
+        photsys_north=photsys_north, photsys_south=photsys_south,
+        obs_rflux=obs_rflux, gflux=gflux, rflux=rflux, zflux=zflux,
+        w1flux=w1flux, w2flux=w2flux, gfiberflux=gfiberflux,
+        rfiberflux=rfiberflux, zfiberflux=zfiberflux)
+
     # ADM initially, every object passes the cuts (is True).
     # ADM need to guard against the case of a single row being passed.
     if _is_row(objects):
@@ -2216,21 +2808,23 @@ def apply_cuts(objects, qso_selection='randomforest', gaiamatch=False,
         log.critical(msg)
         raise ValueError(msg)
 
-    desi_target, bgs_target, mws_target = targcuts.set_target_bits(
-        photsys_north, photsys_south, obs_rflux,
-        gflux, rflux, zflux, w1flux, w2flux,
-        gfiberflux, rfiberflux, zfiberflux,
-        objtype, release, gfluxivar, rfluxivar, zfluxivar,
-        gnobs, rnobs, znobs, gfracflux, rfracflux, zfracflux,
-        gfracmasked, rfracmasked, zfracmasked,
-        gfracin, rfracin, zfracin, gallmask, rallmask, zallmask,
-        gsnr, rsnr, zsnr, w1snr, w2snr, deltaChi2, dchisq,
-        gaia, pmra, pmdec, parallax, parallaxovererror, parallaxerr,
-        gaiagmag, gaiabmag, gaiarmag, gaiaaen, gaiadupsource,
-        gaiaparamssolved, gaiabprpfactor, gaiasigma5dmax, galb,
-        tcnames, qso_optical_cuts, qso_selection,
-        maskbits, Grr, refcat, primary, resolvetargs=resolvetargs
-    )
+    with CutBackend(cutbackend):
+        desi_target, bgs_target, mws_target = targcuts.set_target_bits(
+            photsys_north, photsys_south, obs_rflux,
+            gflux, rflux, zflux, w1flux, w2flux,
+            gfiberflux, rfiberflux, zfiberflux,
+            objtype, release, gfluxivar, rfluxivar, zfluxivar,
+            gnobs, rnobs, znobs, gfracflux, rfracflux, zfracflux,
+            gfracmasked, rfracmasked, zfracmasked,
+            gfracin, rfracin, zfracin, gallmask, rallmask, zallmask,
+            gsnr, rsnr, zsnr, w1snr, w2snr, deltaChi2, dchisq,
+            gaia, pmra, pmdec, parallax, parallaxovererror, parallaxerr,
+            gaiagmag, gaiabmag, gaiarmag, gaiaaen, gaiadupsource,
+            gaiaparamssolved, gaiabprpfactor, gaiasigma5dmax, galb,
+            tcnames, qso_optical_cuts, qso_selection,
+            maskbits, Grr, refcat, primary, resolvetargs=resolvetargs,
+            splitphotsys=splitphotsys
+        )
 
     return desi_target, bgs_target, mws_target
 
@@ -2238,11 +2832,98 @@ def apply_cuts(objects, qso_selection='randomforest', gaiamatch=False,
 qso_selection_options = ['colorcuts', 'randomforest']
 
 
+def _cached_targets_filename(cachedir, filename, survey='main',
+                             tcnames=["ELG", "QSO", "LRG", "MWS", "BGS", "STD"],
+                             qso_selection='randomforest', mask=True,
+                             resolvetargs=True, gaiamatch=False,
+                             splitphotsys=False):
+    """The name of the cache file of targets for an input file.
+
+    Parameters
+    ----------
+    cachedir : :class:`str`
+        Directory of cached targets.
+    filename : :class:`str`
+        The input (tractor or sweep) file.
+    survey, tcnames, qso_selection, mask, resolvetargs, gaiamatch, splitphotsys
+        As for :func:`select_targets()`.
+
+    Returns
+    -------
+    :class:`str`
+        The full path to the cache file.
+
+    Notes
+    -----
+        - The name includes a hash of the full path, size and
+          modification time of `filename`, the desitarget version and
+          the inputs that change the selection. So, a cache file can
+          only be found if nothing that would change its targets has
+          changed. Stale cache files are simply never read again.
+    """
+    stat = os.stat(filename)
+    key = [os.path.abspath(filename), stat.st_size, stat.st_mtime_ns,
+           desitarget_version, survey, sorted(tcnames), qso_selection,
+           mask, resolvetargs, gaiamatch, splitphotsys]
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()
+    base = os.path.splitext(os.path.basename(filename))[0]
+
+    return os.path.join(cachedir, "{}-{}.npy".format(base, digest))
+
+
+def _unstage_duplicates(stagedfiles, ids, gaiatargets):
+    """Remove duplicates on REF_ID from streamed and Gaia-only targets.
+
+    Parameters
+    ----------
+    stagedfiles : :class:`dict`
+        Staging files of targets, as made by :func:`select_targets()`
+        with `stagedir` passed. Keys are HEALPixels, values are files.
+    ids : :class:`~numpy.ndarray`
+        The "REF_ID" and "TARGETID" of every target with REF_ID > 0
+        that was selected from the sweeps, in the order selected.
+    gaiatargets : :class:`~numpy.ndarray`
+        Gaia-only (backup) targets.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        `gaiatargets` with targets that duplicate sweeps targets removed.
+
+    Notes
+    -----
+        - Mirrors the non-streaming case in :func:`select_targets()`.
+          Only the first occurrence of each REF_ID > 0 is retained,
+          so sweeps information is kept in preference to Gaia-only
+          information. Sweeps targets that duplicate an earlier sweeps
+          target are removed from `stagedfiles` (in-place).
+    """
+    ii = gaiatargets["REF_ID"] > 0
+    refids = np.concatenate([ids["REF_ID"], gaiatargets["REF_ID"][ii]])
+    _, ind = np.unique(refids, return_index=True)
+    keep = np.zeros(len(refids), dtype='bool')
+    keep[ind] = True
+
+    # ADM remove duplicated sweeps targets from the staging files...
+    dups = ids["TARGETID"][~keep[:len(ids)]]
+    if len(dups) > 0:
+        io.remove_staged_targets(stagedfiles, dups)
+
+    # ADM ...and retain only the unique Gaia-only targets.
+    gaiakeep = ~ii
+    gaiakeep[np.where(ii)[0][keep[len(ids):]]] = True
+
+    return gaiatargets[gaiakeep]
+
+
 def select_targets(infiles, numproc=4, qso_selection='randomforest',
                    gaiamatch=False, nside=None, pixlist=None, bundlefiles=None,
                    extra=None, radecbox=None, radecrad=None, mask=True,
                    tcnames=["ELG", "QSO", "LRG", "MWS", "BGS", "STD"],
-                   survey='main', resolvetargs=True, backup=True):
+                   survey='main', resolvetargs=True, backup=True,
+                   hydrate=False, stagedir=None, nsidefile=None,
+                   cachedir=None, splitphotsys=False, chunksize=None,
+                   numthreads=None):
     """Process input files in parallel to select targets.
 
     Parameters
@@ -2294,6 +2975,37 @@ def select_targets(infiles, numproc=4, qso_selection='randomforest',
         and southern targets in southern regions.
     backup : :class:`boolean`, optional, defaults to ``True``
         If ``True``, also run the Gaia-only BACKUP_BRIGHT/FAINT targets.
+    hydrate : :class:`boolean`, optional, defaults to ``False``
+        If ``True``, first read only the columns needed to select
+        targets, then read the rest of the data model for just the rows
+        that are targets. If ``False``, read every column of every row.
+        ``True`` reduces both I/O and memory per process.
+    stagedir : :class:`str`, optional, defaults to `None`
+        If passed, stream targets to files in this directory, partitioned
+        into HEALPixels at `nsidefile`, as each input file is processed,
+        instead of returning an array of all of the targets.
+    nsidefile : :class:`int`, optional, defaults to `None`
+        The (NESTED) HEALPixel nside at which to partition targets in
+        `stagedir`. Must be passed together with `stagedir`.
+    cachedir : :class:`str`, optional, defaults to `None`
+        If passed, cache the targets selected from each input file in
+        this directory, and reuse them (instead of reprocessing the input
+        file) on later runs with the same inputs. Useful for resuming a
+        run that died, or rerunning after a few input files changed.
+    splitphotsys : :class:`boolean`, optional, defaults to ``False``
+        If ``True`` (and `resolvetargs` is ``True``), only apply the
+        northern (southern) cuts to northern (southern) sources, rather
+        than applying both to files that mix photometric systems. See
+        :func:`~desitarget.cuts.set_target_bits`.
+    chunksize : :class:`int`, optional, defaults to ``None``
+        If passed, apply the cuts to blocks of (at most) this many rows of
+        each input file in turn, to bound the memory used by each process.
+        See :func:`~desitarget.cuts.apply_cuts`.
+    numthreads : :class:`int`, optional, defaults to ``None``
+        The number of threads with which to process each input file (see
+        :func:`~desitarget.cuts.apply_cuts`). Pass 1 to not use threads.
+        If ``None``, use `numproc` // (number of files) threads if
+        `numproc` exceeds the number of input files, otherwise 1.
 
     Returns
     -------
@@ -2301,12 +3013,26 @@ def select_targets(infiles, numproc=4, qso_selection='randomforest',
         The subset of input targets which pass the cuts, including extra
         columns for ``DESI_TARGET``, ``BGS_TARGET``, and ``MWS_TARGET`` target
         selection bitmasks.
+    :class:`dict`
+        If `stagedir` is passed, instead return a dictionary where the keys
+        are HEALPixels at `nsidefile` and the values are the file in
+        `stagedir` that holds the targets in each HEALPixel.
 
     Notes
     -----
         - if numproc==1, use serial code instead of parallel.
+        - by default, if `numproc` exceeds the number of input files,
+          each file is processed by `numproc` // (number of files)
+          threads, see the `numthreads` keyword.
         - only one of pixlist, radecbox, radecrad should be passed. They are all
           intended to denote regions on the sky, using different formalisms.
+        - if `stagedir` is passed, the full set of targets is never held in
+          memory. The staged files contain the same targets that would be
+          returned if `stagedir` was not passed, but not in the same order.
+        - cached targets are only reused if the input file (its path, size
+          and modification time), the desitarget version, `survey`,
+          `tcnames`, `qso_selection`, `mask`, `resolvetargs`, `gaiamatch`
+          and `splitphotsys` are all unchanged. See :func:`_cached_targets_filename()`.
     """
     from desiutil.log import get_logger
     log = get_logger()
@@ -2324,6 +3050,19 @@ def select_targets(infiles, numproc=4, qso_selection='randomforest',
             log.critical(msg)
             raise ValueError(msg)
 
+    # ADM check that stagedir and nsidefile were sent together, and that
+    # ADM we won't append targets to the files from a previous run.
+    if (stagedir is None) != (nsidefile is None):
+        msg = 'Both stagedir (={}) and nsidefile (={}) need to be set' \
+            .format(stagedir, nsidefile)
+        log.critical(msg)
+        raise ValueError(msg)
+    if stagedir is not None:
+        if len(glob(io._staged_targets_filename(stagedir, "*"))) > 0:
+            msg = "{} already contains staged targets".format(stagedir)
+            log.critical(msg)
+            raise ValueError(msg)
+
     # ADM check that only one of pixlist, radecrad, radecbox was sent.
     inputs = [ins for ins in (pixlist, radecbox, radecrad) if ins is not None]
     if len(inputs) > 1:
@@ -2383,17 +3122,13 @@ def select_targets(infiles, numproc=4, qso_selection='randomforest',
                           gaiadr=None):
         # - desi_target includes BGS_ANY and MWS_ANY, so we can filter just
         # - on desi_target != 0
+        # ADM finalize only copies the kept rows.
         keep = (desi_target != 0)
-        objects = objects[keep]
-        desi_target = desi_target[keep]
-        bgs_target = bgs_target[keep]
-        mws_target = mws_target[keep]
-        if gaiadr is not None:
-            gaiadr = gaiadr[keep]
 
         # - Add *_target mask columns
         targets = finalize(objects, desi_target, bgs_target, mws_target,
-                           survey=survey, darkbright=True, gaiadr=gaiadr)
+                           survey=survey, darkbright=True, gaiadr=gaiadr,
+                           keep=keep)
 
         # ADM resolve any duplicates between imaging data releases.
         if resolvetargs and gaiadr is None:
@@ -2401,17 +3136,112 @@ def select_targets(infiles, numproc=4, qso_selection='randomforest',
 
         return targets
 
+    if cachedir is not None:
+        os.makedirs(cachedir, exist_ok=True)
+
+    # ADM if there are more processors than files (e.g. for a small
+    # ADM region), use the spare processors as threads within each
+    # ADM file, unless the number of threads was passed.
+    numfileproc = numproc
+    if 0 < len(infiles) < numproc:
+        numfileproc = len(infiles)
+        if numthreads is None:
+            numthreads = numproc // len(infiles)
+    if numthreads is None:
+        numthreads = 1
+    if numthreads > 1:
+        log.info('Using {} threads for each of {} files'
+                 .format(numthreads, numfileproc))
+
     # - functions to run on every brick/sweep file
     def _select_targets_file(filename):
         '''Returns targets in filename that pass the cuts'''
-        objects = io.read_tractor(filename)
+        # ADM if these targets were already selected, reuse them.
+        if cachedir is not None:
+            cachefile = _cached_targets_filename(
+                cachedir, filename, survey=survey, tcnames=tcnames,
+                qso_selection=qso_selection, mask=mask,
+                resolvetargs=resolvetargs, gaiamatch=gaiamatch,
+                splitphotsys=splitphotsys)
+            if os.path.exists(cachefile):
+                return np.load(cachefile)
+
+        # ADM if hydrating, apply_cuts only reads the columns needed
+        # ADM to select targets (in blocks of rows, if chunksize is
+        # ADM passed) and the full data model is then read for just
+        # ADM the targets. Otherwise, read every row and column.
+        objects = filename
+        if not hydrate:
+            objects = io.read_tractor(filename)
+        # ADM if hydrating and Gaia-matching, match the selection
+        # ADM columns once, and carry the Gaia columns of the targets
+        # ADM over to the full data model, rather than matching twice.
+        gaiaobjects, gaiacols = None, []
+        if hydrate and gaiamatch and ("MWS" in tcnames or "STD" in tcnames):
+            columns = _target_columns(tcnames, survey=survey,
+                                      qso_selection=qso_selection,
+                                      gaiamatch=True)
+            objects = gaiaobjects = io.read_tractor(filename, columns=columns)
+            gaiacols = _add_gaia_columns(gaiaobjects)
         desi_target, bgs_target, mws_target = apply_cuts(
-            objects, qso_selection=qso_selection, gaiamatch=gaiamatch,
+            objects, qso_selection=qso_selection,
+            gaiamatch=gaiamatch and gaiaobjects is None,
             tcnames=tcnames, survey=survey, resolvetargs=resolvetargs,
-            mask=mask
+            mask=mask, splitphotsys=splitphotsys, chunksize=chunksize,
+            numthreads=numthreads
         )
 
-        return _finalize_targets(objects, desi_target, bgs_target, mws_target)
+        if hydrate:
+            keep = np.where(desi_target != 0)[0]
+            objects = io.read_tractor(filename, rows=keep)
+            for col in gaiacols:
+                objects[col] = gaiaobjects[col][keep]
+            del gaiaobjects
+            desi_target = desi_target[keep]
+            bgs_target = bgs_target[keep]
+            mws_target = mws_target[keep]
+
+        targets = _finalize_targets(objects, desi_target, bgs_target, mws_target)
+
+        # ADM write to a temporary file first, so that a run that dies
+        # ADM mid-write can't leave behind a truncated cache file.
+        if cachedir is not None:
+            np.save(cachefile+'.tmp.npy', targets)
+            os.rename(cachefile+'.tmp.npy', cachefile)
+
+        return targets
+
+    # ADM restrict to only targets in a set of HEALPixels, an RA, Dec
+    # ADM box or an RA, Dec, radius cap, if requested.
+    def _restrict_targets(targets):
+        if pixlist is not None:
+            ii = is_in_hp(targets, nside, pixlist)
+            targets = targets[ii]
+
+        if radecbox is not None:
+            ii = is_in_box(targets, radecbox)
+            targets = targets[ii]
+
+        if radecrad is not None:
+            ii = is_in_cap(targets, radecrad)
+            targets = targets[ii]
+
+        return targets
+
+    # ADM if streaming, record the data model and the staging file
+    # ADM for each HEALPixel as the targets arrive.
+    stagedtype = []
+    stagedfiles = {}
+
+    def _stage_targets(targets):
+        ''' route targets to per-HEALPixel staging files, returning
+            just the IDs needed to remove duplicates with Gaia '''
+        stagedtype[:] = [targets.dtype]
+        ii = targets["REF_ID"] > 0
+        ids = rfn.repack_fields(targets[["REF_ID", "TARGETID"]][ii])
+        targets = _restrict_targets(targets)
+        stagedfiles.update(io.stage_targets_in_hp(stagedir, targets, nsidefile))
+        return ids
 
     # Counter for number of bricks processed;
     # a numpy scalar allows updating nbrick in python 2
@@ -2430,18 +3260,32 @@ def select_targets(infiles, numproc=4, qso_selection='randomforest',
                      .format(nbrick, rate, elapsed/60.))
 
         nbrick[...] += 1    # this is an in-place modification
+        # ADM if streaming, write the targets as soon as they arrive.
+        if stagedir is not None:
+            return _stage_targets(result)
         return result
 
     # - Parallel process input files
-    if numproc > 1:
-        pool = sharedmem.MapReduce(np=numproc)
+    if numfileproc > 1:
+        # ADM load the QSO random forests into shared memory before
+        # ADM forking, so they are loaded once rather than per-worker.
+        if "QSO" in tcnames and qso_selection == 'randomforest':
+            _preload_qso_forests()
+        pool = sharedmem.MapReduce(np=numfileproc)
         with pool:
-            targets = pool.map(_select_targets_file, infiles, reduce=_update_status)
+            # ADM process the largest files first, to shorten the tail,
+            # ADM and pass the targets back through shared memory.
+            targets = pool.map(_select_targets_file, infiles, reduce=_update_status,
+                               cost=os.path.getsize, shared=True)
+        log.info('{:.1f} slave-secs ({:.1f}%) idle at the tail of the map'
+                 .format(pool.tailidle, 100.*pool.tailfraction))
     else:
         targets = list()
         for x in infiles:
             targets.append(_update_status(_select_targets_file(x)))
 
+    # ADM if streaming, these are just the (in-order) IDs of targets
+    # ADM that are matched to Gaia, which is all we need for backups.
     targets = np.concatenate(targets)
 
     if backup:
@@ -2473,16 +3317,24 @@ def select_targets(infiles, numproc=4, qso_selection='randomforest',
                 gaiadr=gaiadr)
 
             # ADM make the Gaia-only data structure resemble the targets.
-            gaiatargets = np.zeros(len(gaiatargs), dtype=targets.dtype)
+            dt = targets.dtype
+            if stagedir is not None:
+                dt = stagedtype[0]
+            gaiatargets = np.zeros(len(gaiatargs), dtype=dt)
             sc = set(
-                gaiatargs.dtype.names).intersection(set(targets.dtype.names))
+                gaiatargs.dtype.names).intersection(set(dt.names))
             for col in sc:
                 gaiatargets[col] = gaiatargs[col]
 
             # ADM remove duplicates. Order is key here, as np.unique
             # ADM keeps the first occurence, and we want to retain sweeps
             # ADM information as much as possible.
-            if len(infiles) > 0:
+            if stagedir is not None:
+                gaiatargets = _unstage_duplicates(stagedfiles, targets,
+                                                  gaiatargets)
+                stagedfiles.update(io.stage_targets_in_hp(
+                    stagedir, _restrict_targets(gaiatargets), nsidefile))
+            elif len(infiles) > 0:
                 alltargs = np.concatenate([targets, gaiatargets])
                 # ADM Retain all non-Gaia sources, which have REF_ID of
                 # ADM -1 or 0 and thus are all duplicates on REF_ID.
@@ -2494,25 +3346,16 @@ def select_targets(infiles, numproc=4, qso_selection='randomforest',
             else:
                 targets = gaiatargets
 
+    # ADM if streaming, the targets are already in the staging files.
+    if stagedir is not None:
+        if len(stagedfiles) == 0:
+            log.warning('ZERO targets for passed file list or region!!!')
+        return dict(sorted(stagedfiles.items()))
+
     # ADM it's possible that somebody could pass HEALPixels that
     # ADM contain no targets, in which case exit (somewhat) gracefully.
     if len(targets) == 0:
         log.warning('ZERO targets for passed file list or region!!!')
         return targets
 
-    # ADM restrict to only targets in a set of HEALPixels, if requested.
-    if pixlist is not None:
-        ii = is_in_hp(targets, nside, pixlist)
-        targets = targets[ii]
-
-    # ADM restrict to only targets in an RA, Dec box, if requested.
-    if radecbox is not None:
-        ii = is_in_box(targets, radecbox)
-        targets = targets[ii]
-
-    # ADM restrict to only targets in an RA, Dec, radius cap, if needed.
-    if radecrad is not None:
-        ii = is_in_cap(targets, radecrad)
-        targets = targets[ii]
-
-    return targets
+    return _restrict_targets(targets)
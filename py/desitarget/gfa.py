@@ -338,7 +338,9 @@ def all_gaia_in_tiles(maglim=18, numproc=4, allsky=False,
     if numproc > 1 and nfiles > 0:
         pool = sharedmem.MapReduce(np=numproc)
         with pool:
-            gfas = pool.map(_get_gaia_gfas, infiles, reduce=_update_status)
+            # ADM pass the Gaia matches back through shared memory.
+            gfas = pool.map(_get_gaia_gfas, infiles, reduce=_update_status,
+                            shared=True)
     else:
         gfas = list()
         for file in infiles:
@@ -567,7 +569,9 @@ def select_gfas(infiles, maglim=18, numproc=4, nside=None,
         if numproc4 > 1:
             pool = sharedmem.MapReduce(np=numproc4)
             with pool:
-                gfas = pool.map(_get_gfas, infiles, reduce=_update_status)
+                # ADM pass the GFAs back through shared memory.
+                gfas = pool.map(_get_gfas, infiles, reduce=_update_status,
+                                shared=True)
         else:
             gfas = list()
             for file in infiles:
@@ -138,6 +138,9 @@ import heapq
 import os
 import pickle
 
+import time
+import shutil
+import tempfile
 import numpy
 from multiprocessing import RawArray
 import ctypes
@@ -169,11 +172,11 @@ def total_memory():
         The memory is obtained from MemTotal entry in /proc/meminfo.
 
     """
-    with file('/proc/meminfo', 'r') as f:
+    with open('/proc/meminfo', 'r') as f:
         for line in f:
             words = line.split()
-        if words[0].upper() == 'MEMTOTAL:':
-            return int(words[1]) * 1024
+            if words[0].upper() == 'MEMTOTAL:':
+                return int(words[1]) * 1024
     raise IOError('MemTotal unknown')
 
 def cpu_count():
@@ -545,7 +548,7 @@ class MapReduce(object):
         else:
             self.np = np
 
-    def _main(self, pg, Q, R, sequence, realfunc):
+    def _main(self, pg, Q, R, sequence, realfunc, shmdir=None):
         # get and put will raise SlaveException
         # and terminate the process.
         # the exception is muted in ProcessGroup,
@@ -561,8 +564,60 @@ class MapReduce(object):
                 i, work = capsule
             self.ordered.move(i)
             r = realfunc(work)
+            if shmdir is not None:
+                if isinstance(r, tuple):
+                    r = tuple(self._to_shared(shmdir, '{}-{}'.format(i, k), x)
+                              for k, x in enumerate(r))
+                else:
+                    r = self._to_shared(shmdir, str(i), r)
             pg.put(R, (i, r))
 
+    # results smaller than this many bytes are pickled through the
+    # result queue even if shared is passed to map.
+    minshared = 2**16
+
+    def _to_shared(self, shmdir, name, r):
+        """ Write an array result to its own file in shmdir, returning a descriptor.
+
+            Results that aren't arrays, that hold python objects, that
+            are small, or that can't be written (e.g. because the shared
+            memory filesystem is full) are returned unchanged, to be
+            pickled through the result queue.
+        """
+        if not isinstance(r, numpy.ndarray) or r.dtype.hasobject \
+           or r.nbytes < self.minshared:
+            return r
+        filename = os.path.join(shmdir, name + '.npy')
+        # write() rather than a memory map, so that a full filesystem
+        # raises an error rather than a bus error.
+        try:
+            numpy.save(filename, r, allow_pickle=False)
+        except OSError:
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+            return r
+        return _SharedArray(filename, r.nbytes)
+
+    def _from_shared(self, r):
+        """ Replace descriptors in a result with maps of the shared files.
+
+            Each file is unlinked as soon as it's mapped, so its memory is
+            freed once the array is dereferenced (e.g. after concatenating
+            the results).
+        """
+        def view(x):
+            if not isinstance(x, _SharedArray):
+                return x
+            shared = numpy.load(x.filename, mmap_mode='r+')
+            os.remove(x.filename)
+            self.sharedbytes += x.nbytes
+            return shared.view(numpy.ndarray)
+        if isinstance(r, tuple):
+            return tuple(view(x) for x in r)
+        return view(r)
+
     def __enter__(self):
         self.critical = self.backend.LockFactory()
         self.ordered = Ordered(self.backend)
@@ -572,7 +627,52 @@ class MapReduce(object):
         self.ordered = None
         pass
 
-    def map(self, func, sequence, reduce=None, star=False):
+    @staticmethod
+    def _dispatch(sequence, cost=None):
+        """ The capsules to put on the work queue, in the order they're dispatched.
+
+            Returns the sequence (as a list if it had to be expanded to
+            estimate the cost of each item) and an iterable of capsules.
+            Capsules are (i, ) if the slaves can index the sequence, and
+            (i, work) otherwise. If cost is passed, the most expensive
+            items are dispatched first. The sort is stable, so items of
+            equal cost are dispatched in order.
+        """
+        if cost is not None:
+            if not hasattr(sequence, '__getitem__'):
+                sequence = list(sequence)
+            costs = [cost(work) for work in sequence]
+            order = sorted(range(len(costs)), key=lambda i: -costs[i])
+            return sequence, [(i, ) for i in order]
+        if not hasattr(sequence, '__getitem__'):
+            return sequence, enumerate(sequence)
+        return sequence, ((i, ) for i in range(len(sequence)))
+
+    @staticmethod
+    def _tail_idle(np, T):
+        """ The slave-seconds spent idle after the last dispatch.
+
+            T holds the start time of the map followed by the arrival
+            time of each result. Once all but np - 1 results have
+            arrived, there's nothing left to dispatch, and each result
+            that arrives after that leaves one more slave idle until
+            the map ends.
+
+            Returns the idle slave-seconds, and that as a fraction of
+            the slave-seconds available during the map.
+        """
+        start, T = T[0], numpy.array(T[1:])
+        ntask = len(T)
+        if ntask == 0:
+            return 0., 0.
+        end = T[-1]
+        # slaves that were never given any work are idle throughout.
+        idle = max(np - ntask, 0) * (end - start)
+        idle += numpy.sum(end - T[max(ntask - np, 0):])
+        return idle, idle / max(np * (end - start), 1e-10)
+
+    def map(self, func, sequence, reduce=None, star=False, cost=None,
+            shared=False):
         """ Map-reduce with multile processes.
 
             Apply func to each item on the sequence, in parallel.
@@ -603,11 +703,39 @@ class MapReduce(object):
                 if True, the items in sequence are treated as positional
                 arguments of reduce.
 
+            cost : callable, optional
+                Estimate the cost of each item of the sequence. If passed,
+                items are dispatched in order of decreasing cost, so that
+                the most expensive items don't leave most of the slaves
+                idle at the end of the map. For items that are file
+                names, :py:func:`os.path.getsize` is a good choice.
+
+            shared : boolean, optional
+                If True, each array result (or array in a tuple result)
+                is written by the slave to its own file in shared memory
+                (/dev/shm), and only the file name is sent back through
+                the result queue, rather than the pickled array. Nothing
+                is reserved in advance, and each file is unlinked as soon
+                as the master maps it. Ignored if /dev/shm doesn't exist
+                or for the thread backend. The number of bytes passed this
+                way is stored as :py:attr:`sharedbytes`.
+
             Returns
             -------
             results : list
                 The list of reduced results from the map operation, in
-                the order of the arguments of sequence.
+                the order of the arguments of sequence (even if cost
+                is passed). If shared is True, array results are maps
+                of shared memory, which is freed once they are
+                dereferenced (e.g. after concatenating them).
+
+            Notes
+            -----
+            The time slaves spend idle at the end of the map, once there
+            are no items left to dispatch, is stored as
+            :py:attr:`tailidle` (in slave-seconds) and as a fraction of
+            the slave-seconds available in :py:attr:`tailfraction`
+            (both are zero if the map is run in serial).
 
             Raises
             ------
@@ -630,15 +758,25 @@ class MapReduce(object):
 
         if self.np == 0 or get_debug():
             #Do this in serial
+            self.tailidle, self.tailfraction = 0., 0.
             return [realreduce(realfunc(i)) for i in sequence]
 
+        sequence, capsules = self._dispatch(sequence, cost)
+
+        # threads share the address space, so don't need shared files.
+        self.sharedbytes = 0
+        shmdir = None
+        if shared and self.backend is not ThreadBackend \
+           and os.path.isdir('/dev/shm'):
+            shmdir = tempfile.mkdtemp(prefix='sharedmem-', dir='/dev/shm')
+
         Q = self.backend.QueueFactory(64)
         R = self.backend.QueueFactory(64)
         self.ordered.reset()
 
         pg = ProcessGroup(main=self._main, np=self.np,
                 backend=self.backend,
-                args=(Q, R, sequence, realfunc))
+                args=(Q, R, sequence, realfunc, shmdir))
 
         pg.start()
 
@@ -648,11 +786,8 @@ class MapReduce(object):
             #   will fail silently if any error occurs.
             j = 0
             try:
-                for i, work in enumerate(sequence):
-                    if not hasattr(sequence, '__getitem__'):
-                        pg.put(Q, (i, work))
-                    else:
-                        pg.put(Q, (i, ))
+                for capsule in capsules:
+                    pg.put(Q, capsule)
                     j = j + 1
                 N.append(j)
 
@@ -668,6 +803,8 @@ class MapReduce(object):
         # we run fetcher on main thread to catch exceptions
         # raised by reduce
         count = 0
+        # record when each result arrives, to measure the idle tail.
+        T = [time.time()]
         try:
             while True:
                 try:
@@ -676,13 +813,18 @@ class MapReduce(object):
                     continue
                 except StopProcessGroup:
                     raise pg.get_exception()
-                capsule = capsule[0], realreduce(capsule[1])
+                T.append(time.time())
+                r = capsule[1]
+                if shmdir is not None:
+                    r = self._from_shared(r)
+                capsule = capsule[0], realreduce(r)
                 heapq.heappush(L, capsule)
                 count = count + 1
                 if len(N) > 0 and count == N[0]:
                     # if finished feeding see if all
                     # results have been obtained
                     break
+            self.tailidle, self.tailfraction = self._tail_idle(self.np, T)
             rt = []
 #            R.close()
 #            R.join_thread()
@@ -697,8 +839,19 @@ class MapReduce(object):
             pg.join()
             feeder.join()
             raise
+        finally:
+            # remove any files that were written but never mapped.
+            if shmdir is not None:
+                shutil.rmtree(shmdir, ignore_errors=True)
 
 
+class _SharedArray(object):
+    """ Where to find an array result written to shared memory by a MapReduce.
+    """
+    def __init__(self, filename, nbytes):
+        self.filename = filename
+        self.nbytes = nbytes
+
 def empty_like(array, dtype=None):
     """ Create a shared memory array from the shape of array.
     """
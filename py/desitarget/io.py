@@ -37,6 +37,17 @@ log = get_logger()
 releasedict = {3000: 'S', 4000: 'N', 5000: 'S', 6000: 'N', 7000: 'S', 7999: 'S',
                8000: 'S', 8001: 'N', 9000: 'S', 9001: 'N'}
 
+# ADM the name of the index file in a directory of HEALPixel-split files.
+hpindexname = "hpindex.json"
+
+# ADM HEALPixel-split files are sorted by (NESTED) HEALPixel at this
+# ADM nside, and the row range of each pixel is recorded in an HPXROWS
+# ADM extension with this data model.
+hprowsnside = 64
+hprowsdatamodel = np.array([], dtype=[
+    ('HPXPIXEL', '>i8'), ('START', '>i8'), ('STOP', '>i8')
+])
+
 # ADM This is an empty array of most of the TS data model columns and
 # ADM dtypes. Note that other columns are added in read_tractor and
 # ADM from the "addedcols" data models below.
@@ -98,6 +109,16 @@ def desitarget_resolve_dec():
     return dec
 
 
+def _photsys_dtype():
+    """The data model for the PHOTSYS column (see :func:`add_photsys`)."""
+    # ADM the fitsio check is a hack for the v0.9 to v1.0 transition
+    # ADM (v1.0 now converts all byte strings to unicode strings).
+    from distutils.version import LooseVersion
+    if LooseVersion(fitsio.__version__) >= LooseVersion('1'):
+        return [('PHOTSYS', '<U1')]
+    return [('PHOTSYS', '|S1')]
+
+
 def add_photsys(indata):
     """Add the PHOTSYS column to a sweeps-style array.
 
@@ -119,14 +140,7 @@ def add_photsys(indata):
     # ADM only add the PHOTSYS column if RELEASE exists.
     if 'RELEASE' in indata.dtype.names:
         # ADM add PHOTSYS to the data model.
-        # ADM the fitsio check is a hack for the v0.9 to v1.0 transition
-        # ADM (v1.0 now converts all byte strings to unicode strings).
-        from distutils.version import LooseVersion
-        if LooseVersion(fitsio.__version__) >= LooseVersion('1'):
-            pdt = [('PHOTSYS', '<U1')]
-        else:
-            pdt = [('PHOTSYS', '|S1')]
-        dt = indata.dtype.descr + pdt
+        dt = indata.dtype.descr + _photsys_dtype()
 
         # ADM create a new numpy array with the fields from the new data model...
         nrows = len(indata)
@@ -145,39 +159,84 @@ def add_photsys(indata):
     return outdata
 
 
-def read_tractor(filename, header=False, columns=None):
-    """Read a tractor catalogue or sweeps file.
+# ADM the character codes that str.rstrip() (for unicode columns) and
+# ADM bytes.rstrip() (for byte-string columns) treat as whitespace.
+_whitespace = {'U': np.array([i for i in range(0x3001) if chr(i).isspace()]),
+               'S': np.array([i for i in range(256) if bytes([i]).isspace()])}
+
+
+def _rstrip_columns(data):
+    """Strip trailing whitespace from the string columns of an array.
 
     Parameters
     ----------
-    filename : :class:`str`
-        File name of one Tractor or sweeps file.
-    header : :class:`bool`, optional
-        If ``True``, return (data, header) instead of just data.
-    columns: :class:`list`, optional
-        Specify the desired Tractor catalog columns to read; defaults to
-        desitarget.io.tsdatamodel.dtype.names + most of the columns in
-        desitarget.gaiamatch.gaiadatamodel.dtype.names, where
-        tsdatamodel is, e.g., basetsdatamodel + dr9addedcols.
+    data : :class:`~numpy.ndarray`
+        Numpy structured array. Modified in place.
 
     Returns
     -------
-    :class:`~numpy.ndarray`
-        Array with the tractor schema, uppercase field names.
+    Nothing, but the entries of string columns in `data` that end in
+    whitespace are stripped, as for :func:`numpy.char.rstrip`.
+
+    Notes
+    -----
+        - Works on a view of the characters of each column, so no
+          string objects are created and entries that don't end in
+          whitespace (and columns that contain no such entries) are
+          left untouched.
     """
-    check_fitsio_version()
+    for col in data.dtype.names:
+        dt, offset = data.dtype.fields[col][:2]
+        if dt.kind not in 'US' or dt.itemsize == 0:
+            continue
+        # ADM view the column as an (nrows, nchars) array of characters.
+        if dt.kind == 'U':
+            char = np.dtype('u4').newbyteorder(dt.byteorder)
+        else:
+            char = np.dtype('u1')
+        nchar = dt.itemsize // char.itemsize
+        chars = data.getfield(np.dtype((char, (nchar,))), offset)
+        # ADM work back from the last character. A character is trailing
+        # ADM whitespace if every character after it is null (padding)
+        # ADM or has already been stripped.
+        trailing = np.ones(len(data), dtype='?')
+        for i in range(nchar-1, -1, -1):
+            ii = trailing & np.isin(chars[:, i], _whitespace[dt.kind])
+            if ii.any():
+                chars[ii, i] = 0
+            trailing &= chars[:, i] == 0
+            if not trailing.any():
+                break
 
-    # ADM read in the file information. Due to fitsio header bugs
-    # ADM near v1.0.0, make absolutely sure the user wants the header.
-    if header:
-        indata, hdr = fitsio.read(filename, upper=True, header=True,
-                                  columns=columns)
-    else:
-        indata = fitsio.read(filename, upper=True, columns=columns)
+
+# ADM the data models returned by read_tractor, keyed by the
+# ADM columns that were read and the columns that were requested.
+_tractor_dtypes = {}
+
+
+def _tractor_dtype(incols, columns=None):
+    """The data model returned by :func:`read_tractor`.
+
+    Parameters
+    ----------
+    incols : :class:`list`
+        The (upper-case) columns that are read from a Tractor or sweeps
+        file. Only used to determine the DR8/DR9 and Gaia data models.
+    columns : :class:`list`, optional
+        As for :func:`read_tractor`.
+
+    Returns
+    -------
+    :class:`~numpy.dtype`
+        The data model, including PHOTSYS if RELEASE is included.
+    """
+    key = (tuple(incols), None if columns is None else tuple(columns))
+    if key in _tractor_dtypes:
+        return _tractor_dtypes[key]
 
     # ADM form the final data model in a manner that maintains
     # ADM backwards-compatability with DR8.
-    if "FRACDEV" in indata.dtype.names:
+    if "FRACDEV" in incols:
         tsdatamodel = np.array(
             [], dtype=basetsdatamodel.dtype.descr + dr8addedcols.dtype.descr)
     else:
@@ -193,41 +252,135 @@ def read_tractor(filename, header=False, columns=None):
     for gaiacol in ['GAIA_PHOT_BP_RP_EXCESS_FACTOR',
                     'GAIA_ASTROMETRIC_SIGMA5D_MAX',
                     'GAIA_ASTROMETRIC_PARAMS_SOLVED', 'REF_CAT']:
-        if gaiacol not in indata.dtype.names:
+        if gaiacol not in incols:
             gaiadatamodel = pop_gaia_columns(gaiadatamodel, [gaiacol])
     dt = tsdatamodel.dtype.descr + gaiadatamodel.dtype.descr
     dtnames = tsdatamodel.dtype.names + gaiadatamodel.dtype.names
     # ADM limit to just passed columns.
     if columns is not None:
         dt = [d for d, name in zip(dt, dtnames) if name in columns]
+        dtnames = [name for name in dtnames if name in columns]
+
+    # ADM add a slot for the PHOTSYS column, which is used to
+    # ADM unambiguously check whether we're using imaging from the
+    # ADM "North" or "South". PHOTSYS is derived from RELEASE.
+    if 'RELEASE' in dtnames:
+        dt += _photsys_dtype()
 
-    # ADM set-up the output array.
-    nrows = len(indata)
-    data = np.zeros(nrows, dtype=dt)
-    # ADM if REF_ID was requested, set it to -1 in case there is no Gaia data.
-    if "REF_ID" in data.dtype.names:
-        data['REF_ID'] = -1
+    _tractor_dtypes[key] = np.dtype(dt)
 
-    # ADM populate the common input/output columns.
-    for col in set(indata.dtype.names).intersection(set(data.dtype.names)):
-        data[col] = indata[col]
+    return _tractor_dtypes[key]
 
-    # ADM MASKBITS used to be BRIGHTSTARINBLOB which was set to True/False
-    # ADM and which represented the SECOND bit of MASKBITS.
-    if "BRIGHTSTARINBLOB" in indata.dtype.names:
-        if "MASKBITS" in data.dtype.names:
-            data["MASKBITS"] = indata["BRIGHTSTARINBLOB"] << 1
+
+def read_tractor(filename, header=False, columns=None, rows=None):
+    """Read a tractor catalogue or sweeps file.
+
+    Parameters
+    ----------
+    filename : :class:`str`
+        File name of one Tractor or sweeps file.
+    header : :class:`bool`, optional
+        If ``True``, return (data, header) instead of just data.
+    columns: :class:`list`, optional
+        Specify the desired Tractor catalog columns to read; defaults to
+        desitarget.io.tsdatamodel.dtype.names + most of the columns in
+        desitarget.gaiamatch.gaiadatamodel.dtype.names, where
+        tsdatamodel is, e.g., basetsdatamodel + dr9addedcols.
+    rows: :class:`list` or :class:`slice`, optional
+        Only read in these rows of `filename` (zero-indexed). A `slice`
+        is read as a contiguous range of rows, which is faster.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        Array with the tractor schema, uppercase field names.
+
+    Notes
+    -----
+        - Columns in `columns` that are in the data model but not in
+          `filename` are set to zero, as when reading every column.
+        - The output array (including PHOTSYS) is allocated once, and
+          the file is read into it in blocks of rows, so the memory
+          needed is little more than the size of the output.
+    """
+    check_fitsio_version()
+
+    with fitsio.FITS(filename) as fx:
+        hdu = fx[1]
+        filecols = [col.upper() for col in hdu.get_colnames()]
+
+        # ADM only read the requested columns that are actually in the file.
+        # ADM MASKBITS used to be BRIGHTSTARINBLOB (see below).
+        readcols, incols = columns, filecols
+        if columns is not None:
+            readcols = [col for col in filecols if col in columns]
+            if 'MASKBITS' in columns and 'BRIGHTSTARINBLOB' in filecols:
+                readcols.append('BRIGHTSTARINBLOB')
+            incols = readcols
+
+        # ADM the final data model, including a slot for PHOTSYS.
+        dt = _tractor_dtype(incols, columns)
+        dtnames = dt.names
+
+        # ADM a range of rows is read in contiguous blocks (see below).
+        first, last = 0, hdu.get_nrows()
+        if isinstance(rows, slice):
+            first, last, step = rows.indices(last)
+            rows = None if step == 1 else np.arange(first, last, step)
+
+        # ADM set-up the output array.
+        nrows = max(0, last - first) if rows is None else len(rows)
+        data = np.zeros(nrows, dtype=dt)
+        # ADM if REF_ID was requested, set it to -1 in case there is no Gaia data.
+        if "REF_ID" in dtnames:
+            data['REF_ID'] = -1
+
+        # ADM the common input/output columns (PHOTSYS is set below).
+        cols = [col for col in incols if col in dtnames and col != 'PHOTSYS']
+        # ADM MASKBITS used to be BRIGHTSTARINBLOB which was set to True/False
+        # ADM and which represented the SECOND bit of MASKBITS.
+        bsib = "BRIGHTSTARINBLOB" in incols and "MASKBITS" in dtnames
+
+        # ADM read the file in blocks of rows (of about 4MB) and
+        # ADM populate the output array from each block. There's
+        # ADM nothing to read if none of the columns are in the file.
+        # ADM A range of rows is read as a slice of whole rows only if
+        # ADM every column was requested, otherwise just the requested
+        # ADM columns are read, to limit the bytes read from disk.
+        nread = nrows if len(cols) > 0 or bsib else 0
+        wholerows = rows is None and columns is None
+        rowsize = data.dtype.itemsize
+        if wholerows:
+            rowsize = max(rowsize, hdu.get_rec_dtype()[0].itemsize)
+        blocksize = max(1, 2**22 // max(1, rowsize))
+        for begin in range(0, nread, blocksize):
+            end = min(begin+blocksize, nrows)
+            if wholerows:
+                indata = hdu.read_slice(first+begin, first+end, upper=True)
+            else:
+                blockrows = np.arange(first+begin, first+end) if rows is None \
+                    else rows[begin:end]
+                indata = hdu.read(columns=readcols, rows=blockrows, upper=True)
+            # ADM assigning all of the columns at once (fields are
+            # ADM matched by position) makes a single pass over the rows.
+            if len(cols) > 0:
+                data[cols][begin:end] = indata[cols]
+            if bsib:
+                data["MASKBITS"][begin:end] = indata["BRIGHTSTARINBLOB"] << 1
+            del indata
+
+        # ADM read in the header information. Due to fitsio header bugs
+        # ADM near v1.0.0, make absolutely sure the user wants the header.
+        if header:
+            hdr = hdu.read_header()
 
     # ADM To circumvent whitespace bugs on I/O from fitsio.
     # ADM need to strip any white space from string columns.
-    for colname in data.dtype.names:
-        kind = data[colname].dtype.kind
-        if kind == 'U' or kind == 'S':
-            data[colname] = np.char.rstrip(data[colname])
+    _rstrip_columns(data)
 
-    # ADM add the PHOTSYS column to unambiguously check whether we're using imaging
-    # ADM from the "North" or "South".
-    data = add_photsys(data)
+    # ADM populate PHOTSYS from RELEASE.
+    if 'PHOTSYS' in data.dtype.names:
+        data['PHOTSYS'] = release_to_photsys(data["RELEASE"])
 
     if header:
         return data, hdr
@@ -279,7 +432,7 @@ def release_to_photsys(release):
     photstrings = np.array(list(releasedict.values()))
 
     # ADM explicitly check no unknown release numbers were passed.
-    unknown = set(release) - set(releasenums)
+    unknown = set(np.unique(release).tolist()) - set(releasenums)
     if bool(unknown):
         msg = 'Unknown release number {}'.format(unknown)
         log.critical(msg)
@@ -378,10 +531,99 @@ def _bright_or_dark(filename, hdr, data, obscon, mockdata=None):
         return filename, hdr, data
 
 
+def _sort_by_hp_rows(data, nside=hprowsnside):
+    """Sort data by HEALPixel and find the range of rows in each pixel.
+
+    Parameters
+    ----------
+    data : :class:`~numpy.ndarray`
+        numpy structured array that includes "RA" and "DEC".
+    nside : :class:`int`, optional, defaults to `hprowsnside`
+        The (NESTED) HEALPixel nside to sort by.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        `data` sorted by HEALPixel (and otherwise in the input order).
+    :class:`~numpy.ndarray`
+        The rows [START, STOP) of the sorted `data` in each HEALPixel
+        (in the form of `hprowsdatamodel`).
+    """
+    theta, phi = np.radians(90-data["DEC"]), np.radians(data["RA"])
+    pixnum = hp.ang2pix(nside, theta, phi, nest=True)
+    order = np.argsort(pixnum, kind="stable")
+
+    pix, start, counts = np.unique(pixnum[order], return_index=True,
+                                   return_counts=True)
+    rowranges = np.zeros(len(pix), dtype=hprowsdatamodel.dtype)
+    rowranges["HPXPIXEL"], rowranges["START"] = pix, start
+    rowranges["STOP"] = start + counts
+
+    return data[order], rowranges
+
+
+def _write_hp_rows(filename, rowranges, nside=hprowsnside):
+    """Append the HPXROWS extension from :func:`_sort_by_hp_rows` to a file."""
+    hdr = fitsio.FITSHDR()
+    hdr['HPXNSIDE'] = nside
+    hdr['HPXNEST'] = True
+    fitsio.write(filename, rowranges, extname='HPXROWS', header=hdr)
+
+
+def _rows_in_hp(filename, nside, pixlist, downsample=None):
+    """The rows of a file that can include targets in some HEALPixels.
+
+    Parameters
+    ----------
+    filename : :class:`str`
+        Name of a target file.
+    nside : :class:`int`
+        The (NESTED) HEALPixel nside.
+    pixlist : :class:`list` or `int` or `~numpy.ndarray`
+        HEALPixels at the passed `nside`.
+    downsample : :class:`int`, optional, defaults to `None`
+        If not `None`, downsample the rows by this integer value, as for
+        :func:`read_target_files`.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray` or ``None``
+        The (sorted) rows that are in HEALPixels that touch `pixlist`,
+        or ``None`` if `filename` has no HPXROWS extension.
+
+    Notes
+    -----
+        - The rows can include targets that are outside of `pixlist`
+          (if `nside` is finer than the HPXROWS nside), so the targets
+          still need to be limited using, e.g., :func:`is_in_hp`.
+    """
+    with fitsio.FITS(filename) as fx:
+        if "HPXROWS" not in fx:
+            return None
+        rowranges = fx["HPXROWS"].read()
+        hdr = fx["HPXROWS"].read_header()
+
+    # ADM the HPXROWS pixels that touch the passed pixels.
+    pixnum = nside2nside(nside, hdr["HPXNSIDE"], pixlist)
+    rowranges = rowranges[np.isin(rowranges["HPXPIXEL"], pixnum)]
+
+    # ADM expand the [START, STOP) ranges into the rows themselves.
+    nrows = rowranges["STOP"] - rowranges["START"]
+    offsets = np.repeat(rowranges["START"] - np.cumsum(nrows) + nrows, nrows)
+    rows = np.arange(np.sum(nrows)) + offsets
+
+    if downsample is not None:
+        np.random.seed(616)
+        rows = np.sort(np.random.choice(rows, len(rows)//downsample, replace=False))
+
+    return rows
+
+
 def write_targets(targdir, data, indir=None, indir2=None, nchunks=None,
                   qso_selection=None, nside=None, survey="main", nsidefile=None,
                   hpxlist=None, scndout=None, resolve=True, maskbits=True,
-                  obscon=None, mockdata=None, supp=False, extra=None):
+                  obscon=None, mockdata=None, supp=False, extra=None,
+                  cache=False):
     """Write target catalogues.
 
     Parameters
@@ -405,7 +647,9 @@ def write_targets(targdir, data, indir=None, indir2=None, nchunks=None,
     nsidefile : :class:`int`, optional, defaults to `None`
         Passed to indicate in the output file header that the targets
         have been limited to only certain HEALPixels at a given
-        nside. Used in conjunction with `hpxlist`.
+        nside. Used in conjunction with `hpxlist`. If passed, the
+        targets are also sorted by HEALPixel at nside `hprowsnside`,
+        and the rows in each pixel are recorded in an HPXROWS extension.
     hpxlist : :class:`list`, optional, defaults to `None`
         Passed to indicate in the output file header that the targets
         have been limited to only this list of HEALPixels. Used in
@@ -431,6 +675,9 @@ def write_targets(targdir, data, indir=None, indir2=None, nchunks=None,
     extra : :class:`dict`, optional
         If passed (and not None), write these extra dictionary keys and
         values to the output header.
+    cache : :class:`bool`, optional, defaults to ``False``
+        If ``True``, also write a memory-mappable columnar cache of the
+        output file (see :func:`write_target_cache`).
 
     Returns
     -------
@@ -546,15 +793,31 @@ def write_targets(targdir, data, indir=None, indir2=None, nchunks=None,
         _check_hpx_length(hpxlist, warning=True)
         hdr['FILEHPX'] = hpxlist
 
+    # ADM sort HEALPixel-split files by HEALPixel, so that targets in
+    # ADM a region can be read using the HPXROWS row ranges. Mock data
+    # ADM isn't sorted, as it must stay row-matched to the truth files.
+    rowranges = None
+    if nsidefile is not None and mockdata is None:
+        data, rowranges = _sort_by_hp_rows(data)
+        hdr['HPXROWS'] = hprowsnside
+
     # ADM create necessary directories, if they don't exist.
     os.makedirs(os.path.dirname(filename), exist_ok=True)
 
     # ADM write in a series of chunks to save memory.
     if nchunks is None:
         fitsio.write(filename+'.tmp', data, extname='TARGETS', header=hdr, clobber=True)
+        if rowranges is not None:
+            _write_hp_rows(filename+'.tmp', rowranges)
         os.rename(filename+'.tmp', filename)
     else:
         write_in_chunks(filename, data, nchunks, extname='TARGETS', header=hdr)
+        if rowranges is not None:
+            _write_hp_rows(filename, rowranges)
+
+    # ADM write the columnar cache, if requested.
+    if cache:
+        write_target_cache(filename)
 
     # Optionally write out mock catalog data.
     if mockdata is not None:
@@ -583,6 +846,15 @@ def write_targets(targdir, data, indir=None, indir2=None, nchunks=None,
 
         os.rename(truthfile+'.tmp', truthfile)
 
+    # ADM add the file(s) to the index of the HEALPixel-split directory.
+    if nsidefile is not None:
+        written = [filename]
+        if mockdata is not None:
+            written.append(truthfile)
+        for dirname in set(os.path.dirname(fn) for fn in written):
+            write_hp_index(dirname, [fn for fn in written
+                                     if os.path.dirname(fn) == dirname])
+
     return ntargs, filename
 
 
@@ -635,6 +907,107 @@ def write_in_chunks(filename, data, nchunks, extname=None, header=None):
     return
 
 
+def _staged_targets_filename(stagedir, pixel):
+    """The name of the staging file for targets in a HEALPixel.
+
+    Parameters
+    ----------
+    stagedir : :class:`str`
+        Directory of staged targets.
+    pixel : :class:`int` or `str`
+        A HEALPixel number (or, e.g., "*" to build a glob pattern).
+
+    Returns
+    -------
+    :class:`str`
+        The full path to the staging file.
+    """
+    return os.path.join(stagedir, "targets-staged-hp-{}.fits".format(pixel))
+
+
+def stage_targets_in_hp(stagedir, data, nside):
+    """Append targets to staging files partitioned by HEALPixel.
+
+    Parameters
+    ----------
+    stagedir : :class:`str`
+        Directory of staged targets. Created if it doesn't exist.
+    data : :class:`~numpy.ndarray`
+        numpy structured array of targets to stage. Must include the
+        columns "RA" and "DEC".
+    nside : :class:`int`
+        The (NESTED) HEALPixel nside at which to partition targets.
+
+    Returns
+    -------
+    :class:`dict`
+        A dictionary where the keys are the HEALPixels touched by `data`
+        and the values are the staging file for each of those pixels.
+
+    Notes
+    -----
+        - Each staging file holds the targets in one HEALPixel and grows
+          (by appending rows) each time this function is called. So,
+          targets can be written as they are selected, without holding
+          the full set of targets in memory.
+        - Use :func:`_staged_targets_filename()` to find staging files.
+    """
+    if len(data) == 0:
+        return {}
+
+    os.makedirs(stagedir, exist_ok=True)
+
+    # ADM group the targets by HEALPixel.
+    theta, phi = np.radians(90-data["DEC"]), np.radians(data["RA"])
+    pixnums = hp.ang2pix(nside, theta, phi, nest=True)
+    ii = np.argsort(pixnums, kind="stable")
+    pixels, starts = np.unique(pixnums[ii], return_index=True)
+    ends = np.append(starts[1:], len(ii))
+
+    # ADM append each group to the file for its pixel.
+    filedict = {}
+    for pixel, start, end in zip(pixels, starts, ends):
+        fn = _staged_targets_filename(stagedir, pixel)
+        with FITS(fn, 'rw') as outy:
+            if 'TARGETS' in outy:
+                outy['TARGETS'].append(data[ii[start:end]])
+            else:
+                outy.write(data[ii[start:end]], extname='TARGETS')
+        filedict[int(pixel)] = fn
+
+    return filedict
+
+
+def remove_staged_targets(filedict, targetids):
+    """Remove targets from staging files.
+
+    Parameters
+    ----------
+    filedict : :class:`dict`
+        A dictionary where the keys are HEALPixels and the values are
+        staging files, as returned by :func:`stage_targets_in_hp()`.
+    targetids : :class:`~numpy.ndarray`
+        The TARGETIDs of the targets to remove.
+
+    Returns
+    -------
+    Nothing, but rewrites any files in `filedict` that contain one of
+    `targetids`. Files that are left with no targets are removed, as
+    are their entries in `filedict`.
+    """
+    for pixel, fn in list(filedict.items()):
+        # ADM only read the full file if it has targets to remove.
+        ii = np.isin(fitsio.read(fn, columns=["TARGETID"])["TARGETID"], targetids)
+        if np.any(ii):
+            data = fitsio.read(fn)[~ii]
+            if len(data) == 0:
+                os.remove(fn)
+                del filedict[pixel]
+            else:
+                fitsio.write(fn+'.tmp', data, extname='TARGETS', clobber=True)
+                os.rename(fn+'.tmp', fn)
+
+
 def write_secondary(targdir, data, primhdr=None, scxdir=None, obscon=None,
                     drint='X'):
     """Write a catalogue of secondary targets.
@@ -898,12 +1271,24 @@ def write_skies(targdir, data, indir=None, indir2=None, supp=False,
                                      hp=hpxlist, supp=supp, mock=mock,
                                      nside=nside)
 
+    # ADM sort HEALPixel-split files by HEALPixel (see write_targets).
+    rowranges = None
+    if nsidefile is not None:
+        data, rowranges = _sort_by_hp_rows(data)
+        hdr['HPXROWS'] = hprowsnside
+
     # ADM create necessary directories, if they don't exist.
     os.makedirs(os.path.dirname(filename), exist_ok=True)
 
     fitsio.write(filename+'.tmp', data, extname='SKY_TARGETS', header=hdr, clobber=True)
+    if rowranges is not None:
+        _write_hp_rows(filename+'.tmp', rowranges)
     os.rename(filename+'.tmp', filename)
 
+    # ADM add the file to the index of the HEALPixel-split directory.
+    if nsidefile is not None:
+        write_hp_index(os.path.dirname(filename), [filename])
+
     return len(data), filename
 
 
@@ -996,10 +1381,22 @@ def write_gfas(targdir, data, indir=None, indir2=None, nside=None,
     # ADM construct the output file name.
     filename = find_target_files(targdir, dr=drint, flavor="gfas", hp=hpxlist)
 
+    # ADM sort HEALPixel-split files by HEALPixel (see write_targets).
+    rowranges = None
+    if nsidefile is not None:
+        data, rowranges = _sort_by_hp_rows(data)
+        hdr['HPXROWS'] = hprowsnside
+
     # ADM create necessary directories, if they don't exist.
     os.makedirs(os.path.dirname(filename), exist_ok=True)
 
     fitsio.write(filename, data, extname='GFA_TARGETS', header=hdr, clobber=True)
+    if rowranges is not None:
+        _write_hp_rows(filename, rowranges)
+
+    # ADM add the file to the index of the HEALPixel-split directory.
+    if nsidefile is not None:
+        write_hp_index(os.path.dirname(filename), [filename])
 
     return len(data), filename
 
@@ -1539,6 +1936,178 @@ def decode_sweep_name(sweepname, nside=None, inclusive=True, fact=4):
     return pixnum
 
 
+def _hp_index_entry(filename, checksum=False):
+    """Index information for one HEALPixel-partitioned file.
+
+    Parameters
+    ----------
+    filename : :class:`str`
+        Full path to a file with `FILENSID` and `FILEHPX` in the header
+        of its first extension.
+    checksum : :class:`bool`, optional, defaults to ``False``
+        If ``True``, include the MD5 checksum of the file.
+
+    Returns
+    -------
+    :class:`dict`
+        The file's `nside`, `pixels`, `nrows`, `columns`, `size`,
+        `mtime_ns` (modification time) and (optionally) `checksum`.
+    """
+    with fitsio.FITS(filename) as fx:
+        hdr = fx[1].read_header()
+        columns = fx[1].get_colnames()
+        nrows = fx[1].get_nrows()
+
+    pixels = hdr["FILEHPX"]
+    # ADM if this is a one-pixel file, convert to a list.
+    if isinstance(pixels, int):
+        pixels = [pixels]
+    # ADM check we haven't stored a pixel string that is too long.
+    _check_hpx_length(pixels)
+
+    stat = os.stat(filename)
+    entry = {"nside": int(hdr["FILENSID"]), "pixels": [int(pix) for pix in pixels],
+             "nrows": int(nrows), "columns": columns,
+             "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if checksum:
+        entry["checksum"] = _md5sum(filename)
+
+    return entry
+
+
+def _md5sum(filename, blocksize=2**24):
+    """The MD5 checksum of a file, read in blocks of `blocksize` bytes."""
+    import hashlib
+    md5 = hashlib.md5()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(blocksize), b""):
+            md5.update(block)
+
+    return md5.hexdigest()
+
+
+def write_hp_index(hpdirname, filenames=None, checksum=False):
+    """Write (or update) the index of a HEALPixel-partitioned directory.
+
+    Parameters
+    ----------
+    hpdirname : :class:`str`
+        Full path to a directory containing targets that have been
+        split by HEALPixel.
+    filenames : :class:`list`, optional, defaults to ``None``
+        Add (or replace) index entries for just these files. If
+        ``None``, then (re)build the index from every file in
+        `hpdirname`.
+    checksum : :class:`bool`, optional, defaults to ``False``
+        If ``True``, record the MD5 checksum of each file. This reads
+        every file, so is only worthwhile if the index will be checked
+        with ``read_hp_index(verify=True)`` (e.g. via
+        ``bin/index_hp_targets --verify``).
+
+    Returns
+    -------
+    :class:`str`
+        The name of the index file.
+
+    Notes
+    -----
+        - The index is a JSON file called `hpindexname` in `hpdirname`
+          that records, for each file, the information from
+          :func:`_hp_index_entry`, keyed by the file's basename.
+        - The index is updated under a lock on the index file itself,
+          so that several writers can add files to the same directory.
+    """
+    import json
+    import fcntl
+
+    indexfile = os.path.join(hpdirname, hpindexname)
+    if filenames is None:
+        filenames = sorted(glob(os.path.join(hpdirname, "*fits")))
+        index = {}
+    else:
+        index = None
+
+    entries = {os.path.basename(fn): _hp_index_entry(fn, checksum=checksum)
+               for fn in filenames}
+
+    while True:
+        # ADM lock the index itself, so no extra files are left behind.
+        with open(indexfile, "a+") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # ADM another writer may have replaced the index while we
+            # ADM waited for the lock, in which case lock the new index.
+            if os.fstat(lock.fileno()).st_ino != os.stat(indexfile).st_ino:
+                continue
+            if index is None:
+                lock.seek(0)
+                text = lock.read()
+                index = json.loads(text)["files"] if len(text) > 0 else {}
+            index.update(entries)
+            # ADM write to a temporary file so the index is always complete.
+            with open(indexfile+".tmp", "w") as f:
+                json.dump({"version": 1, "files": index}, f, sort_keys=True)
+            os.rename(indexfile+".tmp", indexfile)
+            break
+
+    return indexfile
+
+
+def read_hp_index(hpdirname, verify=False):
+    """Read the index of a HEALPixel-partitioned directory, if it's current.
+
+    Parameters
+    ----------
+    hpdirname : :class:`str`
+        Full path to a directory containing targets that have been
+        split by HEALPixel.
+    verify : :class:`bool`, optional, defaults to ``False``
+        If ``True``, also check each file against its MD5 checksum, if
+        one was recorded.
+
+    Returns
+    -------
+    :class:`dict` or ``None``
+        The index entries (see :func:`write_hp_index`) keyed by the full
+        path to each file, or ``None`` if there is no index or the index
+        is out-of-date with respect to the files in `hpdirname`.
+
+    Notes
+    -----
+        - The index is out-of-date if the set of files in `hpdirname`
+          has changed, or if a file's size, modification time (or
+          checksum) has changed.
+    """
+    import json
+
+    indexfile = os.path.join(hpdirname, hpindexname)
+    if not os.path.exists(indexfile):
+        return None
+    # ADM an empty index is one that is still being created.
+    with open(indexfile) as f:
+        text = f.read()
+    if len(text) == 0:
+        return None
+    index = json.loads(text)["files"]
+
+    fns = glob(os.path.join(hpdirname, "*fits"))
+    if set(os.path.basename(fn) for fn in fns) != set(index):
+        log.warning("Index {} is out-of-date".format(indexfile))
+        return None
+
+    for fn in fns:
+        entry = index[os.path.basename(fn)]
+        stat = os.stat(fn)
+        stale = (stat.st_size != entry["size"] or
+                 stat.st_mtime_ns != entry.get("mtime_ns"))
+        if verify and not stale and "checksum" in entry:
+            stale = _md5sum(fn) != entry["checksum"]
+        if stale:
+            log.warning("Index {} is out-of-date for {}".format(indexfile, fn))
+            return None
+
+    return {os.path.join(hpdirname, bn): entry for bn, entry in index.items()}
+
+
 def check_hp_target_dir(hpdirname):
     """Check fidelity of a directory of HEALPixel-partitioned targets.
 
@@ -1562,22 +2131,34 @@ def check_hp_target_dir(hpdirname):
         - Checks that all files are at the same NSIDE.
         - Checks that no two files contain the same HEALPixels.
         - Checks that HEALPixel numbers are consistent with NSIDE.
+        - Uses the index written by :func:`write_hp_index`, if it's
+          current, rather than reading the header of every file.
     """
-    # ADM glob all the files in the directory, read the pixel
-    # ADM numbers and NSIDEs.
+    # ADM use the directory's index, if it exists and is current...
+    index = read_hp_index(hpdirname)
+    if index is not None:
+        fns = sorted(index)
+        headers = [(index[fn]["nside"], index[fn]["pixels"]) for fn in fns]
+    # ADM ...otherwise glob all the files in the directory, read the
+    # ADM pixel numbers and NSIDEs.
+    else:
+        fns = glob(os.path.join(hpdirname, "*fits"))
+        headers = []
+        for fn in fns:
+            hdr = read_targets_header(fn)
+            pixels = hdr["FILEHPX"]
+            # ADM if this is a one-pixel file, convert to a list.
+            if isinstance(pixels, int):
+                pixels = [pixels]
+            # ADM check we haven't stored a pixel string that is too long.
+            _check_hpx_length(pixels)
+            headers.append((hdr["FILENSID"], pixels))
+
     nside = []
     pixlist = []
-    fns = glob(os.path.join(hpdirname, "*fits"))
     pixdict = {}
-    for fn in fns:
-        hdr = read_targets_header(fn)
-        nside.append(hdr["FILENSID"])
-        pixels = hdr["FILEHPX"]
-        # ADM if this is a one-pixel file, convert to a list.
-        if isinstance(pixels, int):
-            pixels = [pixels]
-        # ADM check we haven't stored a pixel string that is too long.
-        _check_hpx_length(pixels)
+    for fn, (filenside, pixels) in zip(fns, headers):
+        nside.append(filenside)
         # ADM create a look-up dictionary of file-for-each-pixel.
         for pix in pixels:
             pixdict[pix] = fn
@@ -1775,8 +2356,136 @@ def find_target_files(targdir, dr=None, flavor="targets", survey="main",
     return fn
 
 
+def _target_cache_dir(filename):
+    """The directory of the columnar cache of a target file."""
+    return os.path.splitext(filename)[0] + ".npcache"
+
+
+def write_target_cache(filename):
+    """Write a memory-mappable, native-endian, columnar cache of a file.
+
+    Parameters
+    ----------
+    filename : :class:`str`
+        Name of a target file of any type (see :func:`read_target_files`).
+
+    Returns
+    -------
+    :class:`str`
+        The name of the cache directory.
+
+    Notes
+    -----
+        - The cache is a directory alongside `filename` (with extension
+          ``.npcache``) holding one native-endian ``.npy`` file per
+          column and a ``manifest.json`` that records the file header,
+          the columns and the size and modification time of `filename`.
+        - Columns are read back from `filename` one at a time, so the
+          cache matches what :func:`fitsio.read` returns.
+    """
+    import json
+    import shutil
+
+    start = time()
+    cachedir = _target_cache_dir(filename)
+    # ADM write to a temporary directory so the cache is always complete.
+    tmpdir = cachedir + ".tmp"
+    shutil.rmtree(tmpdir, ignore_errors=True)
+    os.makedirs(tmpdir)
+
+    with fitsio.FITS(filename) as fx:
+        hdr = fx[1].read_header()
+        columns = fx[1].get_colnames()
+        nrows = fx[1].get_nrows()
+        # ADM set up a native-endian .npy file for each column...
+        dt = fx[1].read(rows=np.zeros(0, dtype="i8")).dtype
+        out = {}
+        for col in columns:
+            coldt, shape = dt[col].base, (nrows,) + dt[col].shape
+            out[col] = np.lib.format.open_memmap(
+                os.path.join(tmpdir, col+".npy"), mode="w+",
+                dtype=coldt.newbyteorder("="), shape=shape)
+        # ADM ...and populate the columns in blocks of rows.
+        blocksize = max(1, 2**26 // dt.itemsize)
+        for begin in range(0, nrows, blocksize):
+            data = fx[1][begin:begin+blocksize]
+            for col in columns:
+                out[col][begin:begin+len(data)] = data[col]
+        for col in columns:
+            out[col].flush()
+        del out
+
+    stat = os.stat(filename)
+    manifest = {"version": 1, "columns": columns, "nrows": hdr["NAXIS2"],
+                "size": stat.st_size, "mtime": stat.st_mtime_ns,
+                "header": [{key: rec.get(key) for key in ["name", "value", "comment"]}
+                           for rec in hdr.records()]}
+    with open(os.path.join(tmpdir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, default=str)
+
+    shutil.rmtree(cachedir, ignore_errors=True)
+    os.rename(tmpdir, cachedir)
+    log.info("Cached {} columns of {}...t = {:.1f}s".format(
+        len(columns), os.path.basename(filename), time()-start))
+
+    return cachedir
+
+
+def load_target_cache(filename, columns=None):
+    """Memory-map the columns of a target file from its columnar cache.
+
+    Parameters
+    ----------
+    filename : :class:`str`
+        Name of a target file with a cache made by :func:`write_target_cache`.
+    columns : :class:`list`, optional
+        Only map these columns. Defaults to all columns.
+
+    Returns
+    -------
+    :class:`dict` or ``None``
+        Read-only, memory-mapped arrays for each column (in file order),
+        or ``None`` if there is no cache or it's out-of-date.
+    :class:`FITSHDR` or ``None``
+        The header of the target file, or ``None`` if there's no cache.
+
+    Notes
+    -----
+        - The cache is out-of-date if the size or modification time of
+          `filename` has changed since the cache was written.
+        - No data is read until the arrays are accessed, so only the
+          pages for the columns (and rows) that are used are read.
+    """
+    import json
+
+    cachedir = _target_cache_dir(filename)
+    manifestfile = os.path.join(cachedir, "manifest.json")
+    if not os.path.exists(manifestfile):
+        return None, None
+    with open(manifestfile) as f:
+        manifest = json.load(f)
+
+    stat = os.stat(filename)
+    if stat.st_size != manifest["size"] or stat.st_mtime_ns != manifest["mtime"]:
+        log.warning("Ignoring out-of-date cache {}".format(cachedir))
+        return None, None
+
+    if columns is None:
+        columns = manifest["columns"]
+    missing = set(columns) - set(manifest["columns"])
+    if len(missing) > 0:
+        msg = "columns {} are not in {}".format(missing, filename)
+        log.critical(msg)
+        raise ValueError(msg)
+
+    cols = {col: np.load(os.path.join(cachedir, col+".npy"), mmap_mode="r")
+            for col in manifest["columns"] if col in columns}
+
+    return cols, fitsio.FITSHDR(manifest["header"])
+
+
 def read_target_files(filename, columns=None, rows=None, header=False,
-                      downsample=None, verbose=True):
+                      downsample=None, verbose=True, usecache=False):
     """Wrapper to cycle through allowed extensions to read target files.
 
     Parameters
@@ -1796,32 +2505,62 @@ def read_target_files(filename, columns=None, rows=None, header=False,
         rows read in. Overrode by the `rows` kwarg if it is not `None`.
     verbose : :class:`bool`, optional, defaults to ``False``
         If ``True`` then log the file and extension that was read.
+    usecache : :class:`bool`, optional, defaults to ``False``
+        If ``True``, and `filename` has a current columnar cache (see
+        :func:`write_target_cache`), read from the cache instead of the
+        FITS file. Columns read from the cache are native-endian, rather
+        than the big-endian columns read from the FITS file, but are
+        otherwise identical.
     """
     start = time()
-    # ADM start with some checking that this is a target file.
-    targtypes = "TARGETS", "GFA_TARGETS", "SKY_TARGETS"
-    # ADM read in the FITS extention info.
-    f = fitsio.FITS(filename)
-    if len(f) != 2:
-        log.info(f)
-        msg = "targeting files should only have 2 extensions?!"
-        log.error(msg)
-        raise IOError(msg)
-    # ADM check for allowed extensions.
-    extname = f[1].get_extname()
-    if extname not in targtypes:
-        log.info(f)
-        msg = "unrecognized target file type: {}".format(extname)
-        log.error(msg)
-        raise IOError(msg)
+    # ADM use the columnar cache, if there is a current cache.
+    cols = None
+    if usecache:
+        cols, hdr = load_target_cache(filename, columns=columns)
+
+    if cols is not None:
+        extname = hdr["EXTNAME"]
+    else:
+        # ADM start with some checking that this is a target file.
+        targtypes = "TARGETS", "GFA_TARGETS", "SKY_TARGETS"
+        # ADM read in the FITS extention info.
+        f = fitsio.FITS(filename)
+        # ADM HEALPixel-split files can also have an HPXROWS extension.
+        if len(f) != 2 and not (len(f) == 3 and "HPXROWS" in f):
+            log.info(f)
+            msg = "targeting files should only have 2 extensions?!"
+            log.error(msg)
+            raise IOError(msg)
+        # ADM check for allowed extensions.
+        extname = f[1].get_extname()
+        if extname not in targtypes:
+            log.info(f)
+            msg = "unrecognized target file type: {}".format(extname)
+            log.error(msg)
+            raise IOError(msg)
 
     if downsample is not None and rows is None:
         np.random.seed(616)
-        ntargs = fitsio.read_header(filename, extname)["NAXIS2"]
+        ntargs = hdr["NAXIS2"] if cols is not None else \
+            fitsio.read_header(filename, extname)["NAXIS2"]
         rows = np.random.choice(ntargs, ntargs//downsample, replace=False)
 
-    targs, hdr = fitsio.read(filename, extname,
-                             columns=columns, rows=rows, header=True)
+    if cols is not None:
+        # ADM only the requested rows of the mapped columns are read.
+        nrows = hdr["NAXIS2"] if rows is None else len(rows)
+        targs = np.empty(nrows, dtype=[(col, cols[col].dtype, cols[col].shape[1:])
+                                       for col in cols])
+        # ADM fill blocks of rows, so each block of output stays in cache.
+        cols = {col: np.asarray(cols[col]) for col in cols}
+        blocksize = max(1, 2**20 // targs.dtype.itemsize)
+        for begin in range(0, nrows, blocksize):
+            block = slice(begin, begin+blocksize)
+            blockrows = block if rows is None else rows[block]
+            for col in cols:
+                targs[col][block] = cols[col][blockrows]
+    else:
+        targs, hdr = fitsio.read(filename, extname,
+                                 columns=columns, rows=rows, header=True)
 
     if verbose:
         log.info("Read {} targets from {}, extension {}...Took {:.1f}s".format(
@@ -1833,8 +2572,123 @@ def read_target_files(filename, columns=None, rows=None, header=False,
     return targs
 
 
+def _read_target_columns(filename, columns, rows=None, downsample=None,
+                         usecache=True):
+    """Read the columns of a target file as a dictionary of arrays.
+
+    Parameters
+    ----------
+    filename : :class:`str`
+        Name of a target file of any type.
+    columns : :class:`list`
+        The target columns to read (or ``None`` for every column).
+    rows : :class:`list`, optional
+        Only read in these (sorted) rows from the target file.
+    downsample : :class:`int`, optional, defaults to `None`
+        Downsample the rows as for :func:`read_target_files`.
+    usecache : :class:`bool`, optional, defaults to ``True``
+        If ``True``, use the columnar cache of `filename`, if current.
+
+    Returns
+    -------
+    :class:`dict`
+        Native-endian arrays for each of `columns`. If read from the
+        cache, columns for every row, or a contiguous range of rows,
+        are (zero-copy) memory maps.
+    :class:`FITSHDR`
+        The header of `filename`.
+    """
+    cols = None
+    if usecache:
+        cols, hdr = load_target_cache(filename, columns=columns)
+    if cols is None:
+        targs, hdr = read_target_files(filename, columns=columns, rows=rows,
+                                       header=True, downsample=downsample,
+                                       verbose=False)
+        cols = {col: targs[col].astype(targs[col].dtype.newbyteorder("="))
+                for col in targs.dtype.names}
+        return cols, hdr
+
+    # ADM downsample exactly as for read_target_files.
+    if downsample is not None and rows is None:
+        np.random.seed(616)
+        rows = np.random.choice(hdr["NAXIS2"], hdr["NAXIS2"]//downsample,
+                                replace=False)
+    if rows is not None:
+        rows = np.asarray(rows)
+        # ADM a contiguous range of rows is a (zero-copy) slice.
+        if len(rows) > 0 and np.all(np.diff(rows) == 1):
+            rows = slice(rows[0], rows[-1]+1)
+        cols = {col: cols[col][rows] for col in cols}
+
+    return cols, hdr
+
+
+def _restrict_columns(cols, ii, dropcols=[]):
+    """Restrict a dictionary of columns to rows `ii`, dropping `dropcols`.
+
+    Columns are only copied if `ii` excludes some rows.
+    """
+    if np.all(ii):
+        return {col: cols[col] for col in cols if col not in dropcols}
+    return {col: cols[col][ii] for col in cols if col not in dropcols}
+
+
+def _read_columns_in_hp(infiles, rows, notargs, nohdr, nside, pixlist,
+                        dropcols, header=False):
+    """Read the columns of targets in HEALPixels from a set of files.
+
+    Parameters
+    ----------
+    infiles : :class:`list`
+        The target files to read.
+    rows : :class:`list`
+        The rows to read from each of `infiles` (or ``None`` for all).
+    notargs : :class:`~numpy.ndarray`
+        Zero-length array with the data model of the columns to read.
+    nohdr : :class:`FITSHDR`
+        The header to return if there are no `infiles`.
+    nside, pixlist
+        As for :func:`read_targets_in_hp`.
+    dropcols : :class:`list`
+        Columns to read for the HEALPixel cut, but not to return.
+    header : :class:`bool`, optional, defaults to ``False``
+        If ``True`` then also return the header of the last file.
+
+    Returns
+    -------
+    :class:`dict`
+        Column arrays, as for :func:`read_targets_in_hp` with
+        `ascolumns` set to ``True``.
+    """
+    columns = list(notargs.dtype.names)
+    if len(infiles) == 0:
+        targets = {col: notargs[col].astype(notargs[col].dtype.newbyteorder("="))
+                   for col in columns}
+        hdr = nohdr
+    else:
+        percols = []
+        for infile, filerows in zip(infiles, rows):
+            cols, hdr = _read_target_columns(infile, columns, rows=filerows)
+            percols.append(cols)
+        # ADM only concatenate (and so copy) if there's more than one file.
+        if len(percols) == 1:
+            targets = percols[0]
+        else:
+            targets = {col: np.concatenate([cols[col] for cols in percols])
+                       for col in columns}
+
+    ii = is_in_hp(targets, nside, pixlist)
+    targets = _restrict_columns(targets, ii, dropcols)
+
+    if header:
+        return targets, hdr
+    return targets
+
+
 def read_targets_in_hp(hpdirname, nside, pixlist, columns=None,
-                       header=False, downsample=None):
+                       header=False, downsample=None, numproc=1,
+                       usecache=False, ascolumns=False):
     """Read in targets in a set of HEALPixels.
 
     Parameters
@@ -1857,16 +2711,39 @@ def read_targets_in_hp(hpdirname, nside, pixlist, columns=None,
         If not `None`, downsample targets by (roughly) this value, e.g.
         for `downsample=10` a set of 900 targets would have ~90 random
         targets returned.
+    numproc : :class:`int`, optional, defaults to 1
+        The number of processes with which to read files concurrently
+        (if `hpdirname` is a directory).
+    usecache : :class:`bool`, optional, defaults to ``False``
+        If ``True``, read from the columnar cache of each file, if
+        current, as for :func:`read_target_files`.
+    ascolumns : :class:`bool`, optional, defaults to ``False``
+        If ``True``, return a dictionary of (native-endian) column arrays
+        instead of a structured array (e.g. for just the `columns` that
+        are needed). Files are read from their columnar cache, if
+        current, and are read serially. See the Notes.
 
     Returns
     -------
-    :class:`~numpy.ndarray`
-        An array of targets in the passed pixels.
+    :class:`~numpy.ndarray` or :class:`dict`
+        An array (or, if `ascolumns` is ``True``, a dictionary of column
+        arrays) of targets in the passed pixels.
 
     Notes
     -----
         - If `header` is ``True``, then a second output (the file
           header is returned).
+        - For files with an HPXROWS extension (see :func:`write_targets`)
+          only the rows that can be in `pixlist` are read.
+        - Files are read into a single, preallocated, output array in
+          the (sorted) order of their filenames.
+        - fitsio holds the GIL while reading, so concurrent reads use
+          processes, which pass what they read back through shared
+          memory (see :mod:`desitarget.internal.sharedmem`).
+        - With `ascolumns`, if the targets are all from a contiguous
+          range of rows of one cached file (e.g. one file at its own
+          HEALPixel nside, or every row of a file), the columns are
+          memory-maps of the cache, so no data is copied.
     """
     # ADM allow an integer instead of a list to be passed.
     if isinstance(pixlist, int):
@@ -1891,7 +2768,8 @@ def read_targets_in_hp(hpdirname, nside, pixlist, columns=None,
         # ADM cases where we find no targets in the box.
         fn0 = list(filedict.values())[0]
         notargs, nohdr = read_target_files(fn0, columns=columnscopy,
-                                           header=True, downsample=downsample)
+                                           rows=[0], header=True,
+                                           usecache=usecache)
         notargs = np.zeros(0, dtype=notargs.dtype)
 
         # ADM change the passed pixels to the nside of the file schema.
@@ -1901,39 +2779,93 @@ def read_targets_in_hp(hpdirname, nside, pixlist, columns=None,
         isindict = [pix in filedict for pix in filepixlist]
         filepixlist = filepixlist[isindict]
 
-        # ADM make sure each file is only read once.
-        infiles = set([filedict[pix] for pix in filepixlist])
+        # ADM make sure each file is only read once, in a fixed order
+        # ADM so that the output is deterministic.
+        infiles = sorted(set([filedict[pix] for pix in filepixlist]))
 
-        # ADM read in the files and concatenate the resulting targets.
-        targets = []
-        start = time()
+        # ADM the rows to read from each file, and so the output size.
+        rows, nrows = [], []
         for infile in infiles:
-            targs, hdr = read_target_files(infile, columns=columnscopy,
-                                           header=True, downsample=downsample)
-            targets.append(targs)
-        # ADM if targets is empty, return no targets.
-        if len(targets) == 0:
+            # ADM only read the rows in the pixels, if they're recorded.
+            filerows = _rows_in_hp(infile, nside, pixlist, downsample=downsample)
+            if filerows is None:
+                ntargs = fitsio.read_header(infile, 1)["NAXIS2"]
+                # ADM downsample exactly as for read_target_files.
+                if downsample is not None:
+                    np.random.seed(616)
+                    filerows = np.random.choice(ntargs, ntargs//downsample,
+                                                replace=False)
+            rows.append(filerows)
+            nrows.append(ntargs if filerows is None else len(filerows))
+        offsets = np.cumsum([0] + nrows)
+
+        # ADM if requested, read (or map) the columns of each file.
+        toread = [i for i in range(len(infiles)) if nrows[i] > 0]
+        if ascolumns:
+            return _read_columns_in_hp(
+                [infiles[i] for i in toread], [rows[i] for i in toread],
+                notargs, nohdr, nside, pixlist, addedcols, header=header)
+
+        # ADM read the files into a preallocated array.
+        targets = np.empty(offsets[-1], dtype=notargs.dtype)
+        hdrs = [None for infile in infiles]
+
+        def _read_file(i):
+            """Read the rows in the pixels from one file"""
+            targs, hdr = read_target_files(
+                infiles[i], columns=columnscopy, rows=rows[i], header=True,
+                usecache=usecache)
+            return i, targs, hdr
+
+        def _update_targets(i, targs, hdr):
+            """Copy the rows from one file into its slot in the output"""
+            targets[offsets[i]:offsets[i+1]] = targs
+            hdrs[i] = hdr
+
+        if numproc > 1 and len(toread) > 1:
+            from desitarget.internal import sharedmem
+            pool = sharedmem.MapReduce(np=numproc)
+            with pool:
+                pool.map(_read_file, toread, reduce=_update_targets,
+                         shared=True)
+        else:
+            for i in toread:
+                _update_targets(*_read_file(i))
+
+        # ADM if no files were read, return no targets.
+        hdrs = [hdr for hdr in hdrs if hdr is not None]
+        if len(hdrs) == 0:
             if header:
                 return notargs, nohdr
             else:
                 return notargs
-        targets = np.concatenate(targets)
+        hdr = hdrs[-1]
     # ADM ...otherwise just read in the targets.
     else:
-        targets, hdr = read_target_files(hpdirname, columns=columnscopy,
-                                         header=True, downsample=downsample)
+        rows = _rows_in_hp(hpdirname, nside, pixlist, downsample=downsample)
+        if ascolumns:
+            targets, hdr = _read_target_columns(
+                hpdirname, columnscopy, rows=rows, downsample=downsample)
+        else:
+            targets, hdr = read_target_files(
+                hpdirname, columns=columnscopy, rows=rows, header=True,
+                downsample=downsample, usecache=usecache)
 
     # ADM restrict the targets to the actual requested HEALPixels...
     ii = is_in_hp(targets, nside, pixlist)
     # ADM ...and remove RA/Dec columns if we added them.
-    targets = rfn.drop_fields(targets[ii], addedcols)
+    if ascolumns:
+        targets = _restrict_columns(targets, ii, addedcols)
+    else:
+        targets = rfn.drop_fields(targets[ii], addedcols)
 
     if header:
         return targets, hdr
     return targets
 
 
-def read_targets_in_tiles(hpdirname, tiles=None, columns=None, header=False):
+def read_targets_in_tiles(hpdirname, tiles=None, columns=None, header=False,
+                          numproc=1, usecache=False, ascolumns=False):
     """
     Parameters
     ----------
@@ -1950,11 +2882,18 @@ def read_targets_in_tiles(hpdirname, tiles=None, columns=None, header=False):
     header : :class:`bool`, optional, defaults to ``False``
         If ``True`` then return the header of either the `hpdirname`
         file, or the last file read from the `hpdirname` directory.
+    numproc : :class:`int`, optional, defaults to 1
+        The number of processes with which to read files concurrently,
+        passed to :func:`read_targets_in_hp`.
+    usecache, ascolumns : :class:`bool`, optional, default to ``False``
+        Read from columnar caches, and return a dictionary of column
+        arrays, as for :func:`read_targets_in_hp`.
 
     Returns
     -------
-    :class:`~numpy.ndarray`
-        An array of targets in the passed tiles.
+    :class:`~numpy.ndarray` or :class:`dict`
+        An array (or a dictionary of column arrays) of targets in the
+        passed tiles.
 
     Notes
     -----
@@ -1996,18 +2935,25 @@ def read_targets_in_tiles(hpdirname, tiles=None, columns=None, header=False):
         # ADM read in targets in these HEALPixels.
         targets, hdr = read_targets_in_hp(hpdirname, nside, pixlist,
                                           columns=columnscopy,
-                                          header=True)
+                                          header=True, numproc=numproc,
+                                          usecache=usecache,
+                                          ascolumns=ascolumns)
     # ADM ...otherwise just read in the targets.
+    elif ascolumns:
+        targets, hdr = _read_target_columns(hpdirname, columnscopy)
     else:
         targets, hdr = read_target_files(hpdirname, columns=columnscopy,
-                                         header=True)
+                                         header=True, usecache=usecache)
 
     # ADM restrict only to targets in the requested tiles...
     from desimodel.footprint import is_point_in_desi
     ii = is_point_in_desi(tiles, targets["RA"], targets["DEC"])
 
     # ADM ...and remove RA/Dec columns if we added them.
-    targets = rfn.drop_fields(targets[ii], addedcols)
+    if ascolumns:
+        targets = _restrict_columns(targets, ii, addedcols)
+    else:
+        targets = rfn.drop_fields(targets[ii], addedcols)
 
     if header:
         return targets, hdr
@@ -2015,7 +2961,8 @@ def read_targets_in_tiles(hpdirname, tiles=None, columns=None, header=False):
 
 
 def read_targets_in_box(hpdirname, radecbox=[0., 360., -90., 90.],
-                        columns=None, header=False, downsample=None):
+                        columns=None, header=False, downsample=None,
+                        numproc=1, usecache=False, ascolumns=False):
     """Read in targets in an RA/Dec box.
 
     Parameters
@@ -2037,11 +2984,18 @@ def read_targets_in_box(hpdirname, radecbox=[0., 360., -90., 90.],
         If not `None`, downsample targets by (roughly) this value, e.g.
         for `downsample=10` a set of 900 targets would have ~90 random
         targets returned.
+    numproc : :class:`int`, optional, defaults to 1
+        The number of processes with which to read files concurrently,
+        passed to :func:`read_targets_in_hp`.
+    usecache, ascolumns : :class:`bool`, optional, default to ``False``
+        Read from columnar caches, and return a dictionary of column
+        arrays, as for :func:`read_targets_in_hp`.
 
     Returns
     -------
-    :class:`~numpy.ndarray`
-        An array of targets in the passed RA/Dec box.
+    :class:`~numpy.ndarray` or :class:`dict`
+        An array (or a dictionary of column arrays) of targets in the
+        passed RA/Dec box.
 
     Notes
     -----
@@ -2068,23 +3022,33 @@ def read_targets_in_box(hpdirname, radecbox=[0., 360., -90., 90.],
         # ADM read in targets in these HEALPixels.
         targets, hdr = read_targets_in_hp(hpdirname, nside, pixlist,
                                           columns=columnscopy, header=True,
-                                          downsample=downsample)
+                                          downsample=downsample,
+                                          numproc=numproc, usecache=usecache,
+                                          ascolumns=ascolumns)
     # ADM ...otherwise just read in the targets.
+    elif ascolumns:
+        targets, hdr = _read_target_columns(hpdirname, columnscopy,
+                                            downsample=downsample)
     else:
         targets, hdr = read_target_files(hpdirname, columns=columnscopy,
-                                         header=True, downsample=downsample)
+                                         header=True, downsample=downsample,
+                                         usecache=usecache)
 
     # ADM restrict only to targets in the requested RA/Dec box...
     ii = is_in_box(targets, radecbox)
     # ADM ...and remove RA/Dec columns if we added them.
-    targets = rfn.drop_fields(targets[ii], addedcols)
+    if ascolumns:
+        targets = _restrict_columns(targets, ii, addedcols)
+    else:
+        targets = rfn.drop_fields(targets[ii], addedcols)
 
     if header:
         return targets, hdr
     return targets
 
 
-def read_targets_in_cap(hpdirname, radecrad, columns=None):
+def read_targets_in_cap(hpdirname, radecrad, columns=None, numproc=1,
+                        usecache=False, ascolumns=False):
     """Read in targets in an RA, Dec, radius cap.
 
     Parameters
@@ -2099,11 +3063,18 @@ def read_targets_in_cap(hpdirname, radecrad, columns=None):
         "circle" on the sky. ra, dec and radius are all in degrees.
     columns : :class:`list`, optional
         Only read in these target columns.
+    numproc : :class:`int`, optional, defaults to 1
+        The number of processes with which to read files concurrently,
+        passed to :func:`read_targets_in_hp`.
+    usecache, ascolumns : :class:`bool`, optional, default to ``False``
+        Read from columnar caches, and return a dictionary of column
+        arrays, as for :func:`read_targets_in_hp`.
 
     Returns
     -------
-    :class:`~numpy.ndarray`
-        An array of targets in the passed RA/Dec box.
+    :class:`~numpy.ndarray` or :class:`dict`
+        An array (or a dictionary of column arrays) of targets in the
+        passed RA/Dec cap.
     """
     # ADM we'll need RA/Dec for final cuts, so ensure they're read.
     addedcols = []
@@ -2126,15 +3097,23 @@ def read_targets_in_cap(hpdirname, radecrad, columns=None):
 
         # ADM read in targets in these HEALPixels.
         targets = read_targets_in_hp(hpdirname, nside, pixlist,
-                                     columns=columnscopy)
+                                     columns=columnscopy,
+                                     numproc=numproc, usecache=usecache,
+                                     ascolumns=ascolumns)
     # ADM ...otherwise just read in the targets.
+    elif ascolumns:
+        targets, _ = _read_target_columns(hpdirname, columnscopy)
     else:
-        targets = read_target_file(hpdirname, columns=columnscopy)
+        targets = read_target_files(hpdirname, columns=columnscopy,
+                                    usecache=usecache)
 
     # ADM restrict only to targets in the requested cap...
     ii = is_in_cap(targets, radecrad)
     # ADM ...and remove RA/Dec columns if we added them.
-    targets = rfn.drop_fields(targets[ii], addedcols)
+    if ascolumns:
+        targets = _restrict_columns(targets, ii, addedcols)
+    else:
+        targets = rfn.drop_fields(targets[ii], addedcols)
 
     return targets
 
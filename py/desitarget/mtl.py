@@ -5,6 +5,7 @@ desitarget.mtl
 Merged target lists.
 """
 
+import os
 import numpy as np
 import sys
 from astropy.table import Table
@@ -15,8 +16,153 @@ from desitarget.targetmask import obsmask, obsconditions
 from desitarget.targets import calc_priority, main_cmx_or_sv, set_obsconditions
 from desitarget.io import read_targets_in_box
 
+# ADM set up the DESI default logger
+from desiutil.log import get_logger
+log = get_logger()
 
-def make_mtl(targets, obscon, zcat=None, trim=False, scnd=None):
+# ADM the data model for entries in the (append-only) MTL ledger.
+mtlledgerdatamodel = np.array([], dtype=[
+    ('TARGETID', '>i8'), ('NUMOBS', '>i4'), ('Z', '>f8'), ('ZWARN', '>i8'),
+    ('NUMOBS_MORE', '>i8'), ('PRIORITY', '>i8')
+])
+
+
+def _match_targetids(targetid, ztargetid):
+    """Match the TARGETIDs of a redshift catalog to those of targets.
+
+    Parameters
+    ----------
+    targetid : :class:`~numpy.ndarray`
+        The TARGETIDs of the targets.
+    ztargetid : :class:`~numpy.ndarray`
+        The TARGETIDs of the redshift catalog.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        The index in `targetid` of each of `ztargetid`. For duplicated
+        TARGETIDs, this is the index of the last duplicate.
+    :class:`~numpy.ndarray`
+        ``True`` for each of `ztargetid` that is in `targetid`.
+
+    Notes
+    -----
+        - Uses a sort and binary search, rather than a Python dictionary.
+          `targetid` isn't sorted if it's already in order.
+    """
+    targetid, ztargetid = np.asarray(targetid), np.asarray(ztargetid)
+    if len(targetid) == 0:
+        return (np.zeros(len(ztargetid), dtype='i8'),
+                np.zeros(len(ztargetid), dtype='?'))
+
+    order = None
+    if not np.all(targetid[1:] >= targetid[:-1]):
+        order = np.argsort(targetid, kind='stable')
+    ii = np.searchsorted(targetid, ztargetid, side='right', sorter=order) - 1
+    ii = ii.clip(0)
+    if order is not None:
+        ii = order[ii]
+
+    return ii, targetid[ii] == ztargetid
+
+
+def _zcat_values(zcat):
+    """The columns of a redshift catalog that are needed to update an MTL.
+
+    Parameters
+    ----------
+    zcat : :class:`~astropy.table.Table` or `~numpy.array`
+        Redshift catalog with columns ``TARGETID``, ``NUMOBS``, ``Z``,
+        ``ZWARN`` and (optionally) ``SPECTYPE``.
+
+    Returns
+    -------
+    :class:`dict`
+        The columns, keyed by name. Masked (unobserved) entries are
+        filled with ``NUMOBS=0`` and ``Z=ZWARN=-1``.
+    """
+    zcols = [col for col in ["TARGETID", "NUMOBS", "Z", "ZWARN", "SPECTYPE"]
+             if col in zcat.dtype.names]
+
+    return {col: np.ma.filled(zcat[col], {"NUMOBS": 0}.get(col, -1))
+            for col in zcols}
+
+
+def _zcat_priority_numobs(targets, zvals, obscon, tracer=True):
+    """PRIORITY and NUMOBS_MORE for targets that have redshift information.
+
+    Parameters
+    ----------
+    targets : :class:`~numpy.array`
+        Targets with at least the columns needed by
+        :func:`~desitarget.targets.calc_priority` and ``NUMOBS_INIT``.
+    zvals : :class:`dict`
+        Redshift information for each of `targets`, as returned by
+        :func:`_zcat_values`.
+    obscon : :class:`str`
+        Observing conditions, as for :func:`make_mtl`.
+    tracer : :class:`bool`, optional, defaults to ``True``
+        If ``True``, stop observing confirmed tracer quasars (main survey,
+        DARK conditions only). Needs ``SPECTYPE`` in `zvals`.
+
+    Returns
+    -------
+    :class:`~numpy.array`
+        The redshift information as a structured array, including the
+        updated ``NUMOBS_MORE``.
+    :class:`~numpy.array`
+        The updated priority of each of `targets`.
+
+    Notes
+    -----
+        - Each output row only depends on the corresponding row of
+          `targets` and `zvals`, so any subset of targets can be updated.
+    """
+    # ADM determine whether the input targets are main survey, cmx or SV.
+    colnames, masks, survey = main_cmx_or_sv(targets)
+    # ADM set the first column to be the "desitarget" column
+    desi_target, desi_mask = colnames[0], masks[0]
+
+    # ADM use passed value of NUMOBS_INIT instead of calling the memory-heavy calc_numobs.
+    # ztargets['NUMOBS_MORE'] = np.maximum(0, calc_numobs(ztargets) - ztargets['NUMOBS'])
+    zvals = dict(zvals)
+    zvals['NUMOBS_MORE'] = np.maximum(0, targets['NUMOBS_INIT'] - zvals['NUMOBS'])
+
+    # ADM the redshift information as a structured array.
+    ztargets = np.zeros(len(zvals['NUMOBS']),
+                        dtype=[(col, val.dtype.str) for col, val in zvals.items()])
+    for col, val in zvals.items():
+        ztargets[col] = val
+
+    # ADM need a minor hack to ensure BGS targets are observed once
+    # ADM (and only once) every time during the BRIGHT survey, regardless
+    # ADM of how often they've previously been observed. I've turned this
+    # ADM off for commissioning. Not sure if we'll keep it in general.
+    if survey != 'cmx':
+        # ADM only if we're considering bright survey conditions.
+        if (obsconditions.mask(obscon) & obsconditions.mask("BRIGHT")) != 0:
+            ii = targets[desi_target] & desi_mask.BGS_ANY > 0
+            ztargets['NUMOBS_MORE'][ii] = 1
+    if survey == 'main':
+        # If the object is confirmed to be a tracer QSO, then don't request more observations
+        if (obsconditions.mask(obscon) & obsconditions.mask("DARK")) != 0:
+            if tracer:
+                ii = ztargets['SPECTYPE'] == 'QSO'
+                ii &= (ztargets['ZWARN'] == 0)
+                ii &= (ztargets['Z'] < 2.1)
+                ii &= (ztargets['NUMOBS'] > 0)
+                ztargets['NUMOBS_MORE'][ii] = 0
+
+    priority = calc_priority(targets, ztargets, obscon)
+
+    # If priority went to 0==DONOTOBSERVE or 1==OBS or 2==DONE, then NUMOBS_MORE should also be 0.
+    # ## mtl['NUMOBS_MORE'] = ztargets['NUMOBS_MORE']
+    ztargets['NUMOBS_MORE'][priority <= 2] = 0
+
+    return ztargets, priority
+
+
+def make_mtl(targets, obscon, zcat=None, trim=False, scnd=None, astable=True):
     """Adds NUMOBS, PRIORITY, and OBSCONDITIONS columns to a targets table.
 
     Parameters
@@ -30,7 +176,7 @@ def make_mtl(targets, obscon, zcat=None, trim=False, scnd=None):
         file (specifically in `desitarget.targetmask.obsconditions`), e.g.
         "DARK|GRAY". Governs the behavior of how priorities are set based
         on "obsconditions" in the desitarget bitmask yaml file.
-    zcat : :class:`~astropy.table.Table`, optional
+    zcat : :class:`~astropy.table.Table` or `~numpy.array`, optional
         Redshift catalog table with columns ``TARGETID``, ``NUMOBS``, ``Z``,
         ``ZWARN``.
     trim : :class:`bool`, optional
@@ -42,25 +188,37 @@ def make_mtl(targets, obscon, zcat=None, trim=False, scnd=None):
         ``PRIORITY_INIT`` or the corresponding SV columns.
         The secondary targets will be padded to have the same columns
         as the targets, and concatenated with them.
+    astable : :class:`bool`, optional, defaults to ``True``
+        If ``True``, return an astropy Table that is a view on the MTL
+        array. If ``False``, return the numpy structured array itself.
 
     Returns
     -------
-    :class:`~astropy.table.Table`
+    :class:`~astropy.table.Table` or `~numpy.array`
         MTL Table with targets columns plus:
 
         * NUMOBS_MORE    - number of additional observations requested
         * PRIORITY       - target priority (larger number = higher priority)
         * OBSCONDITIONS  - replaces old GRAYLAYER
+
+    Notes
+    -----
+        - Input Tables are converted to numpy structured arrays, and
+          the MTL is built as a single structured array.
+        - The redshift catalog is matched to the targets on ``TARGETID``
+          with a sort and binary search (see :func:`_match_targetids`).
+          Masked redshift catalog entries are treated as unobserved.
+        - If `zcat` is a Table with no entries missing from `targets`,
+          a ``NUMOBS_MORE`` column is added to (or updated in) `zcat`.
     """
     start = time()
     # ADM set up the default logger.
     from desiutil.log import get_logger
     log = get_logger()
 
-    # ADM determine whether the input targets are main survey, cmx or SV.
-    colnames, masks, survey = main_cmx_or_sv(targets)
-    # ADM set the first column to be the "desitarget" column
-    desi_target, desi_mask = colnames[0], masks[0]
+    # ADM work with numpy structured arrays rather than Tables.
+    if isinstance(targets, Table):
+        targets = targets.as_array()
 
     # ADM if secondaries were passed, concatenate them with the targets.
     if scnd is not None:
@@ -77,89 +235,45 @@ def make_mtl(targets, obscon, zcat=None, trim=False, scnd=None):
         is_scnd[-nrows:] = True
         log.info('Done with padding...t={:.1f}s'.format(time()-start))
 
-    # Trim targets from zcat that aren't in original targets table
-    if zcat is not None:
-        ok = np.in1d(zcat['TARGETID'], targets['TARGETID'])
-        num_extra = np.count_nonzero(~ok)
-        if num_extra > 0:
-            log.warning("Ignoring {} zcat entries that aren't "
-                        "in the input target list".format(num_extra))
-            zcat = zcat[ok]
-
     n = len(targets)
     # ADM if the input target columns were incorrectly called NUMOBS or PRIORITY
     # ADM rename them to NUMOBS_INIT or PRIORITY_INIT.
-    # ADM Note that the syntax is slightly different for a Table.
     for name in ['NUMOBS', 'PRIORITY']:
-        if isinstance(targets, Table):
-            try:
-                targets.rename_column(name, name+'_INIT')
-            except KeyError:
-                pass
-        else:
-            targets.dtype.names = [name+'_INIT' if col == name else col for col in targets.dtype.names]
+        targets.dtype.names = [name+'_INIT' if col == name else col for col in targets.dtype.names]
 
-    # ADM if a redshift catalog was passed, order it to match the input targets
-    # ADM catalog on 'TARGETID'.
+    # ADM if a redshift catalog was passed, match it to the input targets
+    # ADM on 'TARGETID', trimming entries that aren't in the targets.
     if zcat is not None:
-        # ADM there might be a quicker way to do this?
-        # ADM set up a dictionary of the indexes of each target id.
-        d = dict(tuple(zip(targets["TARGETID"], np.arange(n))))
-        # ADM loop through the zcat and look-up the index in the dictionary.
-        zmatcher = np.array([d[tid] for tid in zcat["TARGETID"]])
-        ztargets = zcat
-        if ztargets.masked:
-            unobs = ztargets['NUMOBS'].mask
-            ztargets['NUMOBS'][unobs] = 0
-            unobsz = ztargets['Z'].mask
-            ztargets['Z'][unobsz] = -1
-            unobszw = ztargets['ZWARN'].mask
-            ztargets['ZWARN'][unobszw] = -1
+        zmatcher, ok = _match_targetids(targets["TARGETID"], zcat["TARGETID"])
+        num_extra = np.count_nonzero(~ok)
+        if num_extra > 0:
+            log.warning("Ignoring {} zcat entries that aren't "
+                        "in the input target list".format(num_extra))
+            zcat, zmatcher = zcat[ok], zmatcher[ok]
+        # ADM extract just the targets that match the input zcat.
+        targets_zmatcher = targets[zmatcher]
+        zvals = _zcat_values(zcat)
     else:
-        ztargets = Table()
-        ztargets['TARGETID'] = targets['TARGETID']
-        ztargets['NUMOBS'] = np.zeros(n, dtype=np.int32)
-        ztargets['Z'] = -1 * np.ones(n, dtype=np.float32)
-        ztargets['ZWARN'] = -1 * np.ones(n, dtype=np.int32)
         # ADM if zcat wasn't passed, there is a one-to-one correspondence
         # ADM between the targets and the zcat.
-        zmatcher = np.arange(n)
-
-    # ADM extract just the targets that match the input zcat.
-    targets_zmatcher = targets[zmatcher]
-
-    # ADM use passed value of NUMOBS_INIT instead of calling the memory-heavy calc_numobs.
-    # ztargets['NUMOBS_MORE'] = np.maximum(0, calc_numobs(ztargets) - ztargets['NUMOBS'])
-    ztargets['NUMOBS_MORE'] = np.maximum(0, targets_zmatcher['NUMOBS_INIT'] - ztargets['NUMOBS'])
-
-    # ADM need a minor hack to ensure BGS targets are observed once
-    # ADM (and only once) every time during the BRIGHT survey, regardless
-    # ADM of how often they've previously been observed. I've turned this
-    # ADM off for commissioning. Not sure if we'll keep it in general.
-    if survey != 'cmx':
-        # ADM only if we're considering bright survey conditions.
-        if (obsconditions.mask(obscon) & obsconditions.mask("BRIGHT")) != 0:
-            ii = targets_zmatcher[desi_target] & desi_mask.BGS_ANY > 0
-            ztargets['NUMOBS_MORE'][ii] = 1
-    if survey == 'main':
-        # If the object is confirmed to be a tracer QSO, then don't request more observations
-        if (obsconditions.mask(obscon) & obsconditions.mask("DARK")) != 0:
-            if zcat is not None:
-                ii = ztargets['SPECTYPE'] == 'QSO'
-                ii &= (ztargets['ZWARN'] == 0)
-                ii &= (ztargets['Z'] < 2.1)
-                ii &= (ztargets['NUMOBS'] > 0)
-                ztargets['NUMOBS_MORE'][ii] = 0
+        zmatcher = slice(None)
+        targets_zmatcher = targets
+        zvals = {"TARGETID": targets['TARGETID'],
+                 "NUMOBS": np.zeros(n, dtype=np.int32),
+                 "Z": -1 * np.ones(n, dtype=np.float32),
+                 "ZWARN": -1 * np.ones(n, dtype=np.int32)}
 
     # ADM assign priorities, note that only things in the zcat can have changed priorities.
     # ADM anything else will be assigned PRIORITY_INIT, below.
-    priority = calc_priority(targets_zmatcher, ztargets, obscon)
+    ztargets, priority = _zcat_priority_numobs(
+        targets_zmatcher, zvals, obscon, tracer=zcat is not None)
+    log.info('{:d} of {:d} targets have priority zero, setting N_obs=0.'.format(
+        np.sum(priority <= 2), n))
 
-    # If priority went to 0==DONOTOBSERVE or 1==OBS or 2==DONE, then NUMOBS_MORE should also be 0.
-    # ## mtl['NUMOBS_MORE'] = ztargets['NUMOBS_MORE']
-    ii = (priority <= 2)
-    log.info('{:d} of {:d} targets have priority zero, setting N_obs=0.'.format(np.sum(ii), n))
-    ztargets['NUMOBS_MORE'][ii] = 0
+    # ADM as in earlier versions, a zcat Table that needed no trimming
+    # ADM is passed back with its NUMOBS_MORE column populated.
+    if isinstance(zcat, Table) and num_extra == 0:
+        zcat['NUMOBS_MORE'] = ztargets['NUMOBS_MORE']
 
     # - Set the OBSCONDITIONS mask for each target bit.
     obsconmask = set_obsconditions(targets)
@@ -169,13 +283,22 @@ def make_mtl(targets, obscon, zcat=None, trim=False, scnd=None):
     if scnd is not None:
         obsconmask[is_scnd] = set_obsconditions(targets[is_scnd], scnd=True)
 
-    # ADM set up the output mtl table.
-    mtl = Table(targets)
-    mtl.meta['EXTNAME'] = 'MTL'
+    # ADM set up the output mtl array in a single allocation. The new
+    # ADM columns replace any existing columns of the same name.
+    forms = {'NUMOBS_MORE': targets['NUMOBS_INIT'].dtype.str,
+             'PRIORITY': targets['PRIORITY_INIT'].dtype.str,
+             'OBSCONDITIONS': obsconmask.dtype.str}
+    mtldt = [(dt[0], forms[dt[0]]) if dt[0] in forms else dt
+             for dt in targets.dtype.descr]
+    mtldt += [(col, form) for col, form in forms.items()
+              if col not in targets.dtype.names]
+    mtl = np.zeros(n, dtype=mtldt)
+    names = [col for col in targets.dtype.names if col not in forms]
+    mtl[names] = targets[names]
     # ADM any target that wasn't matched to the ZCAT should retain its
     # ADM original (INIT) value of PRIORITY and NUMOBS.
-    mtl['NUMOBS_MORE'] = mtl['NUMOBS_INIT']
-    mtl['PRIORITY'] = mtl['PRIORITY_INIT']
+    mtl['NUMOBS_MORE'] = targets['NUMOBS_INIT']
+    mtl['PRIORITY'] = targets['PRIORITY_INIT']
     # ADM now populate the new mtl columns with the updated information.
     mtl['OBSCONDITIONS'] = obsconmask
     mtl['PRIORITY'][zmatcher] = priority
@@ -189,11 +312,252 @@ def make_mtl(targets, obscon, zcat=None, trim=False, scnd=None):
         )
         mtl = mtl[notdone]
 
-    # Filtering can reset the fill_value, which is just wrong wrong wrong
-    # See https://github.com/astropy/astropy/issues/4707
-    # and https://github.com/astropy/astropy/issues/4708
-    mtl['NUMOBS_MORE'].fill_value = -1
+    if astable:
+        mtl = Table(mtl, copy=False)
+        mtl.meta['EXTNAME'] = 'MTL'
+        # Filtering can reset the fill_value, which is just wrong wrong wrong
+        # See https://github.com/astropy/astropy/issues/4707
+        # and https://github.com/astropy/astropy/issues/4708
+        mtl['NUMOBS_MORE'].fill_value = -1
 
     log.info('Done...t={:.1f}s'.format(time()-start))
 
     return mtl
+
+
+def make_mtl_state(targets, obscon, zcat=None, scnd=None):
+    """An MTL, sorted on TARGETID, that can be updated incrementally.
+
+    Parameters
+    ----------
+    targets, obscon, zcat, scnd
+        As for :func:`make_mtl`.
+
+    Returns
+    -------
+    :class:`~numpy.array`
+        The (untrimmed) MTL as a structured array sorted on ``TARGETID``.
+        This is the state that is updated by :func:`update_mtl`.
+    """
+    mtl = make_mtl(targets, obscon, zcat=zcat, scnd=scnd, astable=False)
+    mtl = mtl[np.argsort(mtl["TARGETID"], kind="stable")]
+
+    if np.any(mtl["TARGETID"][1:] == mtl["TARGETID"][:-1]):
+        msg = "TARGETIDs must be unique to build an MTL state"
+        log.critical(msg)
+        raise ValueError(msg)
+
+    return mtl
+
+
+def _match_state(mtl, targetid):
+    """Match TARGETIDs to the rows of a TARGETID-sorted MTL state.
+
+    Parameters
+    ----------
+    mtl : :class:`~numpy.array`
+        An MTL state, as made by :func:`make_mtl_state`.
+    targetid : :class:`~numpy.array`
+        The TARGETIDs to match.
+
+    Returns
+    -------
+    :class:`~numpy.array`
+        The (sorted, unique) rows of `mtl` that were matched.
+    :class:`~numpy.array`
+        The index in `targetid` of each matched row. For duplicated
+        TARGETIDs, this is the index of the last duplicate.
+    :class:`int`
+        The number of entries in `targetid` that aren't in `mtl`.
+    """
+    targetid = np.asarray(targetid)
+    if len(mtl) == 0:
+        return np.zeros(0, dtype='i8'), np.zeros(0, dtype='i8'), len(targetid)
+
+    # ADM a binary search, as the state is already sorted on TARGETID.
+    ii = np.searchsorted(mtl["TARGETID"], targetid).clip(max=len(mtl)-1)
+    jj = np.flatnonzero(mtl["TARGETID"][ii] == targetid)
+    num_extra = len(targetid) - len(jj)
+
+    # ADM keep the last entry for any duplicated TARGETID.
+    _, last = np.unique(ii[jj][::-1], return_index=True)
+    jj = jj[::-1][last]
+
+    return ii[jj], jj, num_extra
+
+
+def update_mtl(mtl, zcat, obscon, ledger=None):
+    """Apply a redshift catalog to an MTL state, in place.
+
+    Parameters
+    ----------
+    mtl : :class:`~numpy.array`
+        An MTL state, as made by :func:`make_mtl_state`. Updated in place.
+    zcat : :class:`~astropy.table.Table` or `~numpy.array`
+        Redshift catalog with columns ``TARGETID``, ``NUMOBS``, ``Z``,
+        ``ZWARN`` (and ``SPECTYPE``). ``NUMOBS`` is the total number of
+        observations of each target, as for :func:`make_mtl`.
+    obscon : :class:`str`
+        Observing conditions, as for :func:`make_mtl`.
+    ledger : :class:`str`, optional, defaults to ``None``
+        Name of a FITS file. If passed, the updates are appended to the
+        file (which is created if it doesn't exist).
+
+    Returns
+    -------
+    :class:`~numpy.array`
+        The ledger entries for the updated targets (in the form of
+        `mtlledgerdatamodel`).
+
+    Notes
+    -----
+        - Only rows of `mtl` that match `zcat` are read or written, so
+          the cost of an update scales with the size of `zcat`, not
+          the size of `mtl`.
+        - Updated rows have the ``PRIORITY`` and ``NUMOBS_MORE`` that
+          :func:`make_mtl` would assign given the same `zcat` entries.
+        - An MTL state can be recovered from the state it started from
+          and its ledger using :func:`replay_mtl_ledger`.
+    """
+    rows, jj, num_extra = _match_state(mtl, zcat["TARGETID"])
+    if num_extra > 0:
+        log.warning("Ignoring {} zcat entries that aren't "
+                    "in the MTL".format(num_extra))
+
+    # ADM recalculate PRIORITY and NUMOBS_MORE for just the matched rows.
+    targets = mtl[rows]
+    zvals = _zcat_values(zcat[jj])
+    ztargets, priority = _zcat_priority_numobs(targets, zvals, obscon)
+    mtl["PRIORITY"][rows] = priority
+    mtl["NUMOBS_MORE"][rows] = ztargets["NUMOBS_MORE"]
+
+    entries = np.zeros(len(rows), dtype=mtlledgerdatamodel.dtype)
+    for col in ["TARGETID", "NUMOBS", "Z", "ZWARN", "NUMOBS_MORE"]:
+        entries[col] = ztargets[col]
+    entries["PRIORITY"] = priority
+
+    if ledger is not None:
+        if os.path.exists(ledger):
+            with fitsio.FITS(ledger, "rw") as fx:
+                fx["LEDGER"].append(entries)
+        else:
+            fitsio.write(ledger, entries, extname="LEDGER")
+    log.info("Updated {} MTL entries".format(len(rows)))
+
+    return entries
+
+
+def replay_mtl_ledger(mtl, ledger):
+    """Apply the entries in an MTL ledger to an MTL state, in place.
+
+    Parameters
+    ----------
+    mtl : :class:`~numpy.array`
+        An MTL state, as made by :func:`make_mtl_state`. Updated in place.
+    ledger : :class:`str` or `~numpy.array`
+        Ledger entries (as returned by :func:`update_mtl`) or the name
+        of a ledger file written by :func:`update_mtl`.
+
+    Returns
+    -------
+    :class:`~numpy.array`
+        The updated `mtl`.
+
+    Notes
+    -----
+        - Entries are applied in the order they were written, so the
+          most recent entry for each target wins.
+    """
+    if isinstance(ledger, str):
+        ledger = fitsio.read(ledger, "LEDGER")
+
+    rows, jj, num_extra = _match_state(mtl, ledger["TARGETID"])
+    if num_extra > 0:
+        log.warning("Ignoring {} ledger entries that aren't "
+                    "in the MTL".format(num_extra))
+
+    mtl["PRIORITY"][rows] = ledger["PRIORITY"][jj]
+    mtl["NUMOBS_MORE"][rows] = ledger["NUMOBS_MORE"][jj]
+
+    return mtl
+
+
+def write_mtl_state(filename, mtl, ledger=None):
+    """Write an MTL state, and record how far into its ledger it is.
+
+    Parameters
+    ----------
+    filename : :class:`str`
+        Name of the FITS file to write (overwritten if it exists).
+    mtl : :class:`~numpy.array`
+        An MTL state, as made by :func:`make_mtl_state`.
+    ledger : :class:`str`, optional, defaults to ``None``
+        Name of the ledger file to which updates to `mtl` are appended
+        by :func:`update_mtl`. If passed, its name and its current
+        number of entries are recorded in the header as ``LEDGER`` and
+        ``LEDGEROF`` so that :func:`read_mtl_state` can apply only the
+        entries appended after `mtl` was written.
+
+    Returns
+    -------
+    Nothing, but writes the ``MTLSTATE`` extension of `filename`.
+
+    Notes
+    -----
+        - ``LEDGER`` is stored relative to the directory of `filename`,
+          so the state and its ledger can be moved together.
+    """
+    hdr = fitsio.FITSHDR()
+    if ledger is not None:
+        nentries = 0
+        if os.path.exists(ledger):
+            nentries = fitsio.read_header(ledger, "LEDGER")["NAXIS2"]
+        statedir = os.path.dirname(os.path.abspath(filename))
+        hdr["LEDGER"] = os.path.relpath(os.path.abspath(ledger), statedir)
+        hdr["LEDGEROF"] = nentries
+
+    # ADM write to a temporary file first, so that a run that dies
+    # ADM mid-write can't leave behind a truncated state.
+    tmpfile = filename + ".tmp"
+    fitsio.write(tmpfile, mtl, extname="MTLSTATE", header=hdr, clobber=True)
+    os.rename(tmpfile, filename)
+    log.info("Wrote MTL state with {} entries to {}".format(len(mtl), filename))
+
+
+def read_mtl_state(filename, replay=True):
+    """Read an MTL state, bringing it up-to-date with its ledger.
+
+    Parameters
+    ----------
+    filename : :class:`str`
+        Name of a file written by :func:`write_mtl_state`.
+    replay : :class:`bool`, optional, defaults to ``True``
+        If ``True``, and a ledger was recorded by :func:`write_mtl_state`,
+        apply the ledger entries appended after the state was written.
+
+    Returns
+    -------
+    :class:`~numpy.array`
+        The MTL state, sorted on ``TARGETID``.
+    """
+    mtl, hdr = fitsio.read(filename, "MTLSTATE", header=True)
+
+    if replay and "LEDGER" in hdr:
+        statedir = os.path.dirname(os.path.abspath(filename))
+        ledger = os.path.join(statedir, hdr["LEDGER"])
+        nentries = 0
+        if os.path.exists(ledger):
+            nentries = fitsio.read_header(ledger, "LEDGER")["NAXIS2"]
+        if nentries < hdr["LEDGEROF"]:
+            msg = "Ledger {} has {} entries but the state was written at {}" \
+                .format(ledger, nentries, hdr["LEDGEROF"])
+            log.critical(msg)
+            raise ValueError(msg)
+        if nentries > hdr["LEDGEROF"]:
+            with fitsio.FITS(ledger) as fx:
+                entries = fx["LEDGER"][hdr["LEDGEROF"]:nentries]
+            replay_mtl_ledger(mtl, entries)
+            log.info("Applied {} ledger entries from {}"
+                     .format(len(entries), ledger))
+
+    return mtl
@@ -5,8 +5,17 @@ desitarget.myRF
 This module computes the Random Forest probability
 and it stores the RF with our own persistency.
 """
+import os
 import numpy as np
 import sys
+import threading
+
+from desitarget.internal import sharedmem
+
+# the process-wide registry of loaded forests, see load_forest()
+# the lock ensures threads that race to load a forest only load it once
+_forest_registry = {}
+_forest_lock = threading.Lock()
 
 
 class myRF(object):
@@ -161,3 +170,354 @@ class myRF(object):
 
         np.savez_compressed(forestFileName, forest)
         return
+
+
+class flatRF(object):
+    """ Random Forest flattened into contiguous node arrays
+
+    The trees of a forest stored by :class:`myRF` are converted once into
+    flat left/right/feature/threshold/value arrays, and objects are pushed
+    through all of the trees level-by-level in vectorized batches. The
+    probabilities are bit-identical to :meth:`myRF.predict_proba`.
+    """
+    def __init__(self, numberOfTrees=200, version=2, batchSize=2**22):
+        self.nTrees = numberOfTrees
+        self.version = version
+        # the maximum number of (object, tree) pairs evaluated at once
+        self.batchSize = batchSize
+        if self.version not in [1, 2]:
+            print("unsupported version=", self.version)
+            sys.exit()
+
+    def loadForest(self, forestFileName):
+        # loads a forest saved by myRF.saveForest and flattens it
+        t = np.load(forestFileName, encoding='bytes', allow_pickle=True)
+        self.flattenForest(t['arr_0'])
+        return
+
+    def flattenForest(self, forest):
+        # concatenate the nodes of every tree into single arrays, with
+        # child indices offset to index into the concatenated arrays
+        if self.version == 1:
+            trees = [forest[iTree*2] for iTree in range(self.nTrees)]
+            answers = [forest[iTree*2+1] for iTree in range(self.nTrees)]
+        else:
+            trees = [forest[iTree] for iTree in range(self.nTrees)]
+
+        nNodes = np.array([len(tree) for tree in trees])
+        self.roots = np.zeros(self.nTrees, dtype=np.int64)
+        self.roots[1:] = np.cumsum(nNodes)[:-1]
+
+        left, right, feature, threshold, value = [], [], [], [], []
+        for iTree, tree in enumerate(trees):
+            offset = self.roots[iTree]
+            nodeIds = np.arange(len(tree)) + offset
+            # cast before offsetting, the stored child ids are int16
+            childLeft = tree['f0'].astype(np.int64)
+            childRight = tree['f1'].astype(np.int64)
+            isLeaf = childLeft == -1
+            # leaves point to themselves so that the traversal is a no-op
+            left.append(np.where(isLeaf, nodeIds, childLeft + offset))
+            right.append(np.where(isLeaf, nodeIds, childRight + offset))
+            feature.append(np.where(isLeaf, 0, tree['f2']))
+            threshold.append(tree['f3'])
+            if self.version == 1:
+                a = answers[iTree]
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    value.append(a[:, 0, 1]*1./(a[:, 0, 0]+a[:, 0, 1]))
+            else:
+                value.append(tree['f4'])
+
+        self.left = np.concatenate(left).astype(np.int64)
+        self.right = np.concatenate(right).astype(np.int64)
+        self.feature = np.concatenate(feature).astype(np.int64)
+        # float32 -> float64 is exact, so comparisons are unchanged
+        self.threshold = np.concatenate(threshold).astype(np.float64)
+        self.value = np.concatenate(value).astype(np.float64)
+        self.isLeaf = self.left == np.arange(len(self.left))
+
+        # the smallest and largest response of each tree, which bound how
+        # far the remaining trees can move the forest response
+        leafTree = np.repeat(np.arange(self.nTrees), nNodes)[self.isLeaf]
+        leafValue = self.value[self.isLeaf]
+        self.treeMin = np.full(self.nTrees, np.inf)
+        self.treeMax = np.full(self.nTrees, -np.inf)
+        np.minimum.at(self.treeMin, leafTree, leafValue)
+        np.maximum.at(self.treeMax, leafTree, leafValue)
+
+        # the tree indices that start and end each forest, as joint forests
+        # hold several forests (see join_forests)
+        self.forestEdges = np.array([0, self.nTrees])
+        return
+
+    def share(self):
+        # moves the node arrays to shared memory so that they are visible
+        # to, rather than copied into, forked worker processes
+        for name in ['roots', 'left', 'right', 'feature', 'threshold',
+                     'value', 'isLeaf', 'treeMin', 'treeMax', 'forestEdges']:
+            setattr(self, name, sharedmem.copy(getattr(self, name)))
+        return
+
+    def lock(self):
+        # makes the node arrays read-only, as they are shared between calls
+        for name in ['roots', 'left', 'right', 'feature', 'threshold',
+                     'value', 'isLeaf', 'treeMin', 'treeMax', 'forestEdges']:
+            getattr(self, name).setflags(write=False)
+        return
+
+    def searchLeaves(self, data, trees):
+        # navigates each object down each of the passed trees and returns
+        # the leaf node ids with shape (len(data), len(trees))
+        nObjects = len(data)
+        objects = np.repeat(np.arange(nObjects, dtype=np.int64), len(trees))
+        nodes = self.searchPairs(data, objects, np.tile(trees, nObjects))
+        return nodes.reshape(nObjects, len(trees))
+
+    def searchPairs(self, data, objects, trees):
+        # iteratively navigates each object data[objects[i]] down the tree
+        # trees[i] and returns the leaf node id for each (object, tree) pair
+        nFeatures = data.shape[1]
+        flatData = np.ascontiguousarray(data).ravel()
+        nodes = self.roots[trees]
+        rows = objects*nFeatures
+
+        # only (object, tree) pairs that haven't reached a leaf are updated
+        active = np.flatnonzero(~self.isLeaf[nodes])
+        while len(active) > 0:
+            n = nodes[active]
+            goLeft = flatData[rows[active] + self.feature[n]] <= self.threshold[n]
+            n = np.where(goLeft, self.left[n], self.right[n])
+            nodes[active] = n
+            active = active[~self.isLeaf[n]]
+
+        return nodes
+
+    def predict_proba(self, data):
+        # calculate the forest response using the average response of the trees in the forest
+        if len(self.forestEdges) > 2:
+            raise ValueError("use predict_proba_all() for a joint forest")
+        return self.predict_proba_all(data)[0]
+
+    def predict_proba_all(self, data):
+        # calculate the response of every forest in a joint forest (see
+        # join_forests), pushing each object through all trees at once
+        data = np.atleast_2d(data)
+        nForests = len(self.forestEdges) - 1
+        bdtOutput = np.zeros((nForests, len(data)))
+        trees = np.arange(self.nTrees)
+
+        batch = max(self.batchSize // self.nTrees, 1)
+        for start in range(0, len(data), batch):
+            leaves = self.searchLeaves(data[start:start+batch], trees)
+            proba = self.value[leaves]
+            # sum tree-by-tree, in order, to reproduce myRF exactly
+            for iForest in range(nForests):
+                output = bdtOutput[iForest, start:start+batch]
+                for iTree in range(self.forestEdges[iForest],
+                                   self.forestEdges[iForest+1]):
+                    output += proba[:, iTree]
+
+        for iForest in range(nForests):
+            bdtOutput[iForest] /= np.diff(self.forestEdges)[iForest]
+        return list(bdtOutput)
+
+    def predict_threshold(self, data, pcut, treesPerStep=25, tolerance=1e-9):
+        # returns predict_proba(data) >= pcut, but stops evaluating trees for
+        # objects once the remaining trees can't move the forest response
+        # across pcut (tolerance guards against floating-point round-off).
+        # For a joint forest pass one cut per forest; an object passes if
+        # it passes the cut for any of the forests, and each forest stops
+        # being evaluated for an object once the object fails its cut
+        data = np.ascontiguousarray(np.atleast_2d(data))
+        nForests = len(self.forestEdges) - 1
+        if nForests == 1:
+            pcut = [pcut]
+        if len(pcut) != nForests:
+            raise ValueError("pass one probability cut per forest")
+        pcut = [np.broadcast_to(cut, len(data)) for cut in pcut]
+        forestTrees = np.diff(self.forestEdges)
+        bdtOutput = np.zeros((nForests, len(data)))
+        failed = np.zeros((nForests, len(data)), dtype=bool)
+        result = np.zeros(len(data), dtype=bool)
+
+        # the smallest and largest summed response of trees iTree and
+        # beyond, within each forest
+        remainMin, remainMax = [], []
+        for iForest in range(nForests):
+            first, last = self.forestEdges[iForest:iForest+2]
+            remainMin.append(np.append(
+                np.cumsum(self.treeMin[first:last][::-1])[::-1], 0.))
+            remainMax.append(np.append(
+                np.cumsum(self.treeMax[first:last][::-1])[::-1], 0.))
+
+        active = np.arange(len(data))
+        for first in range(0, forestTrees.max(), treesPerStep):
+            # the next treesPerStep trees of every forest
+            last = np.minimum(first + treesPerStep, forestTrees)
+            steps = [np.arange(self.forestEdges[iForest] + first,
+                               self.forestEdges[iForest] + last[iForest])
+                     for iForest in range(nForests)]
+            batch = max(self.batchSize // sum([len(trees) for trees in steps]), 1)
+            for start in range(0, len(active), batch):
+                indices = active[start:start+batch]
+                # the (object, tree) pairs for forests that each object
+                # hasn't yet failed
+                forestObjects = [indices[~failed[iForest, indices]]
+                                 for iForest in range(nForests)]
+                objects = np.concatenate(
+                    [np.repeat(objs, len(trees))
+                     for objs, trees in zip(forestObjects, steps)])
+                trees = np.concatenate(
+                    [np.tile(trees, len(objs))
+                     for objs, trees in zip(forestObjects, steps)])
+                proba = self.value[self.searchPairs(data, objects, trees)]
+                # sum tree-by-tree, in order, to reproduce predict_proba exactly
+                pair = 0
+                for iForest, objs in enumerate(forestObjects):
+                    nPairs = len(objs)*len(steps[iForest])
+                    forestProba = proba[pair:pair+nPairs].reshape(
+                        len(objs), len(steps[iForest]))
+                    pair += nPairs
+                    output = bdtOutput[iForest, objs]
+                    for iTree in range(len(steps[iForest])):
+                        output += forestProba[:, iTree]
+                    bdtOutput[iForest, objs] = output
+
+            # check which objects are now guaranteed to pass or fail
+            passed = np.zeros(len(active), dtype=bool)
+            for iForest in range(nForests):
+                output = bdtOutput[iForest, active]
+                cut = pcut[iForest][active]
+                if last[iForest] == forestTrees[iForest]:
+                    # this forest is complete, so compare exactly
+                    forestPassed = output / forestTrees[iForest] >= cut
+                    forestFailed = ~forestPassed
+                else:
+                    lower = (output + remainMin[iForest][last[iForest]]) / forestTrees[iForest]
+                    upper = (output + remainMax[iForest][last[iForest]]) / forestTrees[iForest]
+                    forestPassed = lower >= cut + tolerance
+                    forestFailed = upper < cut - tolerance
+                passed |= forestPassed & ~failed[iForest, active]
+                failed[iForest, active] |= forestFailed
+            result[active[passed]] = True
+            active = active[~passed & ~failed[:, active].all(axis=0)]
+            if len(active) == 0:
+                break
+
+        return result
+
+
+def join_forests(forests):
+    """Join several flattened forests so they can be evaluated in one pass.
+
+    Parameters
+    ----------
+    forests : :class:`list` of :class:`flatRF`
+        The forests to join, which must all expect the same features.
+
+    Returns
+    -------
+    :class:`flatRF`
+        A joint forest. Its :meth:`~flatRF.predict_proba_all` method
+        returns one probability array per input forest (in the order
+        of `forests`), each bit-identical to that forest's
+        :meth:`~flatRF.predict_proba`. Its :meth:`~flatRF.predict_threshold`
+        method takes one cut per input forest and returns ``True`` for
+        objects that pass the cut for any of the forests.
+    """
+    joint = flatRF(numberOfTrees=sum([rf.nTrees for rf in forests]),
+                   version=forests[0].version,
+                   batchSize=forests[0].batchSize)
+
+    # offset the node indices of each forest by the nodes that precede it
+    offsets = np.cumsum([0] + [len(rf.left) for rf in forests])[:-1]
+    joint.roots = np.concatenate(
+        [rf.roots + offset for rf, offset in zip(forests, offsets)])
+    joint.left = np.concatenate(
+        [rf.left + offset for rf, offset in zip(forests, offsets)])
+    joint.right = np.concatenate(
+        [rf.right + offset for rf, offset in zip(forests, offsets)])
+    for name in ['feature', 'threshold', 'value', 'isLeaf',
+                 'treeMin', 'treeMax']:
+        setattr(joint, name,
+                np.concatenate([getattr(rf, name) for rf in forests]))
+    joint.forestEdges = np.cumsum([0] + [rf.nTrees for rf in forests])
+
+    return joint
+
+
+def load_forest(forestFileName, numberOfTrees=200, version=2, shared=False):
+    """Return a (read-only) flattened forest, loading it once per process.
+
+    Parameters
+    ----------
+    forestFileName : :class:`str`
+        Full path to a forest file written by :meth:`myRF.saveForest`.
+    numberOfTrees : :class:`int`, optional, defaults to 200
+        The number of trees in the forest.
+    version : :class:`int`, optional, defaults to 2
+        The :class:`myRF` version of the forest file.
+    shared : :class:`bool`, optional, defaults to ``False``
+        If ``True``, and the forest isn't already loaded, store the
+        forest in shared memory. Pass ``True`` when loading in a parent
+        process before forking, so that workers don't hold their own
+        decompressed copy.
+
+    Returns
+    -------
+    :class:`flatRF`
+        The flattened forest. Subsequent calls with the same file name,
+        `numberOfTrees` and `version` return the same object.
+    """
+    key = (os.path.abspath(forestFileName), numberOfTrees, version)
+    with _forest_lock:
+        if key not in _forest_registry:
+            rf = flatRF(numberOfTrees=numberOfTrees, version=version)
+            rf.loadForest(forestFileName)
+            if shared:
+                rf.share()
+            rf.lock()
+            _forest_registry[key] = rf
+
+        return _forest_registry[key]
+
+
+def load_forests(forestFileNames, numberOfTrees=200, version=2, shared=False):
+    """Return a (read-only) joint forest, loading it once per process.
+
+    Parameters
+    ----------
+    forestFileNames : :class:`list` of :class:`str`
+        Full paths to forest files written by :meth:`myRF.saveForest`.
+        The forests must all expect the same features.
+    numberOfTrees : :class:`int`, optional, defaults to 200
+        The number of trees in each forest.
+    version : :class:`int`, optional, defaults to 2
+        The :class:`myRF` version of the forest files.
+    shared : :class:`bool`, optional, defaults to ``False``
+        If ``True``, and the forests aren't already loaded, store the
+        joint forest in shared memory (see :func:`load_forest`).
+
+    Returns
+    -------
+    :class:`flatRF`
+        The joint forest, see :func:`join_forests`. Subsequent calls
+        with the same file names, `numberOfTrees` and `version` return
+        the same object.
+    """
+    key = (tuple([os.path.abspath(fn) for fn in forestFileNames]),
+           numberOfTrees, version)
+    with _forest_lock:
+        if key not in _forest_registry:
+            forests = []
+            for forestFileName in forestFileNames:
+                rf = flatRF(numberOfTrees=numberOfTrees, version=version)
+                rf.loadForest(forestFileName)
+                forests.append(rf)
+            rf = join_forests(forests)
+            if shared:
+                rf.share()
+            rf.lock()
+            _forest_registry[key] = rf
+
+        return _forest_registry[key]
@@ -1120,6 +1120,12 @@ def select_randoms_bricks(brickdict, bricknames, numproc=32, drdir=None,
             density=density, dustdir=dustdir, aprad=aprad, zeros=zeros,
             seed=seed)
 
+    def _brick_area(brickname):
+        """area of a brick, to which the number of randoms is proportional"""
+        bramin, bramax, bdecmin, bdecmax = brickdict[brickname][2:6]
+        return (bramax - bramin) * (np.sin(np.radians(bdecmax)) -
+                                    np.sin(np.radians(bdecmin)))
+
     # ADM this is just to count bricks in _update_status.
     nbrick = np.zeros((), dtype='i8')
     t0 = time()
@@ -1147,7 +1153,13 @@ def select_randoms_bricks(brickdict, bricknames, numproc=32, drdir=None,
     if numproc > 1:
         pool = sharedmem.MapReduce(np=numproc)
         with pool:
-            qinfo = pool.map(_get_quantities, bricknames, reduce=_update_status)
+            # ADM process the largest bricks first, to shorten the tail,
+            # ADM and pass the randoms back through shared memory.
+            qinfo = pool.map(_get_quantities, bricknames,
+                             reduce=_update_status, cost=_brick_area,
+                             shared=True)
+        log.info('{:.1f} slave-secs ({:.1f}%) idle at the tail of the map'
+                 .format(pool.tailidle, 100.*pool.tailfraction))
     else:
         qinfo = list()
         for brickname in bricknames:
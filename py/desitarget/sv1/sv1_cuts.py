@@ -19,7 +19,7 @@ from time import time
 from pkg_resources import resource_filename
 
 from desitarget.cuts import _getColors, _psflike, _check_BGS_targtype_sv
-from desitarget.cuts import shift_photo_north
+from desitarget.cuts import shift_photo_north, _select_photsys, _mag
 from desitarget.gaiamatch import is_in_Galaxy
 
 # ADM set up the DESI default logger
@@ -180,12 +180,12 @@ def isLRG_colors(gflux=None, rflux=None, zflux=None, w1flux=None,
         log.warning('Setting zfiberflux to zflux!!!')
         zfiberflux = zflux.copy()
 
-    gmag = 22.5 - 2.5 * np.log10(gflux.clip(1e-7))
+    gmag = _mag(gflux, 1e-7)
     # ADM safe as these fluxes are set to > 0 in notinLRG_mask.
-    rmag = 22.5 - 2.5 * np.log10(rflux.clip(1e-7))
-    zmag = 22.5 - 2.5 * np.log10(zflux.clip(1e-7))
-    w1mag = 22.5 - 2.5 * np.log10(w1flux.clip(1e-7))
-    zfibermag = 22.5 - 2.5 * np.log10(zfiberflux.clip(1e-7))
+    rmag = _mag(rflux, 1e-7)
+    zmag = _mag(zflux, 1e-7)
+    w1mag = _mag(w1flux, 1e-7)
+    zfibermag = _mag(zfiberflux, 1e-7)
 
     if south:
 
@@ -315,11 +315,11 @@ def isfiller(gflux=None, rflux=None, zflux=None, w1flux=None,
     filler &= (w1flux_snr > 4) & (w1flux > 0)  # ADM quality in W1.
 
     # ADM safe as these fluxes are set to > 0
-    gmag = 22.5 - 2.5 * np.log10(gflux.clip(1e-7))
-    rmag = 22.5 - 2.5 * np.log10(rflux.clip(1e-7))
-    zmag = 22.5 - 2.5 * np.log10(zflux.clip(1e-7))
-    w1mag = 22.5 - 2.5 * np.log10(w1flux.clip(1e-7))
-    rfibermag = 22.5 - 2.5 * np.log10(rfiberflux.clip(1e-7))
+    gmag = _mag(gflux, 1e-7)
+    rmag = _mag(rflux, 1e-7)
+    zmag = _mag(zflux, 1e-7)
+    w1mag = _mag(w1flux, 1e-7)
+    rfibermag = _mag(rfiberflux, 1e-7)
 
     # North and South currently have the same cuts
     filler &= (rmag > 19.5) & (rmag < 21) & (rfibermag < 22)  # magnitude limits
@@ -550,6 +550,8 @@ def isQSO_colors(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=None,
     # ADM never target sources that are far too bright (mag < 0).
     # ADM this guards against overflow warnings in powers.
     qso &= (gflux < 1e9) & (rflux < 1e9) & (zflux < 1e9)
+    # ADM make copies as we are reassigning values.
+    gflux, rflux, zflux = gflux.copy(), rflux.copy(), zflux.copy()
     gflux[~qso] = 1e9
     rflux[~qso] = 1e9
     zflux[~qso] = 1e9
@@ -687,7 +689,7 @@ def isQSO_randomforest(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=N
 
     if np.any(preSelection):
 
-        from desitarget.myRF import myRF
+        from desitarget.myRF import load_forests
 
         # Data reduction to preselected objects
         colorsReduced = colors[preSelection]
@@ -701,15 +703,10 @@ def isQSO_randomforest(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=N
         rf_fileName = pathToRF + '/rf_model_dr7.npz'
         rf_HighZ_fileName = pathToRF + '/rf_model_dr7_HighZ.npz'
 
-        # rf initialization - colors data duplicated within "myRF"
-        rf = myRF(colorsReduced, pathToRF, numberOfTrees=500, version=2)
-        rf_HighZ = myRF(colorsReduced, pathToRF, numberOfTrees=500, version=2)
-        # rf loading
-        rf.loadForest(rf_fileName)
-        rf_HighZ.loadForest(rf_HighZ_fileName)
-        # Compute rf probabilities
-        tmp_rf_proba = rf.predict_proba()
-        tmp_rf_HighZ_proba = rf_HighZ.predict_proba()
+        # rf loading (once per process)
+        # ADM the main and HighZ forests are evaluated in one pass.
+        rf = load_forests([rf_fileName, rf_HighZ_fileName],
+                          numberOfTrees=500, version=2)
         # Compute optimized proba cut (all different for SV)
         # ADM the probabilities are different for the north and the south.
         if south:
@@ -725,8 +722,9 @@ def isQSO_randomforest(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=N
                                   0.5 - (r_Reduced - 20.5) * 0.025, 0.5)
 
         # Add rf proba test result to "qso" mask
-        qso[colorsReducedIndex] = \
-            (tmp_rf_proba >= pcut) | (tmp_rf_HighZ_proba >= pcut_HighZ)
+        # ADM objects pass if they pass either the main or HighZ cut.
+        qso[colorsReducedIndex] = rf.predict_threshold(
+            colorsReduced, [pcut, pcut_HighZ])
 
     # In case of call for a single object passed to the function with scalar arguments
     # Return "numpy.bool_" instead of "numpy.ndarray"
@@ -802,7 +800,7 @@ def isQSO_highz_faint(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=No
 
     if np.any(preSelection):
 
-        from desitarget.myRF import myRF
+        from desitarget.myRF import load_forest
 
         # Data reduction to preselected objects.
         colorsReduced = colors[preSelection]
@@ -816,14 +814,8 @@ def isQSO_highz_faint(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=No
         # Use RF trained over DR7.
         rf_fileName = pathToRF + '/rf_model_dr7.npz'
 
-        # rf initialization - colors data duplicated within "myRF".
-        rf = myRF(colorsReduced, pathToRF, numberOfTrees=500, version=2)
-
-        # rf loading.
-        rf.loadForest(rf_fileName)
-
-        # Compute rf probabilities.
-        tmp_rf_proba = rf.predict_proba()
+        # rf loading (once per process).
+        rf = load_forest(rf_fileName, numberOfTrees=500, version=2)
 
         # Compute optimized proba cut (all different for SV).
         # The probabilities may be different for the north and the south.
@@ -833,7 +825,7 @@ def isQSO_highz_faint(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=No
             pcut = np.where(r_Reduced < 23.2,  0.50 + (r_Reduced-22.8)*.75, .80 + (r_Reduced-23.2)*.5)
 
         # Add rf proba test result to "qso" mask
-        qso[colorsReducedIndex] = (tmp_rf_proba >= pcut)
+        qso[colorsReducedIndex] = rf.predict_threshold(colorsReduced, pcut)
 
     # In case of call for a single object passed to the function with scalar arguments
     # Return "numpy.bool_" instead of "numpy.ndarray"
@@ -923,6 +915,9 @@ def isQSOz5_colors(gflux=None, rflux=None, zflux=None,
     # ADM never target sources that are far too bright (mag < 0).
     # ADM this guards against overflow warnings in powers.
     qso &= (gflux < 1e9) & (rflux < 1e9) & (zflux < 1e9)
+    # ADM make copies as we are reassigning values.
+    gflux, rflux, zflux = gflux.copy(), rflux.copy(), zflux.copy()
+    w1flux = w1flux.copy()
     gflux[~qso] = 1e9
     rflux[~qso] = 1e9
     zflux[~qso] = 1e9
@@ -1190,12 +1185,12 @@ def isELG_colors(gflux=None, rflux=None, zflux=None, w1flux=None, w2flux=None,
 
     # ADM work in magnitudes not fluxes. THIS IS ONLY OK AS the snr cuts
     # ADM in notinELG_mask ENSURE positive fluxes in all of g, r and z.
-    g = 22.5 - 2.5*np.log10(gflux.clip(1e-16))
-    r = 22.5 - 2.5*np.log10(rflux.clip(1e-16))
-    z = 22.5 - 2.5*np.log10(zflux.clip(1e-16))
+    g = _mag(gflux, 1e-16)
+    r = _mag(rflux, 1e-16)
+    z = _mag(zflux, 1e-16)
 
     # ADM gfiberflux can be zero but is never negative. So this is safe.
-    gfib = 22.5 - 2.5*np.log10(gfiberflux.clip(1e-16))
+    gfib = _mag(gfiberflux, 1e-16)
 
     # ADM these are safe as the snr cuts in notinELG_mask ENSURE positive
     # ADM fluxes in all of g, r and z...so things near colors of zero but
@@ -1476,7 +1471,8 @@ def set_target_bits(photsys_north, photsys_south, obs_rflux,
                     gaiagmag, gaiabmag, gaiarmag, gaiaaen, gaiadupsource,
                     gaiaparamssolved, gaiabprpfactor, gaiasigma5dmax, galb,
                     tcnames, qso_optical_cuts, qso_selection,
-                    maskbits, Grr, refcat, primary, resolvetargs=True):
+                    maskbits, Grr, refcat, primary, resolvetargs=True,
+                    splitphotsys=False):
     """Perform target selection on parameters, return target mask arrays.
 
     Returns
@@ -1501,6 +1497,13 @@ def set_target_bits(photsys_north, photsys_south, obs_rflux,
         # ADM only northern it will be [False], else it wil be both.
         south_cuts = list(set(photsys_south))
 
+    # ADM if splitphotsys is set, only send northern (southern) objects
+    # ADM through the northern (southern) cuts. The zeroth element
+    # ADM stores the northern objects (south=False).
+    photsys_rows = [True, True]
+    if resolvetargs and splitphotsys:
+        photsys_rows = [photsys_north, photsys_south]
+
     # ADM initially set everything to arrays of False for the LRG selection
     # ADM the zeroth element stores the northern targets bits (south=False).
     lrg_classes = [[~primary, ~primary, ~primary, ~primary, ~primary],
@@ -1508,8 +1511,8 @@ def set_target_bits(photsys_north, photsys_south, obs_rflux,
     if "LRG" in tcnames:
         # ADM run the LRG target types (potentially) for both north and south.
         for south in south_cuts:
-            lrg_classes[int(south)] = isLRG(
-                primary=primary, south=south,
+            lrg_classes[int(south)] = _select_photsys(
+                isLRG, photsys_rows[int(south)], primary=primary, south=south,
                 gflux=gflux, rflux=rflux, zflux=zflux, w1flux=w1flux,
                 zfiberflux=zfiberflux, rflux_snr=rsnr, zflux_snr=zsnr,
                 w1flux_snr=w1snr
@@ -1522,8 +1525,8 @@ def set_target_bits(photsys_north, photsys_south, obs_rflux,
     filler_classes = [~primary, ~primary]
     if "LRG" in tcnames:
         for south in south_cuts:
-            filler_classes[int(south)] = isfiller(
-                primary=primary, gflux=gflux, rflux=rflux, zflux=zflux,
+            filler_classes[int(south)] = _select_photsys(
+                isfiller, photsys_rows[int(south)], primary=primary, gflux=gflux, rflux=rflux, zflux=zflux,
                 w1flux=w1flux, gflux_snr=gsnr, rflux_snr=rsnr, zflux_snr=zsnr,
                 w1flux_snr=w1snr, rfiberflux=rfiberflux, south=south
             )
@@ -1543,8 +1546,8 @@ def set_target_bits(photsys_north, photsys_south, obs_rflux,
                    [~primary, ~primary, ~primary, ~primary]]
     if "ELG" in tcnames:
         for south in south_cuts:
-            elg_classes[int(south)] = isELG(
-                primary=primary, gflux=gflux, rflux=rflux, zflux=zflux,
+            elg_classes[int(south)] = _select_photsys(
+                isELG, photsys_rows[int(south)], primary=primary, gflux=gflux, rflux=rflux, zflux=zflux,
                 gsnr=gsnr, rsnr=rsnr, zsnr=zsnr, gfiberflux=gfiberflux,
                 gnobs=gnobs, rnobs=rnobs, znobs=znobs, maskbits=maskbits,
                 south=south
@@ -1570,8 +1573,8 @@ def set_target_bits(photsys_north, photsys_south, obs_rflux,
         for south in south_cuts:
             qso_store = []
             qso_store.append(
-                isQSO_cuts(
-                    primary=primary, zflux=zflux, rflux=rflux, gflux=gflux,
+                _select_photsys(
+                    isQSO_cuts, photsys_rows[int(south)], primary=primary, zflux=zflux, rflux=rflux, gflux=gflux,
                     w1flux=w1flux, w2flux=w2flux,
                     dchisq=dchisq, maskbits=maskbits,
                     objtype=objtype, w1snr=w1snr, w2snr=w2snr,
@@ -1585,30 +1588,30 @@ def set_target_bits(photsys_north, photsys_south, obs_rflux,
                 qso_store.append(~primary)
             else:
                 qso_store.append(
-                    isQSO_randomforest(
-                        primary=primary, zflux=zflux, rflux=rflux, gflux=gflux,
+                    _select_photsys(
+                        isQSO_randomforest, photsys_rows[int(south)], primary=primary, zflux=zflux, rflux=rflux, gflux=gflux,
                         w1flux=w1flux, w2flux=w2flux,
                         dchisq=dchisq, maskbits=maskbits,
                         objtype=objtype, south=south
                     )
                 )
                 qso_store.append(
-                    isQSO_highz_faint(
-                        primary=primary, zflux=zflux, rflux=rflux, gflux=gflux,
+                    _select_photsys(
+                        isQSO_highz_faint, photsys_rows[int(south)], primary=primary, zflux=zflux, rflux=rflux, gflux=gflux,
                         w1flux=w1flux, w2flux=w2flux,
                         dchisq=dchisq, maskbits=maskbits,
                         objtype=objtype, south=south
                     )
                 )
             qso_store.append(
-                isQSO_color_high_z(
-                    gflux=gflux, rflux=rflux, zflux=zflux,
+                _select_photsys(
+                    isQSO_color_high_z, photsys_rows[int(south)], gflux=gflux, rflux=rflux, zflux=zflux,
                     w1flux=w1flux, w2flux=w2flux, south=south
                 )
             )
             qso_store.append(
-                isQSOz5_cuts(
-                    primary=primary, gflux=gflux, rflux=rflux, zflux=zflux,
+                _select_photsys(
+                    isQSOz5_cuts, photsys_rows[int(south)], primary=primary, gflux=gflux, rflux=rflux, zflux=zflux,
                     gsnr=gsnr, rsnr=rsnr, zsnr=zsnr,
                     w1flux=w1flux, w2flux=w2flux, w1snr=w1snr, w2snr=w2snr,
                     dchisq=dchisq, maskbits=maskbits, objtype=objtype,
@@ -1651,8 +1654,8 @@ def set_target_bits(photsys_north, photsys_south, obs_rflux,
             bgs_store = []
             for targtype in ["bright", "faint", "faint_ext", "lowq", "fibmag"]:
                 bgs_store.append(
-                    isBGS(
-                        gflux=gflux, rflux=rflux, zflux=zflux, w1flux=w1flux, w2flux=w2flux,
+                    _select_photsys(
+                        isBGS, photsys_rows[int(south)], gflux=gflux, rflux=rflux, zflux=zflux, w1flux=w1flux, w2flux=w2flux,
                         rfiberflux=rfiberflux, gnobs=gnobs, rnobs=rnobs, znobs=znobs,
                         gfracmasked=gfracmasked, rfracmasked=rfracmasked, zfracmasked=zfracmasked,
                         gfracflux=gfracflux, rfracflux=rfracflux, zfracflux=zfracflux,
@@ -1684,8 +1687,8 @@ def set_target_bits(photsys_north, photsys_south, obs_rflux,
         )
         # ADM run the MWS_MAIN target types for both north and south
         for south in south_cuts:
-            mws_classes[int(south)] = isMWS_main_sv(
-                    gaia=gaia, gaiaaen=gaiaaen, gaiadupsource=gaiadupsource,
+            mws_classes[int(south)] = _select_photsys(
+                    isMWS_main_sv, photsys_rows[int(south)], gaia=gaia, gaiaaen=gaiaaen, gaiadupsource=gaiadupsource,
                     gflux=gflux, rflux=rflux, obs_rflux=obs_rflux, objtype=objtype,
                     gnobs=gnobs, rnobs=rnobs,
                     gfracmasked=gfracmasked, rfracmasked=rfracmasked,
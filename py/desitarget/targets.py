@@ -302,6 +302,91 @@ def set_obsconditions(targets, scnd=False):
     return obscon
 
 
+# ADM byte look-up tables of the priorities/NUMOBS of target bits,
+# ADM keyed by the mask and the inputs. See _bit_lut().
+_bit_luts = {}
+
+
+def _bit_lut(mask, names, values, fill):
+    """Byte look-up tables for the largest value of any set target bit.
+
+    Parameters
+    ----------
+    mask : :class:`~desiutil.bitmask.BitMask`
+        A target mask, e.g. :data:`~desitarget.targetmask.desi_mask`.
+    names : :class:`list` or `tuple`
+        The names of the bits in `mask` that contribute values.
+    values : :class:`function`
+        Called as ``values(mask[name])`` and returns a list of the values
+        of that bit in each of (one or more) states.
+    fill : :class:`int`
+        The value for words that have none of the bits in `names` set.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        Array of shape (nstates, 8, 256). Entry ``[i, k, b]`` is the
+        largest of `fill` and the value in state ``i`` of each bit in
+        `names` that is set in ``b``, the ``k``-th byte of a 64-bit word.
+    """
+    nstates = len(values(mask[names[0]])) if len(names) > 0 else 1
+    lut = np.full((nstates, 8, 256), fill, dtype='i8')
+    byte = np.arange(256)
+    for name in names:
+        k, j = divmod(mask[name].bitnum, 8)
+        isset = ((byte >> j) & 1) == 1
+        for i, value in enumerate(values(mask[name])):
+            lut[i, k, isset] = np.maximum(lut[i, k, isset], value)
+    lut.flags.writeable = False
+
+    return lut
+
+
+def _cached_bit_lut(key, mask, names, values, fill):
+    """Retrieve (or build and cache) the output of :func:`_bit_lut`.
+    """
+    # ADM the mask is retained so that its id can't be reused.
+    key = (id(mask),) + key
+    if key not in _bit_luts:
+        _bit_luts[key] = (mask, _bit_lut(mask, names, values, fill))
+
+    return _bit_luts[key][1]
+
+
+def _max_set_bit(words, lut, state=None):
+    """The largest value of any bit set in each of an array of words.
+
+    Parameters
+    ----------
+    words : :class:`~numpy.ndarray`
+        Integer target bit-words, e.g. a `DESI_TARGET` column.
+    lut : :class:`~numpy.ndarray`
+        Look-up tables as made by :func:`_bit_lut`.
+    state : :class:`~numpy.ndarray`, optional
+        Index of the state of each of `words` in the first axis of
+        `lut`. Defaults to using the first state for every word.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        The largest value in `lut` of any bit set in each word.
+    """
+    words = np.asarray(words).astype('i8', copy=False)
+    fill = lut[0, 0, 0]
+    out = np.full(len(words), fill, dtype='i8')
+    for k in range(8):
+        # ADM skip bytes that contain no bits of interest.
+        if np.all(lut[:, k] == fill):
+            continue
+        byte = (words >> 8*k) & 0xff
+        if state is None:
+            np.maximum(out, lut[0, k][byte], out=out)
+        else:
+            np.maximum(out, lut[:, k][state, byte], out=out)
+
+    return out
+
+
 def initial_priority_numobs(targets, scnd=False,
                             obscon="DARK|GRAY|BRIGHT|POOR|TWILIGHT12|TWILIGHT18"):
     """highest initial priority and numobs for an array of target bits.
@@ -366,23 +451,18 @@ def initial_priority_numobs(targets, scnd=False,
             except KeyError:
                 pass
 
-        # ADM loop through the relevant bits updating with the highest
-        # ADM priority and the largest value of NUMOBS.
-        for name in bitnames:
-            # ADM indexes in the DESI/MWS/BGS_TARGET column that have this bit set
-            istarget = (targets[colname] & mask[name]) != 0
-            # ADM for each index, determine where this bit is set and the priority
-            # ADM for this bit is > than the currently stored priority.
-            w = np.where((mask[name].priorities['UNOBS'] >= outpriority) & istarget)[0]
-            # ADM where a larger priority trumps the stored priority, update the priority
-            if len(w) > 0:
-                outpriority[w] = mask[name].priorities['UNOBS']
-            # ADM for each index, determine where this bit is set and whether NUMOBS
-            # ADM for this bit is > than the currently stored NUMOBS.
-            w = np.where((mask[name].numobs >= outnumobs) & istarget)[0]
-            # ADM where a larger NUMOBS trumps the stored NUMOBS, update NUMOBS.
-            if len(w) > 0:
-                outnumobs[w] = mask[name].numobs
+        # ADM the highest priority and the largest value of NUMOBS
+        # ADM of any of the relevant bits, via byte look-up tables.
+        key = ("initial", tuple(bitnames))
+        priolut = _cached_bit_lut(
+            key + ("UNOBS",), mask, bitnames,
+            lambda bit: [bit.priorities['UNOBS']], 0)
+        numobslut = _cached_bit_lut(
+            key + ("NUMOBS",), mask, bitnames, lambda bit: [bit.numobs], -1)
+        np.maximum(outpriority, _max_set_bit(targets[colname], priolut),
+                   out=outpriority)
+        np.maximum(outnumobs, _max_set_bit(targets[colname], numobslut),
+                   out=outnumobs)
 
     return outpriority, outnumobs
 
@@ -460,6 +540,27 @@ def calc_priority(targets, zcat, obscon):
     assert not np.any(zwarn & done)
     assert np.all(unobs | done | zgood | zwarn)
 
+    # ADM the state of each target as an index into the byte look-up
+    # ADM tables of priorities made by _bit_lut (for _max_set_bit).
+    states = ['UNOBS', 'DONE', 'MORE_ZGOOD', 'MORE_ZWARN']
+    state = np.zeros(len(targets), dtype='i1')
+    state[done], state[zgood], state[zwarn] = 1, 2, 3
+
+    def _state_priorities(bit):
+        return [bit.priorities[st] for st in states]
+
+    def _update_priority(words, mask, names, obscon=None, update=None):
+        # ADM only update priorities for passed observing conditions.
+        if obscon is not None:
+            names = [name for name in names if (obsconditions.mask(obscon) &
+                     obsconditions.mask(mask[name].obsconditions)) != 0]
+        lut = _cached_bit_lut(("calc", tuple(names)), mask, names,
+                              _state_priorities, 0)
+        prio = _max_set_bit(words, lut, state)
+        if update is not None:
+            prio[~update] = 0
+        np.maximum(priority, prio, out=priority)
+
     # DESI dark time targets.
     if survey != 'cmx':
         if desi_target in targets.dtype.names:
@@ -468,15 +569,7 @@ def calc_priority(targets, zcat, obscon):
             # names = ('ELG', 'LRG_1PASS', 'LRG_2PASS')
             # if survey[0:2] == 'sv':
             names = ('ELG', 'LRG')
-            for name in names:
-                # ADM only update priorities for passed observing conditions.
-                pricon = obsconditions.mask(desi_mask[name].obsconditions)
-                if (obsconditions.mask(obscon) & pricon) != 0:
-                    ii = (targets[desi_target] & desi_mask[name]) != 0
-                    priority[ii & unobs] = np.maximum(priority[ii & unobs], desi_mask[name].priorities['UNOBS'])
-                    priority[ii & done] = np.maximum(priority[ii & done],  desi_mask[name].priorities['DONE'])
-                    priority[ii & zgood] = np.maximum(priority[ii & zgood], desi_mask[name].priorities['MORE_ZGOOD'])
-                    priority[ii & zwarn] = np.maximum(priority[ii & zwarn], desi_mask[name].priorities['MORE_ZWARN'])
+            _update_priority(targets[desi_target], desi_mask, names, obscon)
 
             # QSO could be Lyman-alpha or Tracer.
             name = 'QSO'
@@ -496,27 +589,13 @@ def calc_priority(targets, zcat, obscon):
 
         # BGS targets.
         if bgs_target in targets.dtype.names:
-            for name in bgs_mask.names():
-                # ADM only update priorities for passed observing conditions.
-                pricon = obsconditions.mask(bgs_mask[name].obsconditions)
-                if (obsconditions.mask(obscon) & pricon) != 0:
-                    ii = (targets[bgs_target] & bgs_mask[name]) != 0
-                    priority[ii & unobs] = np.maximum(priority[ii & unobs], bgs_mask[name].priorities['UNOBS'])
-                    priority[ii & done] = np.maximum(priority[ii & done],  bgs_mask[name].priorities['DONE'])
-                    priority[ii & zgood] = np.maximum(priority[ii & zgood], bgs_mask[name].priorities['MORE_ZGOOD'])
-                    priority[ii & zwarn] = np.maximum(priority[ii & zwarn], bgs_mask[name].priorities['MORE_ZWARN'])
+            _update_priority(targets[bgs_target], bgs_mask, bgs_mask.names(),
+                             obscon)
 
         # MWS targets.
         if mws_target in targets.dtype.names:
-            for name in mws_mask.names():
-                # ADM only update priorities for passed observing conditions.
-                pricon = obsconditions.mask(mws_mask[name].obsconditions)
-                if (obsconditions.mask(obscon) & pricon) != 0:
-                    ii = (targets[mws_target] & mws_mask[name]) != 0
-                    priority[ii & unobs] = np.maximum(priority[ii & unobs], mws_mask[name].priorities['UNOBS'])
-                    priority[ii & done] = np.maximum(priority[ii & done],  mws_mask[name].priorities['DONE'])
-                    priority[ii & zgood] = np.maximum(priority[ii & zgood], mws_mask[name].priorities['MORE_ZGOOD'])
-                    priority[ii & zwarn] = np.maximum(priority[ii & zwarn], mws_mask[name].priorities['MORE_ZWARN'])
+            _update_priority(targets[mws_target], mws_mask, mws_mask.names(),
+                             obscon)
 
         # ADM Secondary targets.
         if scnd_target in targets.dtype.names:
@@ -531,16 +610,8 @@ def calc_priority(targets, zcat, obscon):
                 scnd_update &= ((targets[desi_target] & ~update_from_scnd_bits) == 0)
                 print('{} scnd targets to be updated'.format(scnd_update.sum()))
 
-            for name in scnd_mask.names():
-                # ADM only update priorities for passed observing conditions.
-                pricon = obsconditions.mask(scnd_mask[name].obsconditions)
-                if (obsconditions.mask(obscon) & pricon) != 0:
-                    ii = (targets[scnd_target] & scnd_mask[name]) != 0
-                    ii &= scnd_update
-                    priority[ii & unobs] = np.maximum(priority[ii & unobs], scnd_mask[name].priorities['UNOBS'])
-                    priority[ii & done] = np.maximum(priority[ii & done],  scnd_mask[name].priorities['DONE'])
-                    priority[ii & zgood] = np.maximum(priority[ii & zgood], scnd_mask[name].priorities['MORE_ZGOOD'])
-                    priority[ii & zwarn] = np.maximum(priority[ii & zwarn], scnd_mask[name].priorities['MORE_ZWARN'])
+            _update_priority(targets[scnd_target], scnd_mask, scnd_mask.names(),
+                             obscon, update=scnd_update)
 
         # Special case: IN_BRIGHT_OBJECT means priority=-1 no matter what
         ii = (targets[desi_target] & desi_mask.IN_BRIGHT_OBJECT) != 0
@@ -548,16 +619,44 @@ def calc_priority(targets, zcat, obscon):
 
     # ADM Special case: SV-like commissioning targets.
     if 'CMX_TARGET' in targets.dtype.names:
-        for name in ['SV0_' + label for label in ('BGS', 'MWS')]:
-            ii = (targets['CMX_TARGET'] & cmx_mask[name]) != 0
-            priority[ii & unobs] = np.maximum(priority[ii & unobs], cmx_mask[name].priorities['UNOBS'])
-            priority[ii & done] = np.maximum(priority[ii & done],  cmx_mask[name].priorities['DONE'])
-            priority[ii & zgood] = np.maximum(priority[ii & zgood], cmx_mask[name].priorities['MORE_ZGOOD'])
-            priority[ii & zwarn] = np.maximum(priority[ii & zwarn], cmx_mask[name].priorities['MORE_ZWARN'])
+        # ADM these priorities don't depend on the observing conditions.
+        names = ['SV0_' + label for label in ('BGS', 'MWS')]
+        _update_priority(targets['CMX_TARGET'], cmx_mask, names)
 
     return priority
 
 
+# ADM look-up tables of which (NESTED) HEALPixels are north of the
+# ADM Galactic plane, keyed by nside. See _galactic_north().
+_galnorth = {}
+
+
+def _galactic_north(nside):
+    """Which HEALPixels are north of the Galactic plane, cached by `nside`.
+
+    Parameters
+    ----------
+    nside : :class:`int`
+        The (NESTED) HEALPixel nside.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        Read-only boolean array of length ``hp.nside2npix(nside)`` that
+        is ``True`` for pixels whose centers are north of the plane.
+    """
+    if nside not in _galnorth:
+        from desitarget.geomask import is_in_gal_box
+        allpix = np.arange(hp.nside2npix(nside))
+        theta, phi = hp.pix2ang(nside, allpix, nest=True)
+        ra, dec = np.degrees(phi), 90-np.degrees(theta)
+        pixn = is_in_gal_box([ra, dec], [0., 360., 0., 90.], radec=True)
+        pixn.flags.writeable = False
+        _galnorth[nside] = pixn
+
+    return _galnorth[nside]
+
+
 def resolve(targets):
     """Resolve which targets are primary in imaging overlap regions.
 
@@ -589,20 +688,15 @@ def resolve(targets):
     split = desitarget_resolve_dec()
 
     # ADM determine which targets are north of the Galactic plane. As
-    # ADM a speed-up, bin in ~1 sq.deg. HEALPixels and determine
-    # ADM which of those pixels are north of the Galactic plane.
+    # ADM a speed-up, bin in ~1 sq.deg. HEALPixels and look up which
+    # ADM of those pixels are north of the Galactic plane.
     # ADM We should never be as close as ~1o to the plane.
-    from desitarget.geomask import is_in_gal_box, pixarea2nside
-    nside = pixarea2nside(1)
+    from desitarget.geomask import pixarea2nside
+    galnside = pixarea2nside(1)
     theta, phi = np.radians(90-targets["DEC"]), np.radians(targets["RA"])
-    pixnum = hp.ang2pix(nside, theta, phi, nest=True)
-    # ADM find the pixels north of the Galactic plane...
-    allpix = np.arange(hp.nside2npix(nside))
-    theta, phi = hp.pix2ang(nside, allpix, nest=True)
-    ra, dec = np.degrees(phi), 90-np.degrees(theta)
-    pixn = is_in_gal_box([ra, dec], [0., 360., 0., 90.], radec=True)
+    pixnum = hp.ang2pix(galnside, theta, phi, nest=True)
     # ADM which targets are in pixels north of the Galactic plane.
-    galn = pixn[pixnum]
+    galn = _galactic_north(galnside)[pixnum]
 
     # ADM which targets are in the northern imaging area.
     arean = (targets["DEC"] >= split) & galn
@@ -615,7 +709,7 @@ def resolve(targets):
 
 def finalize(targets, desi_target, bgs_target, mws_target,
              sky=0, survey='main', darkbright=False, gaiadr=None,
-             targetid=None):
+             targetid=None, keep=None):
     """Return new targets array with added/renamed columns
 
     Parameters
@@ -645,6 +739,11 @@ def finalize(targets, desi_target, bgs_target, mws_target,
         and set the `gaiadr` part of `TARGETID` to whatever is passed.
     targetid : :class:`int64`, optional, defaults to ``None``
         In the mocks we compute `TARGETID` outside this function.
+    keep : :class:`~numpy.ndarray`, optional, defaults to ``None``
+        Boolean array or integer indexes of the rows of `targets` (and
+        of `desi_target`, etc., and any array `gaiadr` or `targetid`)
+        to return. Only these rows are copied into the output, which
+        saves making a trimmed copy of the inputs. Defaults to all rows.
 
     Returns
     -------
@@ -673,29 +772,20 @@ def finalize(targets, desi_target, bgs_target, mws_target,
     assert ntargets == len(desi_target)
     assert ntargets == len(bgs_target)
     assert ntargets == len(mws_target)
+    if targetid is not None:
+        assert ntargets == len(targetid)
 
-    # - OBJID in tractor files is only unique within the brick; rename and
-    # - create a new unique TARGETID
-    targets = rfn.rename_fields(targets,
-                                {'OBJID': 'BRICK_OBJID', 'TYPE': 'MORPHTYPE'})
-
-    # allow TARGETID to be passed as an input (specifically for the mocks).
-    if targetid is None:
-        if gaiadr is not None:
-            targetid = encode_targetid(objid=targets['GAIA_OBJID'],
-                                       brickid=targets['GAIA_BRICKID'],
-                                       release=0,
-                                       sky=sky,
-                                       gaiadr=gaiadr)
+    # ADM the rows to return.
+    if keep is None:
+        keep, nkeep = slice(None), ntargets
+    else:
+        keep = np.asarray(keep)
+        if keep.dtype == bool:
+            nkeep = np.count_nonzero(keep)
         else:
-            targetid = encode_targetid(objid=targets['BRICK_OBJID'],
-                                       brickid=targets['BRICKID'],
-                                       release=targets['RELEASE'],
-                                       sky=sky)
-    assert ntargets == len(targetid)
-
-    nodata = np.zeros(ntargets, dtype='int')-1
-    subpriority = np.zeros(ntargets, dtype='float')
+            nkeep = len(keep)
+        if np.ndim(gaiadr) > 0:
+            gaiadr = np.asarray(gaiadr)[keep]
 
     # ADM new columns are different depending on SV/cmx/main survey.
     if survey == 'main':
@@ -711,10 +801,8 @@ def finalize(targets, desi_target, bgs_target, mws_target,
         log.critical(msg)
         raise ValueError(msg)
 
-    # ADM the columns to write out and their values and formats.
+    # ADM the columns to write out and their formats.
     cols = ["TARGETID"] + colnames + ['SUBPRIORITY', 'OBSCONDITIONS']
-    vals = [targetid] + [desi_target, bgs_target, mws_target][:len(colnames)]  \
-        + [subpriority, nodata]
     forms = ['>i8'] + ['>i8', '>i8', '>i8'][:len(colnames)] + ['>f8', '>i8']
 
     # ADM set the initial PRIORITY and NUMOBS.
@@ -725,16 +813,39 @@ def finalize(targets, desi_target, bgs_target, mws_target,
         ender, obscon = [""], ["DARK|GRAY|BRIGHT|POOR|TWILIGHT12|TWILIGHT18"]
     for edr, oc in zip(ender, obscon):
         cols += ["{}_INIT{}".format(pn, edr) for pn in ["PRIORITY", "NUMOBS"]]
-        vals += [nodata, nodata]
         forms += ['>i8', '>i8']
 
-    # ADM write the output array.
-    newdt = [dt for dt in zip(cols, forms)]
-    done = np.array(np.zeros(len(targets)), dtype=targets.dtype.descr+newdt)
-    for col in targets.dtype.names:
-        done[col] = targets[col]
-    for col, val in zip(cols, vals):
-        done[col] = val
+    # - OBJID in tractor files is only unique within the brick; rename and
+    # - create a new unique TARGETID
+    renames = {'OBJID': 'BRICK_OBJID', 'TYPE': 'MORPHTYPE'}
+    olddt = targets.dtype.descr
+    newdt = [(renames.get(dt[0], dt[0]),) + dt[1:] for dt in olddt]
+    names = [dt[0] for dt in newdt]
+
+    # ADM write the output array in a single allocation, copying the
+    # ADM kept rows of the input columns (by position) in one pass.
+    done = np.zeros(nkeep, dtype=newdt+list(zip(cols, forms)))
+    done[names] = targets[keep]
+
+    # allow TARGETID to be passed as an input (specifically for the mocks).
+    if targetid is None:
+        if gaiadr is not None:
+            targetid = encode_targetid(objid=done['GAIA_OBJID'],
+                                       brickid=done['GAIA_BRICKID'],
+                                       release=0,
+                                       sky=sky,
+                                       gaiadr=gaiadr)
+        else:
+            targetid = encode_targetid(objid=done['BRICK_OBJID'],
+                                       brickid=done['BRICKID'],
+                                       release=done['RELEASE'],
+                                       sky=sky)
+    else:
+        targetid = np.asarray(targetid)[keep]
+
+    done["TARGETID"] = targetid
+    for col, val in zip(colnames, [desi_target, bgs_target, mws_target]):
+        done[col] = val[keep]
 
     # ADM add PRIORITY/NUMOBS columns.
     for edr, oc in zip(ender, obscon):
@@ -746,7 +857,8 @@ def finalize(targets, desi_target, bgs_target, mws_target,
 
     # ADM some final checks that the targets conform to expectations...
     # ADM check that each target has a unique ID.
-    if len(done["TARGETID"]) != len(set(done["TARGETID"])):
+    tids = np.sort(done["TARGETID"])
+    if np.any(tids[1:] == tids[:-1]):
         msg = 'TARGETIDs are not unique!'
         log.critical(msg)
         raise AssertionError(msg)
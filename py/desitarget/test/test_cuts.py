@@ -5,6 +5,7 @@
 import unittest
 from pkg_resources import resource_filename
 import os.path
+import shutil
 from uuid import uuid4
 import numbers
 
@@ -283,6 +284,331 @@ class TestCuts(unittest.TestCase):
 
                 self.assertTrue(np.all(t1[col][notNaN] == t2[col][notNaN]))
 
+    def test_target_columns(self):
+        """Test reading only the needed columns doesn't change the targets
+        """
+        for fn in self.tractorfiles + self.sweepfiles:
+            objects = io.read_tractor(fn)
+            for survey in ['main', 'sv1']:
+                for qso_selection in cuts.qso_selection_options:
+                    for tc in [[tc] for tc in cuts._tc_columns]:
+                        # ADM passing a filename only reads the columns
+                        # ADM needed for the requested target classes.
+                        bits = cuts.apply_cuts(
+                            fn, tcnames=tc, survey=survey,
+                            qso_selection=qso_selection)
+                        allbits = cuts.apply_cuts(
+                            objects, tcnames=tc, survey=survey,
+                            qso_selection=qso_selection)
+                        for b1, b2 in zip(bits, allbits):
+                            self.assertTrue(np.all(b1 == b2))
+
+        # ADM targets are read with the full data model.
+        columns = cuts._target_columns(["QSO"])
+        self.assertTrue(len(columns) < len(objects.dtype.names))
+        objects = io.read_tractor(fn, columns=columns, rows=[1, 3])
+        self.assertEqual(len(objects), 2)
+        self.assertEqual(set(objects.dtype.names), set(columns + ['PHOTSYS']))
+        targets = cuts.select_targets(fn, numproc=1, tcnames=["QSO"],
+                                      backup=False, hydrate=True)
+        self.assertNotIn('EBV', columns)
+        self.assertIn('EBV', targets.dtype.names)
+
+        # ADM hydrating just the targets matches reading every column,
+        # ADM including when the selection reads blocks of rows.
+        for filelist in [self.tractorfiles, self.sweepfiles]:
+            t2 = cuts.select_targets(filelist, numproc=1, backup=False)
+            for chunksize in [None, 4]:
+                t1 = cuts.select_targets(filelist, numproc=1, backup=False,
+                                         chunksize=chunksize, hydrate=True)
+                self.assertEqual(t1.dtype, t2.dtype)
+                self.assertEqual(t1.tobytes(), t2.tobytes())
+
+    def test_hydrate_gaiamatch(self):
+        """Test hydrating only matches each input file to Gaia once.
+        """
+        from unittest import mock
+        nmatched = []
+
+        # ADM a stand-in for matching to Gaia (for which there's no test
+        # ADM data) that derives the Gaia columns from each object.
+        def _add_gaia_columns(objects):
+            nmatched.append(len(objects))
+            objects["REF_ID"] = objects["OBJID"] + 1
+            objects["GAIA_PHOT_G_MEAN_MAG"] = 30. - objects["RA"] / 100.
+            return ["REF_ID", "GAIA_PHOT_G_MEAN_MAG"]
+
+        fn = self.sweepfiles[0]
+        nrows = len(io.read_tractor(fn, columns=["RA"]))
+        with mock.patch.object(cuts, "_add_gaia_columns", _add_gaia_columns):
+            t2 = cuts.select_targets(fn, numproc=1, backup=False,
+                                     gaiamatch=True)
+            self.assertEqual(nmatched, [nrows])
+            nmatched.clear()
+            t1 = cuts.select_targets(fn, numproc=1, backup=False,
+                                     gaiamatch=True, hydrate=True)
+            self.assertEqual(nmatched, [nrows])
+        self.assertEqual(t1.dtype, t2.dtype)
+        self.assertEqual(t1.tobytes(), t2.tobytes())
+
+    def test_splitphotsys(self):
+        """Test only passing northern (southern) sources to northern (southern) cuts
+        """
+        from desitarget.targetmask import bgs_mask, mws_mask
+        from desitarget.sv1.sv1_targetmask import desi_mask as sv1_desi_mask
+        from desitarget.sv1.sv1_targetmask import bgs_mask as sv1_bgs_mask
+        from desitarget.sv1.sv1_targetmask import mws_mask as sv1_mws_mask
+
+        # ADM mix the photometric systems by making half of the objects northern.
+        objects = np.concatenate([io.read_tractor(fn) for fn in self.sweepfiles])
+        objects["PHOTSYS"][::2] = "N"
+        north = objects["PHOTSYS"] == "N"
+
+        masks = {"main": [desi_mask, bgs_mask, mws_mask],
+                 "sv1": [sv1_desi_mask, sv1_bgs_mask, sv1_mws_mask]}
+        for survey in ['main', 'sv1']:
+            for qso_selection in cuts.qso_selection_options:
+                bits = cuts.apply_cuts(objects, survey=survey,
+                                       qso_selection=qso_selection)
+                splitbits = cuts.apply_cuts(objects, survey=survey,
+                                            qso_selection=qso_selection,
+                                            splitphotsys=True)
+                for b1, b2, mask in zip(bits, splitbits, masks[survey]):
+                    for name in mask.names():
+                        bit = mask[name]
+                        # ADM _NORTH (_SOUTH) bits are only retained for
+                        # ADM northern (southern) objects...
+                        isbit = (b1 & bit) != 0
+                        if name.endswith("_NORTH"):
+                            isbit &= north
+                        if name.endswith("_SOUTH"):
+                            isbit &= ~north
+                        # ADM ...but every other bit is unchanged.
+                        self.assertTrue(np.all(isbit == ((b2 & bit) != 0)))
+
+    def test_photfeatures(self):
+        """Test memoizing photometric features doesn't change the targets
+        """
+        flux = io.read_tractor(self.sweepfiles[0])["FLUX_G"]
+        # ADM features are only memoized in a PhotFeatures block...
+        self.assertIsNot(cuts._mag(flux, 1e-7), cuts._mag(flux, 1e-7))
+        with cuts.PhotFeatures() as features:
+            # ADM ...for registered inputs...
+            self.assertIsNot(cuts._mag(flux, 1e-7), cuts._mag(flux, 1e-7))
+            features.register(gflux=flux)
+            mag = cuts._mag(flux, 1e-7)
+            self.assertIs(mag, cuts._mag(flux, 1e-7))
+            # ADM ...and are distinct for different inputs.
+            self.assertIsNot(mag, cuts._mag(flux, 1e-16))
+            self.assertIsNot(mag, cuts._mag(flux.copy(), 1e-7))
+            # ADM registered inputs and features can't be modified.
+            for array in flux, mag:
+                with self.assertRaises(ValueError):
+                    array[0] = 0
+            # ADM subsets of rows are dropped when a scope exits...
+            rows = flux > 0
+            features.register(rows=rows)
+            ii = cuts._where(rows)
+            with features.scope():
+                sub = cuts._take(flux, ii)
+                submag = cuts._mag(sub, 1e-7)
+                self.assertIs(submag, cuts._mag(cuts._take(flux, ii), 1e-7))
+            self.assertIsNot(sub, cuts._take(flux, ii))
+            # ADM ...but features of the full inputs are retained.
+            self.assertIs(ii, cuts._where(rows))
+            self.assertIs(mag, cuts._mag(flux, 1e-7))
+        self.assertIsNone(cuts.PhotFeatures.active())
+        # ADM inputs are writeable again once the block is done.
+        flux[0] = flux[0]
+
+        # ADM apply_cuts memoizes features, its wrapped function doesn't.
+        objects = np.concatenate([io.read_tractor(fn) for fn in self.sweepfiles])
+        objects["PHOTSYS"][::2] = "N"
+        for survey in ['main', 'sv1']:
+            for splitphotsys in [False, True]:
+                bits = cuts.apply_cuts(objects, survey=survey,
+                                       splitphotsys=splitphotsys)
+                nomemo = cuts.apply_cuts.__wrapped__(
+                    objects, survey=survey, splitphotsys=splitphotsys)
+                for b1, b2 in zip(bits, nomemo):
+                    self.assertTrue(np.all(b1 == b2))
+
+    def test_chunksize(self):
+        """Test processing blocks of rows doesn't change the targets
+        """
+        fn = self.sweepfiles[0]
+        objects = io.read_tractor(fn)
+        for survey in ['main', 'sv1']:
+            bits = cuts.apply_cuts(objects, survey=survey)
+            # ADM an awkward chunksize, so the last block is partial.
+            for inputs in objects, fn:
+                chunked = cuts.apply_cuts(inputs, survey=survey, chunksize=4)
+                for b1, b2 in zip(bits, chunked):
+                    self.assertEqual(b1.dtype, b2.dtype)
+                    self.assertTrue(np.all(b1 == b2))
+
+        with self.assertRaises(ValueError):
+            cuts.apply_cuts(objects, chunksize=0)
+
+    def test_cutbackend(self):
+        """Test evaluating the color cuts in blocks doesn't change the targets
+        """
+        from unittest import mock
+        objects = np.concatenate([io.read_tractor(fn) for fn in self.sweepfiles])
+        # ADM an awkward blocksize, so the last block is partial.
+        with mock.patch.object(cuts.CutBackend, "blocksize", 4):
+            for qso_selection in cuts.qso_selection_options:
+                bits = cuts.apply_cuts(objects, qso_selection=qso_selection,
+                                       cutbackend='numpy')
+                blocked = cuts.apply_cuts(objects, qso_selection=qso_selection,
+                                          cutbackend='blocks')
+                self.assertTrue(np.any(bits[0] != 0))
+                for b1, b2 in zip(bits, blocked):
+                    self.assertEqual(b1.dtype, b2.dtype)
+                    self.assertTrue(np.all(b1 == b2))
+
+        # ADM each cut is split into blocks, including for positional
+        # ADM inputs and cuts that return several arrays.
+        gflux, rflux, zflux = objects["FLUX_G"], objects["FLUX_R"], objects["FLUX_Z"]
+        w1flux, w2flux = objects["FLUX_W1"], objects["FLUX_W2"]
+        mwskwargs = dict(
+            gflux=gflux, rflux=rflux, zflux=zflux, w1flux=w1flux, w2flux=w2flux,
+            pmra=objects["PMRA"], pmdec=objects["PMDEC"],
+            parallax=objects["PARALLAX"], parallaxerr=objects["PARALLAX_IVAR"],
+            obs_rflux=rflux, objtype=objects["TYPE"], paramssolved=31,
+            gaiaaen=objects["GAIA_ASTROMETRIC_EXCESS_NOISE"])
+        qso = cuts.isQSO_colors(gflux, rflux, zflux, w1flux, w2flux)
+        elg = cuts.isELG_colors(gflux=gflux, rflux=rflux, zflux=zflux)
+        mws = cuts.isMWS_main_colors(**mwskwargs)
+        mag = cuts._mag
+        maglengths = []
+
+        def _mag(flux, clip):
+            maglengths.append(len(flux))
+            return mag(flux, clip)
+
+        with cuts.CutBackend('blocks', blocksize=4), \
+             mock.patch.object(cuts, "_mag", _mag):
+            self.assertTrue(np.all(qso == cuts.isQSO_colors(
+                gflux, rflux, zflux, w1flux, w2flux)))
+            self.assertTrue(np.all(elg == cuts.isELG_colors(
+                gflux=gflux, rflux=rflux, zflux=zflux)))
+            for m1, m2 in zip(mws, cuts.isMWS_main_colors(**mwskwargs)):
+                self.assertTrue(np.all(m1 == m2))
+        self.assertEqual(len(maglengths), 3 * -(-len(objects) // 4))
+        self.assertEqual(max(maglengths), 4)
+
+        with self.assertRaises(ValueError):
+            cuts.apply_cuts(objects, cutbackend='numexpr')
+
+    def test_numthreads(self):
+        """Test processing blocks of rows in threads doesn't change the targets
+        """
+        fn = self.sweepfiles[0]
+        objects = io.read_tractor(fn)
+        for survey in ['main', 'sv1']:
+            bits = cuts.apply_cuts(objects, survey=survey)
+            for inputs, chunksize in [(objects, None), (fn, None), (objects, 4)]:
+                threaded = cuts.apply_cuts(inputs, survey=survey, numthreads=3,
+                                           chunksize=chunksize)
+                for b1, b2 in zip(bits, threaded):
+                    self.assertEqual(b1.dtype, b2.dtype)
+                    self.assertTrue(np.all(b1 == b2))
+
+        # ADM select_targets uses spare processors as threads, unless
+        # ADM the number of threads is passed.
+        from unittest import mock
+        apply_cuts = cuts.apply_cuts
+        usedthreads = []
+
+        # ADM apply_cuts calls itself (without numthreads) for each block.
+        def _apply_cuts(*args, **kwargs):
+            if "numthreads" in kwargs:
+                usedthreads.append(kwargs["numthreads"])
+            return apply_cuts(*args, **kwargs)
+
+        with mock.patch.object(cuts, "apply_cuts", _apply_cuts):
+            for numthreads, expected in [(None, 4), (1, 1), (2, 2)]:
+                usedthreads.clear()
+                cuts.select_targets(fn, numproc=4, backup=False,
+                                    tcnames=["LRG"], numthreads=numthreads)
+                self.assertEqual(usedthreads, [expected])
+
+    def test_resolve(self):
+        """Test resolving targets with a cached pixel table and pixel numbers
+        """
+        from desitarget.targets import resolve, _galactic_north
+        from desitarget.geomask import is_in_gal_box, pixarea2nside
+        from desitarget.io import desitarget_resolve_dec
+        # ADM a sprinkling of targets across the sky with both PHOTSYS.
+        np.random.seed(626)
+        targets = np.zeros(10000, dtype=[('RA', '>f8'), ('DEC', '>f8'),
+                                         ('PHOTSYS', 'U1')])
+        targets["RA"] = np.random.uniform(0., 360., len(targets))
+        targets["DEC"] = np.degrees(np.arcsin(np.random.uniform(-1., 1., len(targets))))
+        targets["PHOTSYS"][::2], targets["PHOTSYS"][1::2] = "N", "S"
+
+        # ADM the lookup table is computed once and is read-only.
+        galnside = pixarea2nside(1)
+        pixn = _galactic_north(galnside)
+        self.assertIs(pixn, _galactic_north(galnside))
+        self.assertFalse(pixn.flags.writeable)
+
+        # ADM the expected targets, from the pixel centers directly.
+        pixnum = hp.ang2pix(galnside, np.radians(90-targets["DEC"]),
+                            np.radians(targets["RA"]), nest=True)
+        theta, phi = hp.pix2ang(galnside, pixnum, nest=True)
+        galn = is_in_gal_box([np.degrees(phi), 90-np.degrees(theta)],
+                             [0., 360., 0., 90.], radec=True)
+        arean = (targets["DEC"] >= desitarget_resolve_dec()) & galn
+        photn = targets["PHOTSYS"] == "N"
+        expected = targets[(photn & arean) | (~photn & ~arean)]
+
+        self.assertTrue(np.all(resolve(targets) == expected))
+
+    def test_finalize(self):
+        """Test finalize with kept rows
+        """
+        from desitarget.targets import finalize
+        objects = np.concatenate([io.read_tractor(fn) for fn in self.sweepfiles])
+        desi, bgs, mws = cuts.apply_cuts(objects)
+        keep = desi != 0
+        for survey in ['main', 'sv1']:
+            targets = finalize(objects, desi, bgs, mws, survey=survey,
+                               darkbright=True, keep=keep)
+            trimmed = finalize(objects[keep], desi[keep], bgs[keep], mws[keep],
+                               survey=survey, darkbright=True)
+            self.assertEqual(targets.dtype, trimmed.dtype)
+            self.assertEqual(targets.tobytes(), trimmed.tobytes())
+            self.assertTrue(np.all(targets["BRICK_OBJID"] == objects["OBJID"][keep]))
+
+        # ADM duplicated TARGETIDs are caught.
+        with self.assertRaises(AssertionError):
+            finalize(objects, desi, bgs, mws, keep=np.zeros(2, dtype=int))
+
+    @unittest.skipUnless('DESITARGET_RUN_FINALIZE_BENCHMARK' in os.environ,
+                         '$DESITARGET_RUN_FINALIZE_BENCHMARK not set; skipping finalize benchmark')
+    def test_finalize_benchmark(self):
+        """Time finalize for a large set of objects.
+        """
+        from time import time
+        from desitarget.targets import finalize
+        objects = np.concatenate([io.read_tractor(fn) for fn in self.sweepfiles])
+        desi, bgs, mws = cuts.apply_cuts(objects)
+        # ADM repeat the objects with distinct OBJIDs, so that the
+        # ADM TARGETIDs remain unique.
+        nrep = 100000
+        big = np.concatenate([objects]*nrep)
+        big["OBJID"] = np.arange(len(big))
+        desi, bgs, mws = [np.concatenate([bits]*nrep) for bits in (desi, bgs, mws)]
+        for keep in [None, desi != 0]:
+            start = time()
+            targets = finalize(big, desi, bgs, mws, darkbright=True, keep=keep)
+            print("finalize: {} of {} rows in {:.2f}s"
+                  .format(len(targets), len(big), time() - start))
+            self.assertEqual(len(targets), len(big) if keep is None
+                             else np.count_nonzero(keep))
+
     def test_qso_selection_options(self):
         """Test the QSO selection options are passed correctly
         """
@@ -357,6 +683,135 @@ class TestCuts(unittest.TestCase):
             bgs2 = targets['BGS_TARGET'] != 0
             self.assertTrue(np.all(bgs1 == bgs2))
 
+    def test_stream_targets(self):
+        """Test streaming targets to HEALPixel files matches selecting them
+        """
+        tc = ["ELG", "BGS", "MWS"]
+        nsidefile = 2
+        testdir = 'test-{}'.format(uuid4().hex)
+        try:
+            for nproc in [1, 2]:
+                # ADM limit to pixels covered in the Gaia unit test files
+                # ADM so that backup (Gaia-only) targets are also staged.
+                targets = cuts.select_targets(
+                    self.sweepfiles, numproc=nproc, tcnames=tc,
+                    nside=self.nside, pixlist=self.pix)
+                stagedir = os.path.join(testdir, str(nproc))
+                filedict = cuts.select_targets(
+                    self.sweepfiles, numproc=nproc, tcnames=tc,
+                    nside=self.nside, pixlist=self.pix,
+                    stagedir=stagedir, nsidefile=nsidefile)
+
+                # ADM each staged file only has targets in its pixel...
+                staged = []
+                for pix, fn in filedict.items():
+                    targs = fitsio.read(fn)
+                    ii = io.is_in_hp(targs, nsidefile, [pix])
+                    self.assertTrue(np.all(ii))
+                    staged.append(targs)
+                # ADM ...and together they're the same targets.
+                staged = np.concatenate(staged).astype(targets.dtype)
+                targets = targets[np.argsort(targets["TARGETID"])]
+                staged = staged[np.argsort(staged["TARGETID"])]
+                self.assertEqual(targets.tobytes(), staged.tobytes())
+
+                # ADM we won't append to existing staged targets.
+                with self.assertRaises(ValueError):
+                    cuts.select_targets(
+                        self.sweepfiles, numproc=nproc, tcnames=tc,
+                        stagedir=stagedir, nsidefile=nsidefile)
+
+            # ADM staged targets can be written with the usual headers.
+            for pix, fn in filedict.items():
+                io.write_targets(testdir, fitsio.read(fn), nside=self.nside,
+                                 nsidefile=nsidefile, hpxlist=pix)
+            hpdir = os.path.dirname(io.find_target_files(testdir, hp="X"))
+            targs = io.read_targets_in_hp(hpdir, nsidefile, list(filedict))
+            self.assertEqual(len(targs), len(targets))
+        finally:
+            shutil.rmtree(testdir, ignore_errors=True)
+
+        # ADM stagedir and nsidefile must be passed together.
+        with self.assertRaises(ValueError):
+            cuts.select_targets(self.sweepfiles, numproc=1, stagedir=testdir)
+
+    def test_cache_targets(self):
+        """Test targets are cached per file and reused, unless files change
+        """
+        tc = ["LRG", "ELG"]
+        testdir = 'test-{}'.format(uuid4().hex)
+        try:
+            # ADM use copies of the input files, so we can modify them.
+            os.makedirs(testdir)
+            infiles = [shutil.copy(fn, testdir) for fn in self.sweepfiles]
+            cachedir = os.path.join(testdir, "cache")
+            targets = cuts.select_targets(infiles, numproc=1, tcnames=tc,
+                                          backup=False)
+            for nproc in [1, 2]:
+                t1 = cuts.select_targets(infiles, numproc=nproc, tcnames=tc,
+                                         backup=False, cachedir=cachedir)
+                self.assertEqual(targets.tobytes(), t1.tobytes())
+            # ADM one cache file was written per input file.
+            cachefiles = [cuts._cached_targets_filename(cachedir, fn,
+                                                        tcnames=tc)
+                          for fn in infiles]
+            self.assertEqual(sorted(os.listdir(cachedir)),
+                             sorted([os.path.basename(fn) for fn in cachefiles]))
+
+            # ADM cached targets are reused...
+            np.save(cachefiles[0], np.load(cachefiles[0])[:0])
+            t2 = cuts.select_targets(infiles, numproc=1, tcnames=tc,
+                                     backup=False, cachedir=cachedir)
+            ntargs = len(cuts.select_targets(infiles[0], numproc=1,
+                                             tcnames=tc, backup=False))
+            self.assertEqual(len(t2), len(targets) - ntargs)
+            # ADM ...unless the inputs changed.
+            cuts.select_targets(infiles, numproc=1, tcnames=["LRG"],
+                                backup=False, cachedir=cachedir)
+            self.assertEqual(len(os.listdir(cachedir)), 2*len(infiles))
+            stat = os.stat(infiles[0])
+            os.utime(infiles[0], ns=(stat.st_atime_ns, stat.st_mtime_ns+1))
+            t4 = cuts.select_targets(infiles, numproc=1, tcnames=tc,
+                                     backup=False, cachedir=cachedir)
+            self.assertEqual(targets.tobytes(), t4.tobytes())
+        finally:
+            shutil.rmtree(testdir, ignore_errors=True)
+
+    def test_unstage_duplicates(self):
+        """Test duplicates are removed from staged targets as for all targets
+        """
+        dt = [('RA', '>f8'), ('DEC', '>f8'), ('REF_ID', '>i8'),
+              ('TARGETID', '>i8')]
+        # ADM sweeps targets with a duplicated REF_ID, and Gaia-only
+        # ADM targets that duplicate a sweeps target and each other.
+        targets = np.zeros(6, dtype=dt)
+        targets["RA"] = [10, 10, 200, 200, 10, 200]
+        targets["REF_ID"] = [5, 5, -1, 7, 0, 9]
+        targets["TARGETID"] = np.arange(6)
+        gaiatargets = np.zeros(3, dtype=dt)
+        gaiatargets["RA"] = [200, 10, 10]
+        gaiatargets["REF_ID"] = [7, 8, 8]
+        gaiatargets["TARGETID"] = [10, 11, 12]
+
+        # ADM the targets that are retained for the non-streaming case.
+        alltargs = np.concatenate([targets, gaiatargets])
+        ii = alltargs["REF_ID"] > 0
+        _, ind = np.unique(alltargs["REF_ID"][ii], return_index=True)
+        expected = np.concatenate([alltargs[ii][ind], alltargs[~ii]])
+
+        testdir = 'test-{}'.format(uuid4().hex)
+        try:
+            filedict = io.stage_targets_in_hp(testdir, targets, 2)
+            ids = targets[["REF_ID", "TARGETID"]][targets["REF_ID"] > 0]
+            gaiatargs = cuts._unstage_duplicates(filedict, ids, gaiatargets)
+            staged = [fitsio.read(fn) for fn in filedict.values()]
+            tids = np.concatenate([gaiatargs["TARGETID"]] +
+                                  [targs["TARGETID"] for targs in staged])
+        finally:
+            shutil.rmtree(testdir, ignore_errors=True)
+
+        self.assertEqual(sorted(tids), sorted(expected["TARGETID"]))
+
     def test_targets_spatial(self):
         """Test applying RA/Dec/HEALpixel inputs to sweeps recovers same targets
         """
@@ -124,6 +124,362 @@ class TestIO(unittest.TestCase):
             else:
                 self.assertTrue(np.all(data[column] == d2[column]))
 
+    def _write_big_sweep(self, nrows):
+        """Write a sweep file of `nrows` rows by repeating a test sweep.
+        """
+        sweepfile = io.list_sweepfiles(self.datadir)[0]
+        data, hdr = fitsio.read(sweepfile, header=True)
+        data = data[np.arange(nrows) % len(data)]
+        os.makedirs(self.testdir)
+        fn = os.path.join(self.testdir, os.path.basename(sweepfile))
+        fitsio.write(fn, data, header=hdr, clobber=True)
+
+        return fn
+
+    def test_read_tractor_blocks(self):
+        """Test read_tractor strips strings and sets PHOTSYS across blocks.
+        """
+        fn = self._write_big_sweep(25000)
+        indata = fitsio.read(fn, upper=True)
+        indata["TYPE"][::3] = "P\tS"
+        indata["TYPE"][1::3] = " EX"
+        indata["RELEASE"][::2] = 9001
+        fitsio.write(fn, indata, clobber=True)
+
+        # ADM slices are read as contiguous ranges of rows.
+        for rows in [None, np.arange(24999, -1, -7), slice(7, 20000),
+                     slice(None, None, 3), slice(30000, 40000)]:
+            data = io.read_tractor(fn, rows=rows)
+            inrows = indata if rows is None else indata[rows]
+            self.assertEqual(len(data), len(inrows))
+            for col in ["TYPE", "BRICKNAME", "REF_CAT"]:
+                stripped = np.char.rstrip(inrows[col]).astype(data[col].dtype)
+                self.assertTrue(np.all(data[col] == stripped))
+            photsys = io.release_to_photsys(inrows["RELEASE"])
+            self.assertTrue(np.all(data["PHOTSYS"] == photsys.astype(data["PHOTSYS"].dtype)))
+            self.assertTrue(np.all(data["RA"] == inrows["RA"]))
+
+    def test_read_tractor_projected(self):
+        """Test read_tractor only reads the requested columns from disk.
+        """
+        from unittest import mock
+        from fitsio.hdu.table import TableHDU
+        fn = self._write_big_sweep(25000)
+        columns = ["RA", "DEC", "RELEASE", "FLUX_G", "MASKBITS"]
+        # ADM MASKBITS is derived from BRIGHTSTARINBLOB in older files.
+        with fitsio.FITS(fn) as fx:
+            filecols = [col.upper() for col in fx[1].get_colnames()]
+        filecols = [col for col in filecols
+                    if col in columns or col == "BRIGHTSTARINBLOB"]
+        readcols = []
+        read_columns = TableHDU.read_columns
+
+        def _read_columns(hdu, columns, **kwargs):
+            readcols.append(list(columns))
+            return read_columns(hdu, columns, **kwargs)
+
+        def _read_slice(hdu, *args, **kwargs):
+            raise AssertionError("read whole rows for a subset of columns")
+
+        for rows in [None, slice(7, 20000), np.arange(0, 25000, 3)]:
+            readcols.clear()
+            with mock.patch.object(TableHDU, "read_columns", _read_columns), \
+                 mock.patch.object(TableHDU, "read_slice", _read_slice):
+                data = io.read_tractor(fn, columns=columns, rows=rows)
+            self.assertGreater(len(readcols), 0)
+            for cols in readcols:
+                self.assertEqual(set(cols), set(filecols))
+            indata = fitsio.read(fn, columns=filecols, upper=True)
+            indata = indata if rows is None else indata[rows]
+            for col in ["RA", "DEC", "RELEASE", "FLUX_G"]:
+                self.assertTrue(np.all(data[col] == indata[col]))
+
+    def _read_tractor_reference(self, filename):
+        """read_tractor as it was before reading into one allocation.
+
+        Reads every column, copies the common columns into a second,
+        zeroed, array, strips every string column and then copies every
+        column again into a third array to add PHOTSYS.
+        """
+        indata = fitsio.read(filename, upper=True)
+        dt = io._tractor_dtype(list(indata.dtype.names))
+        dt = [(name, dt[name]) for name in dt.names if name != 'PHOTSYS']
+        data = np.zeros(len(indata), dtype=dt)
+        if "REF_ID" in data.dtype.names:
+            data['REF_ID'] = -1
+        for col in set(indata.dtype.names).intersection(set(data.dtype.names)):
+            data[col] = indata[col]
+        if "BRIGHTSTARINBLOB" in indata.dtype.names:
+            if "MASKBITS" in data.dtype.names:
+                data["MASKBITS"] = indata["BRIGHTSTARINBLOB"] << 1
+        for colname in data.dtype.names:
+            kind = data[colname].dtype.kind
+            if kind == 'U' or kind == 'S':
+                data[colname] = np.char.rstrip(data[colname])
+
+        return io.add_photsys(data)
+
+    @unittest.skipUnless('DESITARGET_RUN_IO_BENCHMARK' in os.environ,
+                         '$DESITARGET_RUN_IO_BENCHMARK not set; skipping read_tractor benchmark')
+    def test_read_tractor_benchmark(self):
+        """Compare the wall time and peak memory of read_tractor to the old path.
+        """
+        import tracemalloc
+        from time import time
+        fn = self._write_big_sweep(250000)
+        stats = {}
+        for name, reader in [("before", self._read_tractor_reference),
+                             ("after", io.read_tractor)]:
+            # ADM the best of a few runs, to limit noise from the cache.
+            walltime = []
+            for _ in range(3):
+                start = time()
+                data = reader(fn)
+                walltime.append(time() - start)
+                del data
+            tracemalloc.start()
+            data = reader(fn)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            stats[name] = (data, min(walltime), peak)
+            print("read_tractor ({}): {} rows in {:.2f}s; peak memory {:.0f}MB for {:.0f}MB of output"
+                  .format(name, len(data), min(walltime), peak/1e6, data.nbytes/1e6))
+
+        # ADM the output is unchanged, but needs less memory.
+        before, after = stats["before"][0], stats["after"][0]
+        self.assertEqual(before.dtype.names, after.dtype.names)
+        for col in before.dtype.names:
+            self.assertTrue(np.all(before[col] == after[col]))
+        self.assertLess(stats["after"][2], stats["before"][2])
+
+    def test_hp_index(self):
+        """Test the index of a HEALPixel-split directory is used and checked.
+        """
+        data = np.concatenate([io.read_tractor(fn)
+                               for fn in io.list_sweepfiles(self.datadir)])
+        nsidefile = 4
+        pixnum = io.hp.ang2pix(nsidefile, np.radians(90-data["DEC"]),
+                               np.radians(data["RA"]), nest=True)
+        # ADM write one file per pixel, as for bundle_files.
+        for pix in set(pixnum):
+            _, fn = io.write_targets(self.testdir, data[pixnum == pix],
+                                     nsidefile=nsidefile, hpxlist=int(pix))
+        hpdir = os.path.dirname(fn)
+        index = io.read_hp_index(hpdir)
+        self.assertEqual(len(index), len(set(pixnum)))
+        for entry in index.values():
+            self.assertEqual(entry["nside"], nsidefile)
+            self.assertEqual(entry["nrows"], np.sum(pixnum == entry["pixels"][0]))
+            self.assertEqual(entry["columns"], list(data.dtype.names))
+
+        # ADM writing the index leaves nothing else in the directory...
+        others = [bn for bn in os.listdir(hpdir) if not bn.endswith("fits")]
+        self.assertEqual(others, [io.hpindexname])
+        # ADM ...and concurrent writers all add their files.
+        from concurrent.futures import ThreadPoolExecutor
+        fns = sorted(index)
+        os.remove(os.path.join(hpdir, io.hpindexname))
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda fn: io.write_hp_index(hpdir, [fn]), fns))
+        self.assertEqual(io.read_hp_index(hpdir), index)
+        others = [bn for bn in os.listdir(hpdir) if not bn.endswith("fits")]
+        self.assertEqual(others, [io.hpindexname])
+
+        # ADM the index gives the same answers as reading every header.
+        nside, pixdict = io.check_hp_target_dir(hpdir)
+        os.remove(os.path.join(hpdir, io.hpindexname))
+        self.assertIsNone(io.read_hp_index(hpdir))
+        self.assertEqual((nside, pixdict), io.check_hp_target_dir(hpdir))
+        targs = io.read_targets_in_hp(hpdir, nsidefile, list(pixdict))
+        self.assertEqual(len(targs), len(data))
+
+        # ADM checksums are only recorded if requested...
+        self.assertNotIn("checksum", io._hp_index_entry(fn))
+        io.write_hp_index(hpdir, checksum=True)
+        self.assertIsNotNone(io.read_hp_index(hpdir, verify=True))
+        # ADM ...and catch changes that keep the size and mtime.
+        stat = os.stat(fn)
+        with open(fn, "r+b") as f:
+            f.seek(stat.st_size - 1)
+            last = f.read(1)
+            f.seek(stat.st_size - 1)
+            f.write(bytes([last[0] ^ 1]))
+        os.utime(fn, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertIsNotNone(io.read_hp_index(hpdir))
+        self.assertIsNone(io.read_hp_index(hpdir, verify=True))
+
+        # ADM a changed modification time makes the index out-of-date,
+        # ADM even if the size is unchanged...
+        io.write_hp_index(hpdir)
+        os.utime(fn, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertIsNone(io.read_hp_index(hpdir))
+        # ADM ...as does a new file.
+        io.write_hp_index(hpdir)
+        self.assertIsNotNone(io.read_hp_index(hpdir))
+        shutil.copy(fn, fn.replace(".fits", "-copy.fits"))
+        self.assertIsNone(io.read_hp_index(hpdir))
+
+    def _write_hp_split(self, n=20000, nsidefile=1):
+        """Write n random targets split by HEALPixel at nsidefile.
+        """
+        rng = np.random.RandomState(616)
+        data = np.zeros(n, dtype=[('TARGETID', '>i8'), ('RA', '>f8'), ('DEC', '>f8')])
+        data["TARGETID"] = np.arange(n)
+        data["RA"] = rng.uniform(0., 360., n)
+        data["DEC"] = np.degrees(np.arcsin(rng.uniform(-1., 1., n)))
+        pixnum = io.hp.ang2pix(nsidefile, np.radians(90-data["DEC"]),
+                               np.radians(data["RA"]), nest=True)
+        for pix in set(pixnum):
+            _, fn = io.write_targets(self.testdir, data[pixnum == pix],
+                                     nsidefile=nsidefile, hpxlist=int(pix))
+
+        return data, fn
+
+    def test_hp_rows(self):
+        """Test region reads that use the HPXROWS row ranges.
+        """
+        data, fn = self._write_hp_split()
+        hpdir = os.path.dirname(fn)
+
+        # ADM files are sorted by pixel, with the correct row ranges.
+        targs = fitsio.read(fn, "TARGETS")
+        rowranges = fitsio.read(fn, "HPXROWS")
+        finepix = io.hp.ang2pix(io.hprowsnside, np.radians(90-targs["DEC"]),
+                                np.radians(targs["RA"]), nest=True)
+        self.assertTrue(np.all(np.diff(finepix) >= 0))
+        for pix, start, stop in rowranges:
+            self.assertTrue(np.all(finepix[start:stop] == pix))
+        self.assertEqual(np.sum(rowranges["STOP"]-rowranges["START"]), len(targs))
+
+        # ADM region reads match reading and filtering every target,
+        # ADM for pixels coarser and finer than the HPXROWS nside.
+        for nside in [2, io.hprowsnside, 4*io.hprowsnside]:
+            pixlist = [3, 17*nside**2//4 + 5]
+            t = io.read_targets_in_hp(hpdir, nside, pixlist)
+            ii = io.is_in_hp(data, nside, pixlist)
+            self.assertEqual(sorted(t["TARGETID"]), sorted(data["TARGETID"][ii]))
+            # ADM ...including when reading a single file.
+            t = io.read_targets_in_hp(fn, nside, pixlist)
+            ii &= np.isin(data["TARGETID"], targs["TARGETID"])
+            self.assertEqual(sorted(t["TARGETID"]), sorted(data["TARGETID"][ii]))
+        radecrad = [targs["RA"][0], targs["DEC"][0], 2.]
+        t = io.read_targets_in_cap(hpdir, radecrad)
+        ii = io.is_in_cap(data, radecrad)
+        self.assertEqual(sorted(t["TARGETID"]), sorted(data["TARGETID"][ii]))
+
+        # ADM a small region only reads a small number of rows.
+        rows = io._rows_in_hp(fn, io.hprowsnside, [rowranges["HPXPIXEL"][0]])
+        self.assertEqual(len(rows), rowranges["STOP"][0])
+
+    def test_read_numproc(self):
+        """Test reading files concurrently matches reading them serially.
+        """
+        data, fn = self._write_hp_split()
+        hpdir = os.path.dirname(fn)
+        pixlist = [0, 5, 6, 7, 40]
+        for rows in [True, False]:
+            # ADM also check files that have no HPXROWS extension.
+            if not rows:
+                for fn in io.read_hp_index(hpdir):
+                    targs, hdr = fitsio.read(fn, "TARGETS", header=True)
+                    fitsio.write(fn, targs, extname="TARGETS", header=hdr, clobber=True)
+            for downsample in [None, 3]:
+                t1 = io.read_targets_in_hp(hpdir, 4, pixlist, downsample=downsample)
+                t4 = io.read_targets_in_hp(hpdir, 4, pixlist, downsample=downsample,
+                                           numproc=4)
+                self.assertEqual(t1.tobytes(), t4.tobytes())
+                if downsample is None:
+                    ii = io.is_in_hp(data, 4, pixlist)
+                    self.assertEqual(sorted(t4["TARGETID"]), sorted(data["TARGETID"][ii]))
+        t = io.read_targets_in_box(hpdir, [0., 360., -90., 90.], numproc=3)
+        self.assertEqual(sorted(t["TARGETID"]), list(data["TARGETID"]))
+
+    def test_read_numproc_overlap(self):
+        """Test files are read at the same time when numproc > 1.
+        """
+        import multiprocessing
+        _, fn = self._write_hp_split()
+        hpdir = os.path.dirname(fn)
+        # ADM each reading process waits at a barrier before its first
+        # ADM read, which can only be passed if two reads are in flight
+        # ADM at once. If reads were serialized, the barrier would time
+        # ADM out and the read would fail.
+        barrier = multiprocessing.get_context("fork").Barrier(2, timeout=60)
+        parent, waited = os.getpid(), []
+        read_target_files = io.read_target_files
+
+        def _read_target_files(*args, **kwargs):
+            if os.getpid() != parent and len(waited) == 0:
+                barrier.wait()
+                waited.append(True)
+            return read_target_files(*args, **kwargs)
+
+        try:
+            io.read_target_files = _read_target_files
+            t = io.read_targets_in_hp(hpdir, 4, [0, 5, 40], numproc=2)
+        finally:
+            io.read_target_files = read_target_files
+        self.assertEqual(t.tobytes(), io.read_targets_in_hp(hpdir, 4, [0, 5, 40]).tobytes())
+
+    def test_target_cache(self):
+        """Test reading targets from the columnar cache matches reading FITS.
+        """
+        data = np.concatenate([io.read_tractor(fn)
+                               for fn in io.list_sweepfiles(self.datadir)])
+        _, fn = io.write_targets(self.testdir, data, cache=True)
+        cols, hdr = io.load_target_cache(fn)
+        self.assertTrue(all(isinstance(col, np.memmap) for col in cols.values()))
+        self.assertTrue(all(col.dtype.isnative for col in cols.values()))
+        self.assertEqual(hdr["EXTNAME"], "TARGETS")
+
+        for columns in [None, ["DCHISQ", "BRICKNAME", "RA"]]:
+            for rows, downsample in [(None, None), ([5, 1, 3], None), (None, 2)]:
+                kwargs = dict(columns=columns, rows=rows, downsample=downsample)
+                t1 = io.read_target_files(fn, **kwargs)
+                t2 = io.read_target_files(fn, usecache=True, **kwargs)
+                self.assertEqual(t1.dtype.names, t2.dtype.names)
+                for col in t1.dtype.names:
+                    self.assertEqual(t1[col].shape, t2[col].shape)
+                    self.assertTrue(np.all(t1[col] == t2[col]))
+                    # ADM the cache only changes the byte order.
+                    self.assertEqual(t1[col].dtype.newbyteorder("="), t2[col].dtype)
+
+        # ADM a cache isn't used if the file has changed.
+        fitsio.write(fn, data[:3], extname="TARGETS", clobber=True)
+        self.assertEqual(io.load_target_cache(fn), (None, None))
+        self.assertEqual(len(io.read_target_files(fn, usecache=True)), 3)
+
+        # ADM caches of HEALPixel-split files are used by region reads.
+        shutil.rmtree(self.testdir)
+        data, fn = self._write_hp_split()
+        hpdir = os.path.dirname(fn)
+        t1 = io.read_targets_in_hp(hpdir, 4, [0, 5, 40], numproc=2)
+        for fn in io.read_hp_index(hpdir):
+            io.write_target_cache(fn)
+        t2 = io.read_targets_in_hp(hpdir, 4, [0, 5, 40], numproc=2)
+        self.assertFalse(t2["RA"].dtype.isnative)
+        t2 = io.read_targets_in_hp(hpdir, 4, [0, 5, 40], numproc=2,
+                                   usecache=True)
+        self.assertTrue(t2["RA"].dtype.isnative)
+        self.assertEqual(t1.tolist(), t2.tolist())
+
+        # ADM columns can be returned as a dictionary of arrays...
+        for kwargs in [dict(nside=4, pixlist=[0, 5, 40]),
+                       dict(nside=1, pixlist=[3, 4])]:
+            t1 = io.read_targets_in_hp(hpdir, columns=["TARGETID"], **kwargs)
+            cols = io.read_targets_in_hp(hpdir, columns=["TARGETID"],
+                                         ascolumns=True, **kwargs)
+            self.assertEqual(list(cols), ["TARGETID"])
+            self.assertTrue(np.all(cols["TARGETID"] == t1["TARGETID"]))
+            self.assertTrue(cols["TARGETID"].dtype.isnative)
+        # ADM ...which, for one whole cached file, are not copied.
+        cols = io.read_targets_in_hp(hpdir, 1, 3, columns=["TARGETID", "RA"],
+                                     ascolumns=True)
+        for col in cols.values():
+            self.assertIsInstance(col, np.memmap)
+        cols = io.read_targets_in_box(hpdir, columns=["TARGETID"], ascolumns=True)
+        self.assertEqual(sorted(cols["TARGETID"]), list(data["TARGETID"]))
+
     def test_brickname(self):
         self.assertEqual(io.brickname_from_filename('tractor-3301m002.fits'), '3301m002')
         self.assertEqual(io.brickname_from_filename('tractor-3301p002.fits'), '3301p002')
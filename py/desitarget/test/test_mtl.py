@@ -3,14 +3,18 @@
 """Test desitarget.mtl.
 """
 import os
+import tempfile
 import unittest
 import numpy as np
-from astropy.table import Table, join
+from astropy.table import Table, join, vstack
 
 from desitarget.targetmask import desi_mask as Mx
 from desitarget.sv1.sv1_targetmask import desi_mask as MxSV
 from desitarget.targetmask import obsconditions
-from desitarget.mtl import make_mtl
+from time import time
+from desitarget.mtl import make_mtl, _match_targetids
+from desitarget.mtl import make_mtl_state, update_mtl, replay_mtl_ledger
+from desitarget.mtl import write_mtl_state, read_mtl_state
 from desitarget.targets import initial_priority_numobs, main_cmx_or_sv
 
 
@@ -127,6 +131,92 @@ class TestMTL(unittest.TestCase):
             if x.masked:
                 self.assertTrue(np.all(mtl['NUMOBS_MORE'].mask == x['NUMOBS_MORE'].mask))
 
+    def test_match_targetids(self):
+        """Test the sort-based match of zcat TARGETIDs to targets.
+        """
+        targetid = np.array([7, 3, 9, 1, 3])
+        ztargetid = np.array([9, 3, 4, 1, 0, 10])
+        ii, ok = _match_targetids(targetid, ztargetid)
+        self.assertTrue(np.all(ok == [True, True, False, True, False, False]))
+        # ADM duplicated TARGETIDs match the last duplicate, as for a dict.
+        self.assertTrue(np.all(ii[ok] == [2, 4, 3]))
+        # ADM already-sorted TARGETIDs give the same answer.
+        ii, ok = _match_targetids(np.arange(10), ztargetid)
+        self.assertTrue(np.all(ii[ok] == ztargetid[ok]))
+        self.assertTrue(np.all(ok == (ztargetid < 10)))
+
+    def test_astable(self):
+        """Test MTL can be returned as a numpy array or a Table.
+        """
+        for targets in [self.targets, self.targets.as_array()]:
+            mtl = make_mtl(targets, "DARK|GRAY", zcat=self.zcat, astable=False)
+            self.assertIsInstance(mtl, np.ndarray)
+            mtltab = make_mtl(targets, "DARK|GRAY", zcat=self.zcat)
+            self.assertEqual(mtltab.meta['EXTNAME'], 'MTL')
+            self.assertEqual(mtltab.colnames, list(mtl.dtype.names))
+            for col in mtl.dtype.names:
+                self.assertTrue(np.all(mtltab[col] == mtl[col]))
+
+    def test_update_mtl(self):
+        """Test incremental MTL updates match make_mtl and can be replayed.
+        """
+        # ADM two updates, with one target observed in both.
+        z1, z2 = self.zcat[2:], self.zcat[:3]
+        z2['NUMOBS'] = 2
+        for prefix in ["", "SV1_"]:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                ledger = os.path.join(tmpdir, 'mtl-ledger.fits')
+                statefile = os.path.join(tmpdir, 'mtl-state.fits')
+                t = self.reset_targets(prefix)
+                start = make_mtl_state(t, "DARK|GRAY")
+                mtl = start.copy()
+                update_mtl(mtl, z1, "DARK|GRAY", ledger=ledger)
+                # ADM the state is written part way through the ledger.
+                write_mtl_state(statefile, mtl, ledger=ledger)
+                entries = update_mtl(mtl, z2, "DARK|GRAY", ledger=ledger)
+                self.assertTrue(np.all(entries["TARGETID"] == np.sort(z2["TARGETID"])))
+                # ADM observed targets match running make_mtl on all updates.
+                full = make_mtl(t, "DARK|GRAY", zcat=vstack([z1, z2]), astable=False)
+                full = full[np.argsort(full["TARGETID"])]
+                obs = np.isin(mtl["TARGETID"], self.zcat["TARGETID"])
+                for col in ["PRIORITY", "NUMOBS_MORE"]:
+                    self.assertTrue(np.all(mtl[col][obs] == full[col][obs]))
+                    self.assertTrue(np.all(mtl[col][~obs] == start[col][~obs]))
+                # ADM replaying the ledger recovers the updated state...
+                replayed = replay_mtl_ledger(start.copy(), ledger)
+                self.assertTrue(np.all(replayed == mtl))
+                # ADM ...as does reading the state, which applies only the
+                # ADM entries written after the state was.
+                self.assertTrue(np.all(read_mtl_state(statefile) == mtl))
+                stale = read_mtl_state(statefile, replay=False)
+                self.assertFalse(np.all(stale == mtl))
+                # ADM a ledger with fewer entries than recorded is an error.
+                os.remove(ledger)
+                with self.assertRaises(ValueError):
+                    read_mtl_state(statefile)
+
+    @unittest.skipUnless('DESITARGET_RUN_MTL_BENCHMARK' in os.environ,
+                         '$DESITARGET_RUN_MTL_BENCHMARK not set; skipping MTL benchmark')
+    def test_benchmark(self):
+        """Time make_mtl for 10M targets with a 10% redshift catalog.
+        """
+        n = 10000000
+        rng = np.random.RandomState(42)
+        targets = np.zeros(n, dtype=self.targets.as_array().dtype)
+        types = rng.randint(len(self.types), size=n)
+        for col in targets.dtype.names:
+            targets[col] = self.targets[col][types]
+        targets["TARGETID"] = rng.permutation(n)
+        zcat = np.zeros(n // 10, dtype=self.zcat.as_array().dtype)
+        zcat["TARGETID"] = rng.choice(n, n // 10, replace=False)
+        zcat["Z"] = rng.uniform(0, 3, n // 10)
+        zcat["NUMOBS"] = 1
+        zcat["SPECTYPE"] = "GALAXY"
+        start = time()
+        mtl = make_mtl(targets, "DARK|GRAY", zcat=zcat, astable=False)
+        print("make_mtl: {} targets in {:.1f}s".format(n, time()-start))
+        self.assertEqual(len(mtl), n)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,150 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+# -*- coding: utf-8 -*-
+"""Test desitarget.myRF.
+"""
+import os
+import unittest
+from pkg_resources import resource_filename
+from time import time
+import numpy as np
+
+from desitarget.myRF import myRF, flatRF, load_forest, load_forests
+from desitarget.myRF import join_forests
+from desitarget.internal import sharedmem
+
+
+class TestMYRF(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.forestfile = resource_filename('desitarget',
+                                           'data/rf_model_dr7_HighZ.npz')
+        # ADM a mock set of colors, with r-band magnitudes in the
+        # ADM range used for the QSO random forest preselection.
+        np.random.seed(626)
+        nobjs = 2000
+        cls.colors = np.random.normal(0.5, 1., (nobjs, 11))
+        cls.colors[:, 10] = np.random.uniform(17.5, 22.7, nobjs)
+        # ADM a NaN should be treated as "right" at every node.
+        cls.colors[0, 3] = np.nan
+
+    def test_flat_identical(self):
+        """Test the flattened forest reproduces myRF bit-for-bit.
+        """
+        for ntrees in [1, 50]:
+            rf = myRF(self.colors, '', numberOfTrees=ntrees, version=2)
+            rf.loadForest(self.forestfile)
+            proba = rf.predict_proba()
+
+            frf = flatRF(numberOfTrees=ntrees, version=2)
+            frf.loadForest(self.forestfile)
+            self.assertTrue(np.array_equal(proba, frf.predict_proba(self.colors)))
+            # ADM batching shouldn't change the result.
+            frf.batchSize = 333
+            self.assertTrue(np.array_equal(proba, frf.predict_proba(self.colors)))
+
+    def test_predict_threshold(self):
+        """Test early-exit scoring gives the same mask as a full evaluation.
+        """
+        frf = flatRF(numberOfTrees=500, version=2)
+        frf.loadForest(self.forestfile)
+        proba = frf.predict_proba(self.colors)
+        r = self.colors[:, 10]
+        # ADM a magnitude-dependent cut, scalar cuts, and a cut that
+        # ADM lies exactly on the probabilities.
+        pcuts = [np.where(r > 20.5, 0.55 - (r - 20.5) * 0.025, 0.55),
+                 0., 0.4, 1., proba]
+        for pcut in pcuts:
+            for nsteps in [1, 25, 500]:
+                qso = frf.predict_threshold(self.colors, pcut,
+                                            treesPerStep=nsteps)
+                self.assertTrue(np.array_equal(qso, proba >= pcut))
+        # ADM passing no objects should return an empty mask.
+        self.assertEqual(len(frf.predict_threshold(self.colors[:0], 0.5)), 0)
+
+    def test_join_forests(self):
+        """Test a joint forest reproduces each of its forests.
+        """
+        # ADM forests of different sizes, so that the forests differ.
+        forests = []
+        for ntrees in [50, 20]:
+            frf = flatRF(numberOfTrees=ntrees, version=2)
+            frf.loadForest(self.forestfile)
+            forests.append(frf)
+        probas = [frf.predict_proba(self.colors) for frf in forests]
+
+        jrf = join_forests(forests)
+        for proba, jproba in zip(probas, jrf.predict_proba_all(self.colors)):
+            self.assertTrue(np.array_equal(proba, jproba))
+        # ADM the joint forest doesn't have a single probability.
+        with self.assertRaises(ValueError):
+            jrf.predict_proba(self.colors)
+
+        # ADM a joint threshold is passed if any forest's cut is passed.
+        r = self.colors[:, 10]
+        pcut = np.where(r > 20.5, 0.55 - (r - 20.5) * 0.025, 0.55)
+        for pcuts in [[pcut, 0.4], [probas[0], probas[1]], [1., 0.]]:
+            for nsteps in [1, 7, 50]:
+                qso = jrf.predict_threshold(self.colors, pcuts,
+                                            treesPerStep=nsteps)
+                self.assertTrue(np.array_equal(
+                    qso, (probas[0] >= pcuts[0]) | (probas[1] >= pcuts[1])))
+        # ADM one cut must be passed per forest.
+        with self.assertRaises(ValueError):
+            jrf.predict_threshold(self.colors, [pcut])
+
+    def test_load_forest(self):
+        """Test forests are loaded once per process, read-only.
+        """
+        rf = load_forest(self.forestfile, numberOfTrees=50, version=2)
+        # ADM the same object is returned for the same file and version.
+        self.assertIs(rf, load_forest(self.forestfile, numberOfTrees=50,
+                                      version=2))
+        self.assertFalse(rf.value.flags.writeable)
+        # ADM the same is true for joint forests.
+        jrf = load_forests([self.forestfile]*2, numberOfTrees=50, version=2)
+        self.assertIs(jrf, load_forests([self.forestfile]*2,
+                                        numberOfTrees=50, version=2))
+        self.assertFalse(jrf.value.flags.writeable)
+
+        # ADM shared forests live in (and give results from) shared memory.
+        frf = flatRF(numberOfTrees=50, version=2)
+        frf.loadForest(self.forestfile)
+        frf.share()
+        self.assertIsInstance(frf.left, sharedmem.anonymousmemmap)
+        self.assertTrue(np.array_equal(rf.predict_proba(self.colors),
+                                       frf.predict_proba(self.colors)))
+
+    @unittest.skipUnless('DESITARGET_RUN_RF_BENCHMARK' in os.environ,
+                         '$DESITARGET_RUN_RF_BENCHMARK not set; skipping random forest benchmark')
+    def test_flat_benchmark(self):
+        """Compare the execution time of myRF and the flattened forest.
+        """
+        ntrees = 500
+        start = time()
+        rf = myRF(self.colors, '', numberOfTrees=ntrees, version=2)
+        rf.loadForest(self.forestfile)
+        proba = rf.predict_proba()
+        myrftime = time() - start
+
+        start = time()
+        frf = flatRF(numberOfTrees=ntrees, version=2)
+        frf.loadForest(self.forestfile)
+        flatproba = frf.predict_proba(self.colors)
+        flatrftime = time() - start
+
+        print("myRF: {:.2f}s; flatRF: {:.2f}s for {} objects and {} trees"
+              .format(myrftime, flatrftime, len(self.colors), ntrees))
+        self.assertTrue(np.array_equal(proba, flatproba))
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+def test_suite():
+    """Allows testing of only this module with the command:
+
+        python setup.py test -m desitarget.test.test_myRF
+    """
+    return unittest.defaultTestLoader.loadTestsFromName(__name__)
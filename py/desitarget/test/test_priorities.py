@@ -177,6 +177,59 @@ class TestPriorities(unittest.TestCase):
                         self.assertIn(state, mask[name].priorities,
                                       '{} not in mask.{}.priorities'.format(state, name))
 
+    def test_bit_luts(self):
+        """Test byte look-up tables match looping over the target bits.
+        """
+        from desitarget.targets import obsconditions
+        np.random.seed(717)
+        n = 1000
+        # ADM random target words with a handful of random bits set.
+        t = Table(np.zeros(n, dtype=[(col, '>i8') for col in
+                                     ['DESI_TARGET', 'BGS_TARGET', 'MWS_TARGET']]))
+        for col, mask in zip(t.colnames, [desi_mask, bgs_mask, mws_mask]):
+            for name in np.random.choice(mask.names(), 5*n):
+                t[col][np.random.randint(n)] |= mask[name]
+        z = Table()
+        z['Z'] = np.zeros(n)
+        z['NUMOBS'] = np.random.randint(0, 2, n)
+        z['NUMOBS_MORE'] = np.random.randint(0, 2, n)
+        z['ZWARN'] = np.random.randint(0, 2, n)
+
+        for obscon in ["DARK|GRAY", "BRIGHT", "DARK|GRAY|BRIGHT|POOR|TWILIGHT12|TWILIGHT18"]:
+            obsbits = obsconditions.mask(obscon)
+            # ADM the highest priority and NUMOBS of any set bit.
+            priority = np.zeros(n, dtype='int')
+            numobs = np.zeros(n, dtype='int') - 1
+            for col, mask in zip(t.colnames, [desi_mask, bgs_mask, mws_mask]):
+                for name in mask.names():
+                    if "UNOBS" not in mask[name].priorities or (
+                            obsconditions.mask(mask[name].obsconditions) & obsbits) == 0:
+                        continue
+                    ii = (t[col] & mask[name]) != 0
+                    priority[ii] = np.maximum(priority[ii], mask[name].priorities["UNOBS"])
+                    numobs[ii] = np.maximum(numobs[ii], mask[name].numobs)
+            p, nobs = initial_priority_numobs(t, obscon=obscon)
+            self.assertTrue(np.all(p == priority))
+            self.assertTrue(np.all(nobs == numobs))
+
+            # ADM the highest priority of any set BGS/MWS bit in each state.
+            tt = t.copy()
+            tt['DESI_TARGET'] = 0
+            unobs = z['NUMOBS'] == 0
+            states = [unobs, ~unobs & (z['NUMOBS_MORE'] == 0),
+                      ~unobs & (z['NUMOBS_MORE'] > 0) & (z['ZWARN'] == 0),
+                      ~unobs & (z['NUMOBS_MORE'] > 0) & (z['ZWARN'] != 0)]
+            priority = np.zeros(n, dtype='int')
+            for col, mask in zip(t.colnames[1:], [bgs_mask, mws_mask]):
+                for name in mask.names():
+                    if (obsconditions.mask(mask[name].obsconditions) & obsbits) == 0:
+                        continue
+                    ii = (tt[col] & mask[name]) != 0
+                    for state, st in zip(states, ['UNOBS', 'DONE', 'MORE_ZGOOD', 'MORE_ZWARN']):
+                        jj = ii & state
+                        priority[jj] = np.maximum(priority[jj], mask[name].priorities[st])
+            self.assertTrue(np.all(calc_priority(tt, z, obscon) == priority))
+
     def test_cmx_priorities(self):
         """Test that priority calculation can handle commissioning files.
         """
@@ -0,0 +1,105 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+# -*- coding: utf-8 -*-
+"""Test desitarget.internal.sharedmem.
+"""
+import os
+import unittest
+import numpy as np
+
+from desitarget.internal import sharedmem
+
+
+class TestSharedmem(unittest.TestCase):
+
+    def setUp(self):
+        # ADM task costs, with the most expensive task last in input order.
+        self.costs = [1, 3, 2, 3, 1, 1, 10]
+
+    def test_dispatch_order(self):
+        """Test tasks are dispatched in order of decreasing cost
+        """
+        for sequence in list(range(7)), iter(range(7)):
+            seq, capsules = sharedmem.MapReduce._dispatch(
+                sequence, cost=lambda i: self.costs[i])
+            # ADM ties are dispatched in input order.
+            self.assertEqual([c[0] for c in capsules], [6, 1, 3, 2, 0, 4, 5])
+            self.assertEqual(list(seq), list(range(7)))
+
+        # ADM without a cost, tasks are dispatched in input order, and
+        # ADM items that the slaves can't index are sent with the task.
+        seq, capsules = sharedmem.MapReduce._dispatch(list(range(7)))
+        self.assertEqual(list(capsules), [(i, ) for i in range(7)])
+        seq, capsules = sharedmem.MapReduce._dispatch(iter("abc"))
+        self.assertEqual(list(capsules), [(0, "a"), (1, "b"), (2, "c")])
+
+    def test_map_cost(self):
+        """Test results are returned in input order when dispatched by cost
+        """
+        for nproc in 0, 2:
+            pool = sharedmem.MapReduce(np=nproc)
+            with pool:
+                results = pool.map(lambda i: i**2, range(len(self.costs)),
+                                   cost=lambda i: self.costs[i])
+            self.assertEqual(results, [i**2 for i in range(len(self.costs))])
+            self.assertGreaterEqual(pool.tailidle, 0.)
+            self.assertLessEqual(pool.tailfraction, 1.)
+            if nproc == 0:
+                self.assertEqual(pool.tailidle, 0.)
+
+    def test_tail_idle(self):
+        """Test the idle tail is calculated from the result arrival times
+        """
+        # ADM 2 slaves, 4 tasks, from t=0. Once the 3rd result arrives
+        # ADM (at t=3) one slave is idle until the 4th arrives (t=10).
+        idle, frac = sharedmem.MapReduce._tail_idle(2, [0, 1, 2, 3, 10])
+        self.assertEqual(idle, 7.)
+        self.assertEqual(frac, 7./20)
+        # ADM a slave that never gets a task is idle throughout.
+        idle, frac = sharedmem.MapReduce._tail_idle(3, [0, 4, 5])
+        self.assertEqual(idle, 5. + 1.)
+        self.assertEqual(sharedmem.MapReduce._tail_idle(2, [0]), (0., 0.))
+
+    def test_map_shared(self):
+        """Test array results are passed back through shared memory
+        """
+        import glob
+        dt = [('ID', 'i8'), ('FLUX', 'f4', (3,))]
+
+        def _work(i):
+            # ADM the smaller results are pickled through the queue.
+            a = np.zeros(i*1000, dtype=dt)
+            a["ID"] = i
+            return a, i
+
+        before = set(glob.glob('/dev/shm/sharedmem-*'))
+        for shared in False, True:
+            pool = sharedmem.MapReduce(np=2)
+            with pool:
+                results = pool.map(_work, range(8), shared=shared)
+            for i, (a, j) in enumerate(results):
+                self.assertEqual(i, j)
+                self.assertEqual(a.dtype, np.dtype(dt))
+                self.assertEqual(len(a), i*1000)
+                self.assertTrue(np.all(a["ID"] == i))
+            # ADM the concatenated results match, whichever the transport.
+            a = np.concatenate([a for a, j in results])
+            self.assertTrue(np.all(a["ID"] == np.repeat(np.arange(8), np.arange(8)*1000)))
+            nbytes = sum(a.nbytes for a, j in results if a.nbytes >= pool.minshared)
+            if shared and os.path.isdir('/dev/shm'):
+                self.assertEqual(pool.sharedbytes, nbytes)
+            else:
+                self.assertEqual(pool.sharedbytes, 0)
+        # ADM the shared memory files are removed once they're mapped.
+        self.assertEqual(set(glob.glob('/dev/shm/sharedmem-*')), before)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+def test_suite():
+    """Allows testing of only this module with the command:
+
+        python setup.py test -m desitarget.test.test_sharedmem
+    """
+    return unittest.defaultTestLoader.loadTestsFromName(__name__)